@@ -0,0 +1,237 @@
+import errno
+import fcntl
+import hashlib
+import math
+import mmap
+import os
+import random
+import struct
+import threading
+import time
+
+# key digest, tokens left, last refill (unix time)
+SLOT = struct.Struct('<Qdd')
+# Each key hashes to a group of WAYS slots that are locked and probed together
+WAYS = 4
+
+
+class RateLimited(Exception):
+    """
+    A client used up its token bucket; answered with 429.
+    """
+
+    def __init__(self, scope, wait):
+        super().__init__(f'Rate limit exceeded ({scope})')
+        self.scope = scope
+        self.retry_after = max(1, math.ceil(wait))
+
+
+class Overloaded(Exception):
+    """
+    Every concurrency slot of a route class is taken; answered with 503.
+    """
+
+    def __init__(self, route_class, retry_after):
+        super().__init__(f'Too many {route_class} requests in flight')
+        self.route_class = route_class
+        self.retry_after = retry_after
+
+
+def parse_rate(value):
+    """
+    'rate/burst' (tokens per second / bucket size) -> (rate, burst), or None
+    when the limit is switched off ('', '0', 'off').
+    """
+    value = (value or '').strip().lower()
+    if value in ('', '0', 'off', 'none'):
+        return None
+    rate, _, burst = value.partition('/')
+    rate = float(rate)
+    burst = float(burst) if burst else max(rate, 1.0)
+    if rate <= 0 or burst < 1:
+        return None
+    return rate, burst
+
+
+class _SharedFile:
+    """
+    One descriptor per process on a file shared by all workers. fcntl record
+    locks belong to the process and are dropped when any descriptor on the file
+    is closed, so the file is opened once per pid and kept open.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._pid = None
+        self._fd = None
+        self._lock = threading.Lock()
+
+    def _reopen(self):
+        # Locks are not inherited across fork; neither is anything we remember about them
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        self._pid = os.getpid()
+        self._opened()
+
+    def _opened(self):
+        pass
+
+    def _ensure(self):
+        if self._pid != os.getpid():
+            self._reopen()
+        return self._fd
+
+
+class TokenBuckets(_SharedFile):
+    """
+    Token buckets keyed by string, in a memory-mapped file shared by every
+    worker on the host.
+
+    The file is a fixed hash table of slots, so memory stays bounded however
+    many clients show up. When a key's group is full, the bucket refilled
+    longest ago is recycled; at worst that gives an idle client a fresh bucket.
+    """
+
+    def __init__(self, path, slots=65536):
+        super().__init__(path)
+        self.groups = max(1, slots // WAYS)
+        self.size = self.groups * WAYS * SLOT.size
+        self._map = None
+        self.limited = 0
+
+    def _opened(self):
+        if os.fstat(self._fd).st_size < self.size:
+            os.ftruncate(self._fd, self.size)
+        self._map = mmap.mmap(self._fd, self.size)
+
+    @staticmethod
+    def _digest(key):
+        # 0 marks an empty slot
+        return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little') or 1
+
+    def take(self, key, rate, burst, cost=1.0):
+        """
+        Spend cost tokens from key's bucket. Returns 0 if they were available,
+        otherwise the seconds until they will be (nothing is spent then).
+        """
+        digest = self._digest(key)
+        start = (digest % self.groups) * WAYS * SLOT.size
+        length = WAYS * SLOT.size
+        with self._lock:
+            fd = self._ensure()
+            fcntl.lockf(fd, fcntl.LOCK_EX, length, start)
+            try:
+                now = time.time()
+                offset, tokens = self._find(start, digest, now, rate, burst)
+                wait = 0.0
+                if tokens >= cost:
+                    tokens -= cost
+                else:
+                    wait = (cost - tokens) / rate
+                    self.limited += 1
+                SLOT.pack_into(self._map, offset, digest, tokens, now)
+                return wait
+            finally:
+                fcntl.lockf(fd, fcntl.LOCK_UN, length, start)
+
+    def _find(self, start, digest, now, rate, burst):
+        """
+        (slot offset, refilled tokens) for digest within the group at start.
+        """
+        empty = stale = None
+        for way in range(WAYS):
+            offset = start + way * SLOT.size
+            found, tokens, updated = SLOT.unpack_from(self._map, offset)
+            if found == digest:
+                # A clock step backwards must not drain the bucket
+                elapsed = max(now - updated, 0.0)
+                return offset, min(burst, tokens + elapsed * rate)
+            if found == 0:
+                if empty is None:
+                    empty = offset
+            elif stale is None or updated < stale[1]:
+                stale = (offset, updated)
+        return (empty if empty is not None else stale[0]), burst
+
+
+class ConcurrencyLimiter(_SharedFile):
+    """
+    A global cap on in-flight requests per route class, across all workers.
+
+    Every class owns a run of single-byte fcntl locks in one file; holding a
+    lock is holding a slot. The kernel drops a process's locks when it exits,
+    so a crashed or killed worker never leaks slots.
+    """
+
+    def __init__(self, path, limits, wait=0.0, retry_after=1):
+        super().__init__(path)
+        self.limits = {name: n for name, n in limits.items() if n > 0}
+        self.wait = wait
+        self.retry_after = retry_after
+        self._ranges = {}
+        base = 0
+        for name in sorted(self.limits):
+            self._ranges[name] = (base, self.limits[name])
+            base += self.limits[name]
+        self._held = {}
+        self.rejected = {name: 0 for name in self.limits}
+
+    def _opened(self):
+        self._held = {}
+
+    def _try(self, route_class):
+        base, count = self._ranges[route_class]
+        with self._lock:
+            fd = self._ensure()
+            # Start at a random slot so workers do not all probe the same locks first
+            first = random.randrange(count)
+            for i in range(count):
+                offset = base + (first + i) % count
+                if offset in self._held:
+                    continue
+                try:
+                    fcntl.lockf(fd, fcntl.LOCK_EX | fcntl.LOCK_NB, 1, offset)
+                except OSError as e:
+                    if e.errno in (errno.EACCES, errno.EAGAIN):
+                        continue
+                    raise
+                self._held[offset] = route_class
+                return offset
+        return None
+
+    def acquire(self, route_class):
+        """
+        Take a slot for route_class, waiting up to self.wait seconds for one.
+        Returns a handle for release(), or None for unlimited classes.
+        """
+        if route_class not in self._ranges:
+            return None
+        deadline = time.monotonic() + self.wait
+        while True:
+            slot = self._try(route_class)
+            if slot is not None:
+                return slot
+            if time.monotonic() >= deadline:
+                with self._lock:
+                    self.rejected[route_class] += 1
+                raise Overloaded(route_class, self.retry_after)
+            time.sleep(0.01)
+
+    def release(self, slot):
+        if slot is None:
+            return
+        with self._lock:
+            if self._pid != os.getpid() or self._held.pop(slot, None) is None:
+                return
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, slot)
+
+    def stats(self):
+        with self._lock:
+            in_flight = {name: 0 for name in self.limits}
+            if self._pid == os.getpid():
+                for route_class in self._held.values():
+                    in_flight[route_class] += 1
+            return {
+                name: {'limit': self.limits[name], 'in_flight': in_flight[name], 'rejected': self.rejected[name]}
+                for name in self.limits
+            }
+
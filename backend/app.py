@@ -1,32 +1,101 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, request, jsonify, send_from_directory, send_file, g, Response, stream_with_context
 from flask_cors import CORS
-from werkzeug.security import generate_password_hash, check_password_hash
-from werkzeug.utils import secure_filename
 import jwt
 import json
+import base64
 import os
 import secrets
+import csv
+import io
+import time
+import logging
 from datetime import datetime, timedelta, timezone
 from functools import wraps
+from storage import open_student_store, SORT_KEYS, sort_value
+from audit import AuditLog
+from cache import FileCache, TokenCache
+from catalog import CourseCatalog
+from stats import DashboardStats
+from enrolment import EnrolmentIndex
+from changefeed import ChangeFeed
+from hashing import PasswordHasher, HashPoolBusy
+import course_form
+import bulk_import
+import export
+from registration import check_selection, check_window, find_window, window_scope, window_status
+from tokens import TokenStore
+from waiting_room import WaitingRoom
+import jobs
+from jobs import JobQueue, WorkerPool
+from lazy import Lazy, once
+import snapshot
+from media import store_image, is_immutable, InvalidImage, PHOTO_SIZES, SIGNATURE_SIZES
+import click
+import logconfig
+from metrics import Metrics, InstrumentedStore
+from http_cache import ResponseCache, send_json, compress_response, etag_for
+from admission import TokenBuckets, ConcurrencyLimiter, RateLimited, Overloaded, parse_rate
+
+logconfig.configure()
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key-change-in-production'
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['SIGNATURES_FOLDER'] = 'signatures'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
+app.config['STORAGE_BACKEND'] = os.environ.get('STORAGE_BACKEND', 'sqlite')
+app.config['LOG_MAX_BYTES'] = int(os.environ.get('LOG_MAX_BYTES', 5 * 1024 * 1024))
+app.config['LOG_ROTATE_HOURS'] = int(os.environ.get('LOG_ROTATE_HOURS', 24))
+app.config['HASH_METHOD'] = os.environ.get('HASH_METHOD', 'scrypt:32768:8:1')
+app.config['HASH_POOL_WORKERS'] = int(os.environ.get('HASH_POOL_WORKERS', 2))
+app.config['HASH_QUEUE_SIZE'] = int(os.environ.get('HASH_QUEUE_SIZE', 16))
+app.config['HASH_QUEUE_TIMEOUT'] = float(os.environ.get('HASH_QUEUE_TIMEOUT', 2.0))
+app.config['IMPORT_BATCH_SIZE'] = int(os.environ.get('IMPORT_BATCH_SIZE', 200))
+app.config['METRICS_ALLOWED_IPS'] = os.environ.get('METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',')
+app.config['TOKEN_TTL_DAYS'] = int(os.environ.get('TOKEN_TTL_DAYS', 90))
+app.config['JOB_WORKERS'] = int(os.environ.get('JOB_WORKERS', 2))
+app.config['JOB_MAX_ATTEMPTS'] = int(os.environ.get('JOB_MAX_ATTEMPTS', 3))
+# Token buckets as 'per second/burst'; '0' switches one off. Campus NAT puts many students behind one IP
+app.config['RATE_LIMIT_IP'] = os.environ.get('RATE_LIMIT_IP', '50/500')
+app.config['RATE_LIMIT_MATRIC'] = os.environ.get('RATE_LIMIT_MATRIC', '5/40')
+app.config['RATE_LIMIT_LOGIN'] = os.environ.get('RATE_LIMIT_LOGIN', '0.2/10')
+# Requests in flight at once across all workers, per route class; 0 means unlimited
+app.config['CONCURRENCY_LIMITS'] = {
+    'auth': int(os.environ.get('CONCURRENCY_AUTH', 16)),
+    'read': int(os.environ.get('CONCURRENCY_READ', 64)),
+    'write': int(os.environ.get('CONCURRENCY_WRITE', 24)),
+    # Under sync workers every open change-feed stream pins a worker, so few run at once
+    'stream': int(os.environ.get('CONCURRENCY_STREAM', 8))
+}
+app.config['ADMISSION_WAIT'] = float(os.environ.get('ADMISSION_WAIT', 0.25))
+# A stream ends after this long and the client reconnects from its last event id. Keep it short
+# with sync workers (each stream holds one); with gevent workers it can be raised freely
+app.config['CHANGES_STREAM_SECONDS'] = int(os.environ.get('CHANGES_STREAM_SECONDS', 20))
+# Lifetime of the stream-only tokens EventSource sends in the query string
+app.config['STREAM_TOKEN_SECONDS'] = int(os.environ.get('STREAM_TOKEN_SECONDS', 60))
+app.config['CHANGES_POLL_SECONDS'] = float(os.environ.get('CHANGES_POLL_SECONDS', 1.0))
+app.config['WAITING_ROOM_TICKET_MINUTES'] = float(os.environ.get('WAITING_ROOM_TICKET_MINUTES', 10))
 
 CORS(app, resources={r"/*": {"origins": "http://localhost:3000"}}, supports_credentials=True)
 
-os.makedirs('data', exist_ok=True)
-os.makedirs('uploads', exist_ok=True)
-os.makedirs('signatures', exist_ok=True)
-
 STUDENTS_FILE = 'data/students.json'
 CONFIG_FILE = 'data/config.json'
 TOKENS_FILE = 'data/tokens.json'
 LOGS_FILE = 'data/logs.json'
+LOGS_DIR = 'data/logs'
+IMPORTS_DIR = 'data/imports'
+JOBS_DIR = 'data/jobs'
+SNAPSHOT_FILE = 'data/snapshot.bin'
+
+# Nothing below touches the disk at import time: services are Lazy and built on first use,
+# once per process, so a cold serverless start only pays for what its first request needs
 
+@once
 def init_data_files():
+    for folder in ['data', 'uploads', 'signatures']:
+        os.makedirs(folder, exist_ok=True)
+    
     if not os.path.exists(STUDENTS_FILE):
         with open(STUDENTS_FILE, 'w') as f:
             json.dump([], f)
@@ -40,16 +109,246 @@ def init_data_files():
                 "admins": [],
                 "signatures": {}
             }, f, indent=2)
+
+
+# Catalogs and config compiled by `flask build-snapshot` (see snapshot.py); empty if it was never built
+data_snapshot = Lazy(lambda: snapshot.Snapshot(SNAPSHOT_FILE))
+
+# Per-worker metrics, merged across gunicorn workers through data/metrics when /metrics is scraped
+def open_metrics():
+    init_data_files()
+    collected = Metrics('data/metrics')
+    collected.collect(collect_metrics)
+    return collected
+
+metrics = Lazy(open_metrics)
+
+@once
+def open_storage():
+    """
+    The student store and the indexes that follow its writes, opened together
+    so every write path is subscribed before the first read.
+    """
+    init_data_files()
     
-    if not os.path.exists(TOKENS_FILE):
-        with open(TOKENS_FILE, 'w') as f:
-            json.dump({"carryover": [], "late_registration": []}, f)
+    # Student records live behind a keyed store (sqlite by default; sharded or json files also supported)
+    store = InstrumentedStore(open_student_store(app.config['STORAGE_BACKEND']), metrics)
     
-    if not os.path.exists(LOGS_FILE):
-        with open(LOGS_FILE, 'w') as f:
-            json.dump([], f)
+    # Dashboard counters follow every student write instead of being recounted per request
+    stats = DashboardStats('data/dashboard.db')
+    store.subscribe(stats.apply)
+    if stats.is_empty():
+        stats.rebuild(store.all())
+    
+    # Who is registered for which course, kept current the same way
+    index = EnrolmentIndex('data/enrolment.db')
+    store.subscribe(index.apply)
+    if not index.is_built():
+        index.rebuild(store.all())
+    
+    # Versioned registration events for admin pages that only want deltas
+    feed = ChangeFeed('data/changes.db')
+    store.subscribe(feed.apply)
+    
+    return store, stats, index, feed
+
+students_store = Lazy(lambda: open_storage()[0])
+dashboard_stats = Lazy(lambda: open_storage()[1])
+enrolment_index = Lazy(lambda: open_storage()[2])
+change_feed = Lazy(lambda: open_storage()[3])
+
+def open_audit_log():
+    init_data_files()
+    log = AuditLog(
+        LOGS_DIR,
+        max_bytes=app.config['LOG_MAX_BYTES'],
+        max_age=timedelta(hours=app.config['LOG_ROTATE_HOURS'])
+    )
+    log.import_legacy(LOGS_FILE)
+    return log
+
+audit_log = Lazy(open_audit_log)
+
+# Tokens are looked up by code/matric in SQLite; tokens.json is imported once
+def open_tokens_store():
+    init_data_files()
+    store = TokenStore('data/tokens.db')
+    store.import_legacy(TOKENS_FILE)
+    return store
+
+tokens_store = Lazy(open_tokens_store)
+
+# Every course catalog, indexed and pre-serialized; picks up edits on disk
+def open_course_catalog():
+    init_data_files()
+    return CourseCatalog('data', snapshot=data_snapshot.resolve())
+
+course_catalog = Lazy(open_course_catalog)
+
+# Password hashing runs in a bounded pool so login storms can't starve other endpoints
+password_hasher = Lazy(lambda: PasswordHasher(
+    method=app.config['HASH_METHOD'],
+    workers=app.config['HASH_POOL_WORKERS'],
+    queue_size=app.config['HASH_QUEUE_SIZE'],
+    queue_timeout=app.config['HASH_QUEUE_TIMEOUT']
+))
 
-init_data_files()
+# Long admin work (exports, form bundles, imports) is handed to a local job worker pool;
+# the first web worker to enqueue a job starts it unless `flask jobs-worker` already runs
+def open_job_queue():
+    init_data_files()
+    return JobQueue('data/jobs.db', JOBS_DIR, max_attempts=app.config['JOB_MAX_ATTEMPTS'])
+
+job_queue = Lazy(open_job_queue)
+job_pool = Lazy(lambda: WorkerPool(job_queue.resolve(), 'app', workers=app.config['JOB_WORKERS']))
+
+# Admission state lives in files under data/ so every gunicorn worker on the host shares it
+def open_rate_buckets():
+    init_data_files()
+    return TokenBuckets('data/ratelimit.bin')
+
+rate_buckets = Lazy(open_rate_buckets)
+
+def open_admission():
+    init_data_files()
+    return ConcurrencyLimiter('data/admission.lock', app.config['CONCURRENCY_LIMITS'],
+                              wait=app.config['ADMISSION_WAIT'])
+
+admission = Lazy(open_admission)
+
+# Paced FIFO queues in front of register_courses, one per registration window (see config 'waiting_room')
+def open_waiting_room():
+    init_data_files()
+    return WaitingRoom('data/waiting_room.db', ticket_ttl=app.config['WAITING_ROOM_TICKET_MINUTES'] * 60)
+
+waiting_room = Lazy(open_waiting_room)
+
+def collect_metrics():
+    # Services this process never used are left unbuilt rather than opened just to report zeros
+    samples = []
+    if students_store.built:
+        samples += [
+            ('counter', 'storage_bytes_total', {'direction': 'read'}, students_store.bytes_read),
+            ('counter', 'storage_bytes_total', {'direction': 'write'}, students_store.bytes_written)
+        ]
+    caches = [('files', file_cache), ('tokens', token_cache), ('course_forms', course_form.renders),
+              ('responses', response_cache)]
+    for name, cache in caches:
+        samples.append(('counter', 'cache_hits_total', {'cache': name}, cache.hits))
+        samples.append(('counter', 'cache_misses_total', {'cache': name}, cache.misses))
+    if password_hasher.built:
+        hashing = password_hasher.stats()
+        samples += [
+            ('gauge', 'hash_pool_in_flight', {}, hashing['in_flight']),
+            ('gauge', 'hash_pool_queue_depth', {}, hashing['queue_depth']),
+            ('counter', 'hash_pool_completed_total', {}, hashing['completed']),
+            ('counter', 'hash_pool_rejected_total', {}, hashing['rejected'])
+        ]
+    if admission.built:
+        for name, slots in admission.stats().items():
+            samples.append(('gauge', 'admission_in_flight', {'class': name}, slots['in_flight']))
+    return samples
+
+@app.before_request
+def start_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.inc('http_requests_total', {'method': request.method, 'route': route, 'status': response.status_code})
+        metrics.observe('http_request_duration_seconds', {'method': request.method, 'route': route},
+                        time.perf_counter() - started)
+        metrics.maybe_flush()
+    return response
+
+# Serialized/gzipped bodies of the heavy read endpoints, keyed by ETag
+response_cache = ResponseCache()
+
+# Registered after record_request so it runs first (Flask calls after_request hooks in reverse)
+app.after_request(compress_response)
+
+AUTH_ENDPOINTS = {'login', 'register', 'create_admin'}
+STREAM_ENDPOINTS = {'stream_changes'}
+
+def route_class():
+    if request.endpoint in AUTH_ENDPOINTS:
+        return 'auth'
+    if request.endpoint in STREAM_ENDPOINTS:
+        return 'stream'
+    return 'read' if request.method in ('GET', 'HEAD') else 'write'
+
+@once
+def rate_limits():
+    return {scope: parse_rate(app.config[f'RATE_LIMIT_{scope.upper()}']) for scope in ('ip', 'matric', 'login')}
+
+def check_rate(scope, key):
+    limit = rate_limits()[scope]
+    if limit and key:
+        wait = rate_buckets.take(f'{scope}:{key}', *limit)
+        if wait:
+            raise RateLimited(scope, wait)
+
+@app.before_request
+def admit_request():
+    """
+    Registration-day surge control: per-IP and per-student token buckets, then a
+    global in-flight slot for the route class. Over the limit gets 429/503 with
+    Retry-After, so requests that are admitted keep their latency.
+    """
+    if request.method == 'OPTIONS' or not request.path.startswith('/api/'):
+        return None
+    
+    check_rate('ip', request.remote_addr)
+    if request.endpoint == 'login':
+        # Limit guesses per account, whichever addresses they come from
+        data = request.get_json(silent=True)
+        check_rate('login', data.get('matric_number') if isinstance(data, dict) else None)
+    elif authenticate() is None and not g.is_admin:
+        check_rate('matric', g.current_user)
+    
+    g.admission_slot = admission.acquire(route_class())
+    return None
+
+@app.teardown_request
+def release_admission(exc):
+    slot = g.pop('admission_slot', None)
+    if slot is not None:
+        admission.release(slot)
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """
+    Prometheus text format, for scrapers on this host (METRICS_ALLOWED_IPS)
+    """
+    if request.remote_addr not in app.config['METRICS_ALLOWED_IPS']:
+        return jsonify({'message': 'Forbidden'}), 403
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.errorhandler(RateLimited)
+def rate_limited(e):
+    metrics.inc('admission_rejected_total', {'reason': 'rate', 'scope': e.scope})
+    response = jsonify({'message': 'Too many requests, please slow down'})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response
+
+@app.errorhandler(Overloaded)
+def overloaded(e):
+    metrics.inc('admission_rejected_total', {'reason': 'concurrency', 'scope': e.route_class})
+    response = jsonify({'message': 'Server busy, please try again shortly'})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response
+
+@app.errorhandler(HashPoolBusy)
+def hash_pool_busy(e):
+    response = jsonify({'message': 'Server busy, please try again shortly'})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response
 
 def read_json(filepath):
     try:
@@ -58,55 +357,105 @@ def read_json(filepath):
     except:
         return [] if 'logs' in filepath or 'students' in filepath else {}
 
+# Config and course catalogs change a few times per term; serve reads from memory
+file_cache = FileCache()
+
+def read_cached_json(filepath):
+    """
+    Like read_json, but shared between requests. Do not mutate the result.
+    """
+    init_data_files()
+    try:
+        data = file_cache.get(filepath, loader=data_snapshot.load_json)
+    except:
+        data = None
+    if data is None:
+        return [] if 'logs' in filepath or 'students' in filepath else {}
+    return data
+
+def json_bytes(data):
+    return json.dumps(data, separators=(',', ':')).encode('utf-8')
+
 def write_json(filepath, data):
-    with open(filepath, 'w') as f:
+    # Write to a temp file and rename so readers never see a half-written file
+    tmp = f"{filepath}.{os.getpid()}.tmp"
+    with open(tmp, 'w') as f:
         json.dump(data, f, indent=2)
+    os.replace(tmp, filepath)
+    file_cache.bump(filepath)
 
 def add_log(action, user, details=""):
-    logs = read_json(LOGS_FILE)
-    logs.append({
-        "timestamp": datetime.now().isoformat(),
-        "action": action,
-        "user": user,
-        "details": details
-    })
-    write_json(LOGS_FILE, logs)
+    audit_log.append(action, user, details)
 
-def token_required(f):
-    @wraps(f)
-    def decorated(*args, **kwargs):
-        auth = request.headers.get('Authorization', '')
-        token = auth[7:] if auth.startswith('Bearer ') else auth
-        
-        if not token:
-            return jsonify({'message': 'Token missing'}), 401
-        
+# Verified claims are cached until the token expires, so each token is decoded once
+token_cache = TokenCache()
+
+def authenticate():
+    """
+    Verify the bearer token once per request and put the identity on flask.g
+    Returns None on success, otherwise the error message
+    """
+    if 'current_user' in g:
+        return None
+    
+    auth = request.headers.get('Authorization', '')
+    token = auth[7:] if auth.startswith('Bearer ') else auth
+    
+    # EventSource cannot set headers, so event streams take a stream-only token from the query string
+    from_query = not token and request.endpoint in STREAM_ENDPOINTS
+    if from_query:
+        token = request.args.get('access_token', '')
+    
+    if not token:
+        return 'Token missing'
+    
+    claims = token_cache.get(token)
+    if claims is None:
         try:
-            data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
-            return f(data['matric_number'], data.get('is_admin', False), *args, **kwargs)
+            claims = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
         except jwt.ExpiredSignatureError:
-            return jsonify({'message': 'Token expired'}), 401
+            return 'Token expired'
         except jwt.InvalidTokenError:
-            return jsonify({'message': 'Invalid token'}), 401
+            return 'Invalid token'
+        if 'matric_number' not in claims:
+            return 'Invalid token'
+        token_cache.put(token, claims)
+    
+    # Query strings end up in logs, so only short-lived stream tokens go there, and only there
+    if (claims.get('scope') == 'stream') != from_query:
+        return 'Invalid token'
+    
+    g.current_user = claims['matric_number']
+    g.is_admin = claims.get('is_admin', False)
+    return None
+
+def current_student():
+    """
+    The logged-in student's record, loaded at most once per request
+    """
+    if 'student' not in g:
+        g.student = None if g.is_admin else students_store.get(g.current_user)
+    return g.student
+
+def token_required(f):
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        error = authenticate()
+        if error:
+            return jsonify({'message': error}), 401
+        return f(g.current_user, g.is_admin, *args, **kwargs)
     
     return decorated
 
 def admin_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
-        auth = request.headers.get('Authorization', '')
-        token = auth[7:] if auth.startswith('Bearer ') else auth
-        
-        if not token:
-            return jsonify({'message': 'Token missing'}), 401
-        
-        try:
-            data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
-            if not data.get('is_admin'):
-                return jsonify({'message': 'Admin only'}), 403
-            return f(data['matric_number'], *args, **kwargs)
-        except:
-            return jsonify({'message': 'Invalid token'}), 401
+        error = authenticate()
+        if error:
+            return jsonify({'message': 'Token missing' if error == 'Token missing' else 'Invalid token'}), 401
+        if not g.is_admin:
+            return jsonify({'message': 'Admin only'}), 403
+        return f(g.current_user, *args, **kwargs)
     
     return decorated
 
@@ -120,32 +469,35 @@ def register():
         if not data.get(field):
             return jsonify({'message': f'{field} required'}), 400
     
-    students = read_json(STUDENTS_FILE)
-    
-    if any(s['matric_number'] == data['matric_number'] for s in students):
+    if students_store.exists(data['matric_number']):
         return jsonify({'message': 'Matric number exists'}), 400
     
-    photo_path = None
+    # Photos are normalised once on upload: rotated, resized and content-hash named
+    photo_paths = {}
     if photo:
-        filename = secure_filename(f"{data['matric_number']}_{photo.filename}")
-        photo_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        photo.save(photo_path)
+        try:
+            photo_paths = store_image(photo, app.config['UPLOAD_FOLDER'], PHOTO_SIZES)
+        except InvalidImage:
+            return jsonify({'message': 'Invalid photo'}), 400
     
-    students.append({
+    created = students_store.insert({
         'full_name': data['full_name'],
         'matric_number': data['matric_number'],
         'department': data['department'],
         'level': data['level'],
         'email': data.get('email', ''),
         'phone': data.get('phone', ''),
-        'password': generate_password_hash(data['password']),
-        'photo': photo_path,
+        'password': password_hasher.hash(data['password']),
+        'photo': photo_paths.get('print'),
+        'photo_thumb': photo_paths.get('thumb'),
         'registered_courses': {'first_semester': [], 'second_semester': []},
         'registration_status': {'first_semester': 'not_started', 'second_semester': 'not_started'},
         'created_at': datetime.now().isoformat()
     })
     
-    write_json(STUDENTS_FILE, students)
+    if not created:
+        return jsonify({'message': 'Matric number exists'}), 400
+    
     add_log('register', data['matric_number'])
     
     return jsonify({'message': 'Success'}), 201
@@ -158,10 +510,16 @@ def login():
         return jsonify({'message': 'Credentials required'}), 400
     
     # Check admin first
-    config = read_json(CONFIG_FILE)
+    config = read_cached_json(CONFIG_FILE)
     admin = next((a for a in config.get('admins', []) if a['matric_number'] == data['matric_number']), None)
     
-    if admin and check_password_hash(admin['password'], data['password']):
+    if admin:
+        if not password_hasher.verify(admin['password'], data['password']):
+            return jsonify({'message': 'Invalid credentials'}), 401
+        
+        if password_hasher.needs_rehash(admin['password']):
+            rehash_admin_password(admin['matric_number'], data['password'])
+        
         token = jwt.encode({
             'matric_number': admin['matric_number'],
             'is_admin': True,
@@ -178,12 +536,17 @@ def login():
         }), 200
     
     # Check student
-    students = read_json(STUDENTS_FILE)
-    student = next((s for s in students if s['matric_number'] == data['matric_number']), None)
+    student = students_store.get(data['matric_number'])
     
-    if not student or not check_password_hash(student['password'], data['password']):
+    if not student or not password_hasher.verify(student['password'], data['password']):
         return jsonify({'message': 'Invalid credentials'}), 401
     
+    # Upgrade hashes made with older parameters while we have the plain password
+    if password_hasher.needs_rehash(student['password']):
+        new_hash = password_hasher.hash(data['password'])
+        students_store.update(student['matric_number'], lambda s: s.update(password=new_hash))
+        password_hasher.rehashed()
+    
     token = jwt.encode({
         'matric_number': student['matric_number'],
         'is_admin': False,
@@ -201,14 +564,22 @@ def login():
         }
     }), 200
 
+def rehash_admin_password(matric, password):
+    new_hash = password_hasher.hash(password)
+    config = read_json(CONFIG_FILE)
+    for a in config.get('admins', []):
+        if a['matric_number'] == matric:
+            a['password'] = new_hash
+    write_json(CONFIG_FILE, config)
+    password_hasher.rehashed()
+
 @app.route('/api/student/profile', methods=['GET'])
 @token_required
 def get_profile(current_user, is_admin):
     if is_admin:
         return jsonify({'message': 'Not for admin'}), 403
     
-    students = read_json(STUDENTS_FILE)
-    student = next((s for s in students if s['matric_number'] == current_user), None)
+    student = current_student()
     
     if not student:
         return jsonify({'message': 'Not found'}), 404
@@ -224,30 +595,15 @@ def get_courses(current_user, is_admin, department, level, semester):
     Get courses for a specific department, level, and semester
     """
     semester_name = 'first' if semester == 'first_semester' else 'second'
-    filename = f"data/{department.lower()}_{semester_name}_semester.json"
-    
-    print(f"[COURSES] Loading: {filename} for level {level}")
+    entry = course_catalog.level(department, level, semester_name)
     
-    if not os.path.exists(filename):
-        print(f"[COURSES] File not found: {filename}")
+    if entry is None:
+        filename = f"data/{department.lower()}_{semester_name}_semester.json"
+        logger.debug('course catalog not found', extra={'file': filename})
         return jsonify({'message': 'Courses not found', 'file': filename}), 404
     
-    try:
-        course_data = read_json(filename)
-        
-        # Handle nested structure: {"courses": {"100": [...], "200": [...]}}
-        if 'courses' in course_data:
-            all_courses = course_data['courses']
-            level_courses = all_courses.get(level, [])
-        else:
-            level_courses = course_data
-        
-        print(f"[COURSES] Found {len(level_courses)} courses for level {level}")
-        return jsonify(level_courses)
-        
-    except Exception as e:
-        print(f"[COURSES] Error: {str(e)}")
-        return jsonify({'message': 'Error loading courses', 'error': str(e)}), 500
+    # Body and ETag are computed once per catalog version; unchanged lists get a 304
+    return send_json(entry['body'], entry['etag'], cache=response_cache)
 
 # ============= FIXED: REGISTER COURSES (RESPECTS ACTIVE SEMESTER) =============
 @app.route('/api/student/register-courses', methods=['POST'])
@@ -264,7 +620,7 @@ def register_courses(current_user, is_admin):
         return jsonify({'message': 'Invalid semester'}), 400
     
     # ============= CHECK ACTIVE SEMESTER =============
-    config = read_json(CONFIG_FILE)
+    config = read_cached_json(CONFIG_FILE)
     active_semester = config.get('active_semester', 'first')
     
     # Map active_semester to database format
@@ -278,41 +634,172 @@ def register_courses(current_user, is_admin):
             'message': f'Registration closed for {semester_name} Semester. Only {active_name} Semester is active.'
         }), 400
     
-    students = read_json(STUDENTS_FILE)
-    student_idx = next((i for i, s in enumerate(students) if s['matric_number'] == current_user), None)
+    student = current_student()
     
-    if student_idx is None:
+    if not student:
         return jsonify({'message': 'Not found'}), 404
     
-    student = students[student_idx]
-    
     # Check if already submitted
     if student['registration_status'][semester] in ['pending', 'approved']:
         return jsonify({'message': 'Already registered'}), 400
     
-    total_units = sum(c.get('units', 0) for c in courses)
-    max_units = config['max_units'].get(student['level'], 24)
+    # Levels and departments register in their own windows, through the waiting room when it is on
+    window = student_window(config, student)
+    state = window_status(window)
+    if state != 'open':
+        when = f"opens at {window['start']}" if state == 'upcoming' else f"closed at {window['end']}"
+        return jsonify({'message': f'Registration for your level and department {when}',
+                        'window': window_info(window)}), 400
+    
+    if waiting_room_rate(config, window) and not waiting_room.admitted(current_user, semester):
+        return jsonify({'message': 'Please join the registration waiting room', 'waiting_room': True}), 403
+    
+    # Courses are resolved by code against the catalog; units and schedules come from the server copy
+    selection = check_registration(student, semester, courses, config)
+    if not selection['valid']:
+        return jsonify({'message': selection['errors'][0], 'errors': selection['errors'],
+                        'clashes': selection['clashes']}), 400
+    
+    # Seats in capped courses are claimed atomically across workers before the registration is saved
+    codes = [c['courseCode'] for c in selection['courses']]
+    full = enrolment_index.reserve(current_user, semester, codes, config.get('course_capacity', {}))
+    if full:
+        return jsonify({'message': f"Course full: {', '.join(full)}", 'full': full}), 409
+    
+    def submit(s):
+        s['registered_courses'][semester] = selection['courses']
+        s['registration_status'][semester] = 'pending'
+    
+    # A failed save must not keep the seats it claimed
+    try:
+        saved = students_store.update(current_user, submit)
+    except Exception:
+        enrolment_index.release(current_user, semester, student)
+        raise
+    if saved is None:
+        enrolment_index.release(current_user, semester, None)
+        return jsonify({'message': 'Not found'}), 404
+    add_log('register_courses', current_user, f"{semester}")
     
-    if total_units > max_units:
-        return jsonify({'message': f'Exceeded max ({max_units})'}), 400
+    if waiting_room_rate(config, window):
+        waiting_room.leave(current_user)
     
-    students[student_idx]['registered_courses'][semester] = courses
-    students[student_idx]['registration_status'][semester] = 'pending'
+    return jsonify({'message': 'Success', 'total_units': selection['total_units']}), 200
+
+def student_window(config, student):
+    return find_window(config.get('registration_windows'), student.get('department', ''), student.get('level', ''))
+
+def window_info(window):
+    if window is None:
+        return None
+    return {'start': window['start'], 'end': window['end'], 'status': window_status(window)}
+
+def waiting_room_rate(config, window):
+    """
+    Admissions per minute for window's queue, or None when the waiting room is off
+    """
+    room = config.get('waiting_room') or {}
+    if not room.get('enabled'):
+        return None
+    return (window or {}).get('admit_per_minute') or room.get('admit_per_minute', 60)
+
+@app.route('/api/student/waiting-room', methods=['GET', 'POST'])
+@token_required
+def student_waiting_room(current_user, is_admin):
+    """
+    POST joins the queue for the active semester; GET polls it (every poll_after seconds)
+    """
+    if is_admin:
+        return jsonify({'message': 'Not for admin'}), 403
     
-    write_json(STUDENTS_FILE, students)
-    add_log('register_courses', current_user, f"{semester}")
+    student = current_student()
+    if not student:
+        return jsonify({'message': 'Not found'}), 404
+    
+    config = read_cached_json(CONFIG_FILE)
+    semester = 'first_semester' if config.get('active_semester', 'first') == 'first' else 'second_semester'
+    window = student_window(config, student)
+    rate = waiting_room_rate(config, window)
+    body = {'semester': semester, 'window': window_info(window)}
+    
+    state = window_status(window)
+    if state != 'open':
+        body['status'] = state
+    elif student['registration_status'][semester] in ['pending', 'approved']:
+        body['status'] = 'registered'
+    elif rate is None:
+        body['status'] = 'open'
+    elif request.method == 'POST':
+        body.update(waiting_room.join(current_user, window_scope(window), semester, rate))
+    else:
+        body.update(waiting_room.status(current_user, rate) or {'status': 'not_joined'})
+    
+    if 'expires' in body:
+        body['expires_at'] = datetime.fromtimestamp(body.pop('expires'), timezone.utc).isoformat()
+    
+    response = jsonify(body)
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+def check_registration(student, semester, courses, config):
+    # Granted carryovers live on the student record, since used tokens are compacted away;
+    # tokens used before they were copied there still count while they last
+    carryovers = list(student.get('carryover_courses', [])) + [
+        course
+        for token in tokens_store.for_student(student['matric_number'])
+        if token['type'] == 'carryover' and token.get('used')
+        for course in token.get('courses', [])
+    ]
+    max_units = config.get('max_units', {}).get(student['level'], 24)
+    return check_selection(course_catalog, student, semester, courses, max_units, carryovers)
+
+@app.route('/api/student/validate-registration', methods=['POST'])
+@token_required
+def validate_registration(current_user, is_admin):
+    """
+    Dry run of register_courses for a selection being built: resolved courses,
+    total units, clashes and errors. Nothing is saved.
+    """
+    if is_admin:
+        return jsonify({'message': 'Not allowed'}), 403
+    
+    data = request.json or {}
+    semester = data.get('semester')
+    if semester not in ['first_semester', 'second_semester']:
+        return jsonify({'message': 'Invalid semester'}), 400
+    
+    student = current_student()
+    if not student:
+        return jsonify({'message': 'Not found'}), 404
+    
+    selection = check_registration(student, semester, data.get('courses', []), read_cached_json(CONFIG_FILE))
+    
+    # Clashing pairs within the student's level, so the course list can flag them up front
+    entry = course_catalog.level(student['department'], student['level'],
+                                 'first' if semester == 'first_semester' else 'second')
+    selection['conflicts'] = {code: sorted(codes) for code, codes in (entry or {}).get('clashes', {}).items()}
     
-    return jsonify({'message': 'Success', 'total_units': total_units}), 200
+    return jsonify(selection)
 
 @app.route('/api/config', methods=['GET'])
 @token_required
 def get_config(current_user, is_admin):
-    config = read_json(CONFIG_FILE)
-    return jsonify({
+    config = read_cached_json(CONFIG_FILE)
+    body = {
         'active_semester': config.get('active_semester'),
         'registration_deadline': config.get('registration_deadline'),
         'max_units': config.get('max_units')
-    })
+    }
+    
+    if is_admin:
+        body['registration_windows'] = config.get('registration_windows', [])
+        body['waiting_room'] = config.get('waiting_room', {'enabled': False})
+    elif current_student():
+        window = student_window(config, current_student())
+        body['registration_window'] = window_info(window)
+        body['waiting_room'] = waiting_room_rate(config, window) is not None
+    
+    return jsonify(body)
 
 # ============= NEW: GET REGISTERED COURSES FOR COURSE FORM =============
 @app.route('/api/student/registered-courses/<semester>', methods=['GET'])
@@ -325,14 +812,13 @@ def get_registered_courses(current_user, is_admin, semester):
     if semester not in ['first_semester', 'second_semester']:
         return jsonify({'message': 'Invalid semester'}), 400
     
-    students = read_json(STUDENTS_FILE)
-    student = next((s for s in students if s['matric_number'] == current_user), None)
+    student = current_student()
     
     if not student:
         return jsonify({'message': 'Not found'}), 404
     
-    # Return courses and registration status
-    return jsonify({
+    # Return courses and registration status; the ETag is a digest of the body
+    return send_json(json_bytes({
         'courses': student['registered_courses'].get(semester, []),
         'status': student['registration_status'].get(semester, 'not_started'),
         'student': {
@@ -341,45 +827,519 @@ def get_registered_courses(current_user, is_admin, semester):
             'department': student['department'],
             'level': student['level']
         }
-    }), 200
+    }))
+
+# ============= SERVER-SIDE COURSE FORM PDF =============
+@app.route('/api/student/course-form/<semester>.pdf', methods=['GET'])
+@token_required
+def get_course_form_pdf(current_user, is_admin, semester):
+    """
+    Render the student's course form as a PDF
+    Cached per registration version; unchanged forms are answered with 304
+    """
+    if is_admin:
+        return jsonify({'message': 'Not for admin'}), 403
+    
+    if semester not in ['first_semester', 'second_semester']:
+        return jsonify({'message': 'Invalid semester'}), 400
+    
+    student = current_student()
+    if not student:
+        return jsonify({'message': 'Not found'}), 404
+    
+    if not student['registered_courses'].get(semester):
+        return jsonify({'message': 'No courses registered'}), 404
+    
+    signatures = read_cached_json(CONFIG_FILE).get('signatures', {})
+    pdf, version = course_form.get_pdf(student, semester, signatures)
+    
+    response = Response(pdf, mimetype='application/pdf')
+    response.headers['Content-Disposition'] = f'inline; filename="course_form_{semester}.pdf"'
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.set_etag(version)
+    return response.make_conditional(request)
+
+@app.route('/api/admin/course-forms/<department>/<level>/<semester>.zip', methods=['GET'])
+@admin_required
+def export_course_forms(current_user, department, level, semester):
+    """
+    Stream a ZIP of every approved course form for a department/level/semester
+    With ?async=1 the ZIP is built by a background job instead
+    """
+    options, error = course_forms_options({'department': department, 'level': level, 'semester': semester})
+    if error:
+        return jsonify({'message': error}), 400
+    
+    add_log('course_forms_export', current_user, f"{department} {level} {semester}")
+    if request.args.get('async'):
+        return enqueue_job('course_forms', options, current_user)
+    
+    signatures = read_cached_json(CONFIG_FILE).get('signatures', {})
+    approved_students = iter_students(department=department, level=level, status='approved', semester=semester)
+    
+    return Response(
+        stream_with_context(course_form.stream_zip(approved_students, semester, signatures)),
+        mimetype='application/zip',
+        headers={'Content-Disposition': f'attachment; filename="{course_forms_filename(**options)}"'}
+    )
+
+def course_forms_options(params):
+    if params.get('semester') not in ['first_semester', 'second_semester']:
+        return None, 'Invalid semester'
+    if not params.get('department') or not params.get('level'):
+        return None, 'department and level required'
+    return {k: params[k] for k in ['department', 'level', 'semester']}, None
+
+def course_forms_filename(department, level, semester):
+    return f"course_forms_{department}_{level}_{semester}.zip"
+
+@jobs.task('course_forms')
+def course_forms_task(job, department, level, semester):
+    signatures = read_cached_json(CONFIG_FILE).get('signatures', {})
+    approved_students = job.track(
+        iter_students(department=department, level=level, status='approved', semester=semester), every=20
+    )
+    path = job.output('zip', course_forms_filename(department, level, semester), 'application/zip')
+    with open(path, 'wb') as f:
+        for chunk in course_form.stream_zip(approved_students, semester, signatures):
+            f.write(chunk)
+    return {'forms': job.done}
+
+def iter_students(page_size=100, **filters):
+    """
+    Lazily walk every student matching filters in matric order, one page at a time
+    """
+    after = None
+    while True:
+        page = students_store.query(sort='matric_number', limit=page_size, after=after, **filters)
+        yield from page
+        if len(page) < page_size:
+            return
+        after = [page[-1]['matric_number'], page[-1]['matric_number']]
+
+@app.route('/api/admin/export/registrations.<fmt>', methods=['GET'])
+@admin_required
+def export_registrations(current_user, fmt):
+    """
+    Stream registrations as CSV or NDJSON, filtered by department, level,
+    semester and status. rows=course (default) gives one row per registered
+    course, rows=student one row per student and semester.
+    With ?async=1 the file is written by a background job instead.
+    """
+    options, error = export_options(dict(request.args, format=fmt))
+    if error:
+        return jsonify({'message': error}), 400
+    
+    add_log('registrations_export', current_user, request.query_string.decode('utf-8', 'replace'))
+    if request.args.get('async'):
+        return enqueue_job('export_registrations', options, current_user)
+    
+    return Response(
+        stream_with_context(export.stream(export_students(options), fmt, options['rows'],
+                                          options['semester'], options['status'])),
+        mimetype=EXPORT_TYPES[fmt],
+        headers={'Content-Disposition': f'attachment; filename="{export_filename(options)}"'}
+    )
+
+EXPORT_TYPES = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+def export_options(params):
+    """
+    Validated registration export options, or (None, error message)
+    """
+    fmt = params.get('format', 'csv')
+    if fmt not in EXPORT_TYPES:
+        return None, 'Invalid format'
+    
+    per = params.get('rows', 'course')
+    if per not in ['course', 'student']:
+        return None, 'Invalid rows (use course or student)'
+    
+    semester = params.get('semester')
+    if semester and semester not in ['first_semester', 'second_semester']:
+        return None, 'Invalid semester'
+    
+    options = {'format': fmt, 'rows': per}
+    for key in ['department', 'level', 'semester', 'status']:
+        options[key] = params.get(key) or None
+    return options, None
+
+def export_students(options):
+    return iter_students(
+        page_size=500,
+        department=options['department'],
+        level=options['level'],
+        status=options['status'],
+        semester=options['semester']
+    )
+
+def export_filename(options):
+    parts = ['registrations'] + [options[k] for k in ['department', 'level', 'semester', 'status'] if options[k]]
+    return '_'.join(parts).replace('/', '_') + f".{options['format']}"
+
+@jobs.task('export_registrations')
+def export_registrations_task(job, **options):
+    fmt = options['format']
+    path = job.output(fmt, export_filename(options), EXPORT_TYPES[fmt])
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        students = job.track(export_students(options), every=500)
+        for chunk in export.stream(students, fmt, options['rows'], options['semester'], options['status']):
+            f.write(chunk)
+    return {'students': job.done}
+
+# ============= BACKGROUND JOBS =============
+# Kinds an admin may enqueue directly, with the validator for their params
+JOB_OPTIONS = {
+    'export_registrations': export_options,
+    'course_forms': course_forms_options
+}
+
+def enqueue_job(kind, params, current_user):
+    job = job_queue.enqueue(kind, params, current_user)
+    job_pool.start()
+    add_log('job_enqueue', current_user, f"{kind} {job['id']}")
+    return jsonify(job), 202
+
+@app.route('/api/admin/jobs', methods=['POST'])
+@admin_required
+def create_job(current_user):
+    """
+    Enqueue {kind, params}; returns the job (202) for polling
+    """
+    data = request.get_json(silent=True) or {}
+    validate = JOB_OPTIONS.get(data.get('kind'))
+    if validate is None:
+        return jsonify({'message': f"Invalid kind (use one of {', '.join(JOB_OPTIONS)})"}), 400
+    
+    options, error = validate(data.get('params') or {})
+    if error:
+        return jsonify({'message': error}), 400
+    return enqueue_job(data['kind'], options, current_user)
+
+@app.route('/api/admin/jobs', methods=['GET'])
+@admin_required
+def list_jobs(current_user):
+    try:
+        limit = min(max(int(request.args.get('limit', 50)), 1), 200)
+    except ValueError:
+        return jsonify({'message': 'Invalid limit'}), 400
+    return jsonify(job_queue.list(status=request.args.get('status'), limit=limit))
+
+@app.route('/api/admin/jobs/<job_id>', methods=['GET'])
+@admin_required
+def get_job(current_user, job_id):
+    job = job_queue.get(job_id)
+    if not job:
+        return jsonify({'message': 'Job not found'}), 404
+    return jsonify(job)
+
+@app.route('/api/admin/jobs/<job_id>/cancel', methods=['POST'])
+@admin_required
+def cancel_job(current_user, job_id):
+    """
+    Queued jobs are cancelled at once; running ones stop at their next progress report
+    """
+    job = job_queue.cancel(job_id)
+    if not job:
+        return jsonify({'message': 'Job not found'}), 404
+    add_log('job_cancel', current_user, f"{job['kind']} {job_id}")
+    return jsonify(job)
+
+@app.route('/api/admin/jobs/<job_id>/result', methods=['GET'])
+@admin_required
+def download_job_result(current_user, job_id):
+    job = job_queue.get(job_id)
+    if not job:
+        return jsonify({'message': 'Job not found'}), 404
+    if job['status'] != 'completed':
+        return jsonify({'message': f"Job is {job['status']}"}), 409
+    
+    result = job_queue.result_file(job_id)
+    if not result or not os.path.exists(result[0]):
+        return jsonify({'message': 'Job has no file'}), 404
+    path, name, mimetype = result
+    return send_file(os.path.abspath(path), mimetype=mimetype, as_attachment=True, download_name=name)
+
+@app.cli.command('jobs-worker')
+@click.option('--workers', type=int, default=None, help='Worker processes (default JOB_WORKERS).')
+def jobs_worker_command(workers):
+    """
+    Run the background job worker pool in the foreground
+    """
+    if workers:
+        job_pool.workers = workers
+    if job_pool.run() is False:
+        click.echo('Another process is already running the job workers')
+
+@app.cli.command('compact-tokens')
+def compact_tokens_command():
+    """
+    Delete expired tokens and tokens used long ago
+    """
+    click.echo(f"Removed {tokens_store.compact()} tokens")
 
 @app.route('/api/admin/dashboard', methods=['GET'])
 @admin_required
 def admin_dashboard(current_user):
-    students = read_json(STUDENTS_FILE)
-    
-    stats = {
-        'total_students': len(students),
-        'pending_approvals': sum(1 for s in students 
-            if s['registration_status']['first_semester'] == 'pending' 
-            or s['registration_status']['second_semester'] == 'pending'),
-        'by_level': {},
-        'by_department': {}
-    }
-    
-    for s in students:
-        level = s.get('level', 'Unknown')
-        dept = s.get('department', 'Unknown')
-        stats['by_level'][level] = stats['by_level'].get(level, 0) + 1
-        stats['by_department'][dept] = stats['by_department'].get(dept, 0) + 1
-    
-    return jsonify(stats)
+    return jsonify(dashboard_stats.snapshot())
+
+@app.route('/api/admin/changes', methods=['GET'])
+@admin_required
+def get_changes(current_user):
+    """
+    Registration events after ?since=<version>, oldest first. Without since only
+    the current version is returned: read it before loading a list, then ask for
+    what changed after it.
+    """
+    try:
+        limit = min(max(int(request.args.get('limit', 500)), 1), 1000)
+        since = request.args.get('since')
+        since = None if since in (None, '') else int(since)
+    except ValueError:
+        return jsonify({'message': 'Invalid since or limit'}), 400
+    
+    if since is None:
+        return jsonify({'version': change_feed.version(), 'events': [], 'more': False, 'reset': False})
+    return jsonify(change_feed.since(since, limit))
+
+@app.route('/api/admin/changes/stream-token', methods=['POST'])
+@admin_required
+def create_stream_token(current_user):
+    """
+    A short-lived token that only opens /api/admin/changes/stream, for the
+    query string of an EventSource (the session token never goes in a URL)
+    """
+    token = jwt.encode({
+        'matric_number': current_user,
+        'is_admin': True,
+        'scope': 'stream',
+        'exp': datetime.now(timezone.utc) + timedelta(seconds=app.config['STREAM_TOKEN_SECONDS'])
+    }, app.config['SECRET_KEY'], algorithm='HS256')
+    return jsonify({'token': token, 'expires_in': app.config['STREAM_TOKEN_SECONDS']})
+
+def sse(event, data, event_id=None):
+    lines = [f'id: {event_id}'] if event_id is not None else []
+    lines += [f'event: {event}', f'data: {json.dumps(data, separators=(",", ":"))}']
+    return '\n'.join(lines) + '\n\n'
+
+@app.route('/api/admin/changes/stream', methods=['GET'])
+@admin_required
+def stream_changes(current_user):
+    """
+    The change feed as server-sent events ('registration', or 'reset' when the
+    client must reload), resuming from Last-Event-ID or ?since. Every worker polls
+    the same feed database, so any worker can serve any stream. Authenticated
+    with ?access_token=<stream token> from /api/admin/changes/stream-token.
+    
+    Each stream ends after CHANGES_STREAM_SECONDS so that, on sync workers, a
+    worker and a 'stream' admission slot are never held for long; clients
+    reconnect and resume. Run gunicorn with gevent workers to serve many.
+    """
+    try:
+        since = request.headers.get('Last-Event-ID') or request.args.get('since')
+        since = change_feed.version() if since in (None, '') else int(since)
+    except ValueError:
+        return jsonify({'message': 'Invalid since'}), 400
+    
+    feed = change_feed.resolve()
+    deadline = time.monotonic() + app.config['CHANGES_STREAM_SECONDS']
+    poll = app.config['CHANGES_POLL_SECONDS']
+    
+    def generate():
+        version = since
+        # Reconnect quickly when the stream ends on schedule
+        yield 'retry: 1000\n\n'
+        quiet_since = time.monotonic()
+        while time.monotonic() < deadline:
+            batch = feed.since(version, 200)
+            if batch['reset']:
+                yield sse('reset', {'version': batch['version']}, batch['version'])
+            for event in batch['events']:
+                yield sse('registration', event, event['version'])
+            if batch['reset'] or batch['events']:
+                quiet_since = time.monotonic()
+            version = batch['version']
+            if batch['more']:
+                continue
+            if time.monotonic() - quiet_since >= 15:
+                # Comment line, so proxies do not close an idle connection
+                yield ': keepalive\n\n'
+                quiet_since = time.monotonic()
+            time.sleep(poll)
+    
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    # With stream_with_context, teardown_request runs once when this view returns (while the
+    # stream is still open) and again when the stream closes. Taking the slot out of g keeps
+    # the first run from freeing it; it is released once, when the response closes
+    slot = g.pop('admission_slot', None)
+    response.call_on_close(lambda: admission.release(slot))
+    return response
 
 @app.route('/api/admin/students', methods=['GET'])
 @admin_required
 def get_students(current_user):
-    students = read_json(STUDENTS_FILE)
+    """
+    List students. Without paging parameters returns the full filtered array (legacy);
+    with limit/cursor returns {'students': [...], 'next_cursor': ...} and also accepts
+    status, semester, q (name/matric prefix), sort (prefix '-' for descending) and fields.
+    """
+    paging = {'limit', 'cursor', 'sort', 'status', 'semester', 'q', 'fields'}
+    if paging & set(request.args):
+        return get_students_page()
+    
     dept = request.args.get('department')
     level = request.args.get('level')
     
-    filtered = students
-    if dept:
-        filtered = [s for s in filtered if s.get('department') == dept]
-    if level:
-        filtered = [s for s in filtered if s.get('level') == level]
+    def build():
+        filtered = students_store.all()
+        if dept:
+            filtered = [s for s in filtered if s.get('department') == dept]
+        if level:
+            filtered = [s for s in filtered if s.get('level') == level]
+        return json_bytes([{k: v for k, v in s.items() if k != 'password'} for s in filtered])
+    
+    # Every student write bumps the data version, so it identifies this list across workers
+    version, modified = dashboard_stats.version()
+    return send_json(
+        build,
+        etag_for('students', version, dept, level),
+        last_modified=datetime.fromtimestamp(modified, timezone.utc) if version else None,
+        cache=response_cache
+    )
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor):
+    values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    if not isinstance(values, list) or len(values) != 2:
+        raise ValueError('bad cursor')
+    return values
+
+def get_students_page():
+    args = request.args
+    
+    try:
+        limit = min(max(int(args.get('limit', 50)), 1), 500)
+    except ValueError:
+        return jsonify({'message': 'Invalid limit'}), 400
+    
+    sort = args.get('sort', 'created_at')
+    descending = sort.startswith('-')
+    sort = sort.lstrip('-')
+    if sort not in SORT_KEYS:
+        return jsonify({'message': f"Invalid sort (use one of {', '.join(SORT_KEYS)})"}), 400
+    
+    semester = args.get('semester')
+    if semester and semester not in ['first_semester', 'second_semester']:
+        return jsonify({'message': 'Invalid semester'}), 400
+    
+    after = None
+    if args.get('cursor'):
+        try:
+            after = decode_cursor(args['cursor'])
+        except (ValueError, TypeError):
+            return jsonify({'message': 'Invalid cursor'}), 400
+    
+    version, _ = dashboard_stats.version()
+    students = students_store.query(
+        department=args.get('department'),
+        level=args.get('level'),
+        status=args.get('status'),
+        semester=semester,
+        search=args.get('q'),
+        sort=sort,
+        descending=descending,
+        limit=limit,
+        after=after
+    )
+    
+    next_cursor = None
+    if len(students) == limit:
+        last = students[-1]
+        next_cursor = encode_cursor([sort_value(last, sort), last['matric_number']])
+    
+    fields = [f for f in args.get('fields', '').split(',') if f and f != 'password']
+    if fields:
+        page = [{k: s[k] for k in fields if k in s} for s in students]
+    else:
+        page = [{k: v for k, v in s.items() if k != 'password'} for s in students]
+    
+    return send_json(json_bytes({'students': page, 'next_cursor': next_cursor}),
+                     etag_for('students-page', version, sorted(args.items(multi=True))))
+
+@app.route('/api/admin/students/import', methods=['POST'])
+@admin_required
+def import_students(current_user):
+    """
+    Bulk-create students from a CSV or NDJSON upload (multipart 'file', or the
+    raw request body). Columns: full_name, matric_number, department, level,
+    password and optionally email, phone.
     
-    safe = [{k: v for k, v in s.items() if k != 'password'} for s in filtered]
-    return jsonify(safe)
+    The upload is spooled to disk and imported by a background job; poll the
+    returned job id for progress and per-row errors.
+    """
+    upload = request.files.get('file')
+    filename = upload.filename if upload else request.args.get('filename', '')
+    fmt = request.args.get('format') or bulk_import.detect_format(
+        filename, upload.mimetype if upload else request.mimetype
+    )
+    if fmt not in ['csv', 'ndjson']:
+        return jsonify({'message': 'Invalid format'}), 400
+    
+    job = bulk_import.ImportJob.create(IMPORTS_DIR, current_user, filename, fmt)
+    if upload:
+        upload.save(job.upload_path)
+    else:
+        with open(job.upload_path, 'wb') as f:
+            while True:
+                chunk = request.stream.read(64 * 1024)
+                if not chunk:
+                    break
+                f.write(chunk)
+    
+    # The background job shares the import's id, so either API can be polled with it
+    levels = sorted(read_cached_json(CONFIG_FILE).get('max_units', {}))
+    job_queue.enqueue('import_students', {'import_id': job.id, 'levels': levels}, current_user, job_id=job.id)
+    job_pool.start()
+    add_log('students_import', current_user, f"job {job.id} ({filename or fmt})")
+    
+    return jsonify({'job_id': job.id, 'status': job.state['status']}), 202
+
+@jobs.task('import_students')
+def import_students_task(job, import_id, levels):
+    imported = bulk_import.ImportJob.load(IMPORTS_DIR, import_id)
+    if imported is None:
+        raise ValueError('Import not found')
+    if job.attempt > 1:
+        # Start the counts over; rows the crashed attempt inserted now come back as skipped
+        imported.state.update(processed=0, imported=0, skipped=0, failed=0, errors=[])
+    
+    bulk_import.run(
+        imported, students_store, password_hasher, set(levels),
+        batch_size=app.config['IMPORT_BATCH_SIZE'],
+        on_batch=lambda state: job.progress(state.state['processed'])
+    )
+    if imported.state['status'] == 'failed':
+        raise RuntimeError(imported.state.get('message') or 'Import failed')
+    return {k: imported.state[k] for k in ['processed', 'imported', 'skipped', 'failed']}
+
+@app.route('/api/admin/students/import/<job_id>', methods=['GET'])
+@admin_required
+def get_import_job(current_user, job_id):
+    job = bulk_import.ImportJob.load(IMPORTS_DIR, job_id)
+    if not job:
+        return jsonify({'message': 'Import not found'}), 404
+    
+    state = job.to_dict()
+    background = job_queue.get(job_id)
+    if background and background['status'] in ['failed', 'cancelled'] and state['status'] in ['queued', 'running']:
+        # The job ended before run() could record it (cancelled while queued, worker lost for good)
+        state['status'] = background['status']
+        state['message'] = background['message']
+    return jsonify(state)
 
 # ============= FIXED: APPROVE ENDPOINT (URL DECODING) =============
 @app.route('/api/admin/approve/<path:matric>/<semester>', methods=['POST'])
@@ -389,33 +1349,22 @@ def approve(current_user, matric, semester):
     from urllib.parse import unquote
     matric = unquote(matric)
     
-    print(f"[APPROVE] Request: {matric}, {semester}")
-    
     if semester not in ['first_semester', 'second_semester']:
-        print(f"[APPROVE] Invalid semester: {semester}")
         return jsonify({'message': 'Invalid semester'}), 400
     
-    students = read_json(STUDENTS_FILE)
-    student_found = False
-    
-    for i, s in enumerate(students):
-        if s['matric_number'] == matric:
-            student_found = True
-            print(f"[APPROVE] Found student: {s['full_name']}")
-            print(f"[APPROVE] Current status: {s['registration_status'][semester]}")
-            
-            students[i]['registration_status'][semester] = 'approved'
-            write_json(STUDENTS_FILE, students)
-            add_log('approved', current_user, f"{matric} {semester}")
-            
-            print(f"[APPROVE] SUCCESS: Approved {matric} for {semester}")
-            return jsonify({'message': 'Approved successfully'}), 200
-    
-    if not student_found:
-        print(f"[APPROVE] Student not found: {matric}")
+    def mark_approved(s):
+        logger.debug('approving registration', extra={
+            'matric': matric, 'semester': semester, 'previous_status': s['registration_status'][semester]
+        })
+        s['registration_status'][semester] = 'approved'
+    
+    if students_store.update(matric, mark_approved) is None:
+        logger.debug('approve: student not found', extra={'matric': matric})
         return jsonify({'message': 'Student not found'}), 404
     
-    return jsonify({'message': 'Unknown error'}), 500
+    add_log('approved', current_user, f"{matric} {semester}")
+    
+    return jsonify({'message': 'Approved successfully'}), 200
 
 # ============= REJECT ENDPOINT (URL DECODING) =============
 @app.route('/api/admin/reject/<path:matric>/<semester>', methods=['POST'])
@@ -427,16 +1376,14 @@ def reject(current_user, matric, semester):
     if semester not in ['first_semester', 'second_semester']:
         return jsonify({'message': 'Invalid semester'}), 400
     
-    students = read_json(STUDENTS_FILE)
+    def mark_rejected(s):
+        s['registration_status'][semester] = 'rejected'
     
-    for i, s in enumerate(students):
-        if s['matric_number'] == matric:
-            students[i]['registration_status'][semester] = 'rejected'
-            write_json(STUDENTS_FILE, students)
-            add_log('rejected', current_user, f"{matric} {semester}")
-            return jsonify({'message': 'Rejected'}), 200
+    if students_store.update(matric, mark_rejected) is None:
+        return jsonify({'message': 'Not found'}), 404
     
-    return jsonify({'message': 'Not found'}), 404
+    add_log('rejected', current_user, f"{matric} {semester}")
+    return jsonify({'message': 'Rejected'}), 200
 
 # ============= NEW: DELETE REGISTRATION ENDPOINT =============
 @app.route('/api/admin/delete-registration/<path:matric>/<semester>', methods=['DELETE'])
@@ -449,41 +1396,160 @@ def delete_registration(current_user, matric, semester):
     from urllib.parse import unquote
     matric = unquote(matric)
     
-    print(f"[DELETE] Request: {matric}, {semester}")
-    
     if semester not in ['first_semester', 'second_semester']:
-        print(f"[DELETE] Invalid semester: {semester}")
         return jsonify({'message': 'Invalid semester'}), 400
     
-    students = read_json(STUDENTS_FILE)
-    student_found = False
-    
-    for i, s in enumerate(students):
-        if s['matric_number'] == matric:
-            student_found = True
-            print(f"[DELETE] Found student: {s['full_name']}")
-            print(f"[DELETE] Current courses: {len(s['registered_courses'][semester])} courses")
-            print(f"[DELETE] Current status: {s['registration_status'][semester]}")
-            
-            # Clear the courses and reset status
-            students[i]['registered_courses'][semester] = []
-            students[i]['registration_status'][semester] = 'not_started'
-            
-            write_json(STUDENTS_FILE, students)
-            add_log('delete_registration', current_user, f"{matric} {semester}")
-            
-            print(f"[DELETE] SUCCESS: Deleted registration for {matric} - {semester}")
-            return jsonify({
-                'message': 'Registration deleted successfully. Student can now re-register.',
-                'matric': matric,
-                'semester': semester
-            }), 200
-    
-    if not student_found:
-        print(f"[DELETE] Student not found: {matric}")
+    def clear_registration(s):
+        logger.debug('deleting registration', extra={
+            'matric': matric, 'semester': semester, 'courses': len(s['registered_courses'][semester]),
+            'previous_status': s['registration_status'][semester]
+        })
+        
+        # Clear the courses and reset status
+        s['registered_courses'][semester] = []
+        s['registration_status'][semester] = 'not_started'
+    
+    if students_store.update(matric, clear_registration) is None:
+        logger.debug('delete registration: student not found', extra={'matric': matric})
         return jsonify({'message': 'Student not found'}), 404
     
-    return jsonify({'message': 'Unknown error'}), 500
+    add_log('delete_registration', current_user, f"{matric} {semester}")
+    
+    return jsonify({
+        'message': 'Registration deleted successfully. Student can now re-register.',
+        'matric': matric,
+        'semester': semester
+    }), 200
+
+# ============= BULK APPROVE / REJECT / RESET =============
+BULK_ACTIONS = {
+    'approve': 'approved',
+    'reject': 'rejected',
+    'reset': 'not_started'
+}
+
+@app.route('/api/admin/registrations/bulk', methods=['POST'])
+@admin_required
+def bulk_update_registrations(current_user):
+    """
+    Apply many approve/reject/reset actions in one write
+    Body: {"items": [{"matric": "...", "semester": "first_semester", "action": "approve"}, ...]}
+    """
+    data = request.json or {}
+    items = data.get('items')
+    
+    if not isinstance(items, list) or not items:
+        return jsonify({'message': 'Items required'}), 400
+    
+    if len(items) > 2000:
+        return jsonify({'message': 'Too many items (max 2000)'}), 400
+    
+    results = [None] * len(items)
+    updates = []
+    
+    for i, item in enumerate(items):
+        matric = item.get('matric') if isinstance(item, dict) else None
+        semester = item.get('semester') if isinstance(item, dict) else None
+        action = item.get('action') if isinstance(item, dict) else None
+        result = {'matric': matric, 'semester': semester, 'action': action}
+        results[i] = result
+        
+        if not matric or not isinstance(matric, str):
+            result.update(ok=False, message='Matric number required')
+        elif semester not in ['first_semester', 'second_semester']:
+            result.update(ok=False, message='Invalid semester')
+        elif not isinstance(action, str) or action not in BULK_ACTIONS:
+            result.update(ok=False, message='Invalid action')
+        else:
+            def apply(s, semester=semester, action=action):
+                s['registration_status'][semester] = BULK_ACTIONS[action]
+                if action == 'reset':
+                    s['registered_courses'][semester] = []
+            updates.append((matric, apply))
+    
+    updated = students_store.update_many(updates) if updates else {}
+    
+    counts = {action: 0 for action in BULK_ACTIONS}
+    for result in results:
+        if 'ok' in result:
+            continue
+        if updated.get(result['matric']) is None:
+            result.update(ok=False, message='Student not found')
+        else:
+            result.update(ok=True, status=BULK_ACTIONS[result['action']])
+            counts[result['action']] += 1
+    
+    applied = sum(counts.values())
+    if applied:
+        add_log('bulk_registration_update', current_user,
+                ', '.join(f"{action}: {n}" for action, n in counts.items() if n))
+    
+    return jsonify({
+        'message': f'Applied {applied} of {len(items)}',
+        'applied': applied,
+        'failed': len(items) - applied,
+        'results': results
+    }), 200
+
+@app.route('/api/admin/enrolments/<semester>', methods=['GET'])
+@admin_required
+def get_enrolment_counts(current_user, semester):
+    """
+    Registrations per course for a semester, by status, with capacity where one is set
+    Optional ?codes=CSC101,MTH111 limits the result to those courses
+    """
+    if semester not in ['first_semester', 'second_semester']:
+        return jsonify({'message': 'Invalid semester'}), 400
+    
+    codes = [c for c in request.args.get('codes', '').split(',') if c]
+    capacity = read_cached_json(CONFIG_FILE).get('course_capacity', {})
+    
+    courses = []
+    for code, by_status in sorted(enrolment_index.counts(semester, codes).items()):
+        seats = capacity.get(code)
+        held = by_status.get('pending', 0) + by_status.get('approved', 0)
+        courses.append({
+            'course_code': code,
+            'pending': by_status.get('pending', 0),
+            'approved': by_status.get('approved', 0),
+            'rejected': by_status.get('rejected', 0),
+            'total': sum(by_status.values()),
+            'capacity': seats,
+            'available': max(seats - held, 0) if seats is not None else None
+        })
+    
+    return jsonify({'semester': semester, 'courses': courses})
+
+@app.route('/api/admin/enrolments/<semester>/<code>/roster', methods=['GET'])
+@admin_required
+def get_course_roster(current_user, semester, code):
+    """
+    Students registered for one course, in matric order, paged by ?cursor=
+    """
+    if semester not in ['first_semester', 'second_semester']:
+        return jsonify({'message': 'Invalid semester'}), 400
+    
+    try:
+        limit = min(max(int(request.args.get('limit', 100)), 1), 500)
+    except ValueError:
+        return jsonify({'message': 'Invalid limit'}), 400
+    
+    rows = enrolment_index.roster(semester, code, status=request.args.get('status'),
+                                  limit=limit, after=request.args.get('cursor'))
+    
+    students = []
+    for matric, status in rows:
+        student = students_store.get(matric) or {}
+        students.append({
+            'matric_number': matric,
+            'full_name': student.get('full_name', ''),
+            'department': student.get('department', ''),
+            'level': student.get('level', ''),
+            'status': status
+        })
+    
+    next_cursor = rows[-1][0] if len(rows) == limit else None
+    return jsonify({'semester': semester, 'course_code': code, 'students': students, 'next_cursor': next_cursor})
 
 @app.route('/api/admin/config', methods=['PUT'])
 @admin_required
@@ -493,17 +1559,95 @@ def update_config(current_user):
     
     if 'active_semester' in data:
         config['active_semester'] = data['active_semester']
-        print(f"[CONFIG] Active semester changed to: {data['active_semester']}")
+        logger.info('active semester changed', extra={'active_semester': data['active_semester'], 'by': current_user})
     if 'max_units' in data:
         config['max_units'].update(data['max_units'])
     if 'registration_deadline' in data:
         config['registration_deadline'] = data['registration_deadline']
+    if 'registration_windows' in data:
+        # [{department?, level?, start, end, admit_per_minute?}]; the most specific match applies
+        windows = data['registration_windows'] or []
+        if not isinstance(windows, list):
+            return jsonify({'message': 'registration_windows must be a list'}), 400
+        for window in windows:
+            error = check_window(window)
+            if error:
+                return jsonify({'message': error, 'window': window}), 400
+        config['registration_windows'] = windows
+    if 'waiting_room' in data:
+        # {enabled, admit_per_minute}
+        if not isinstance(data['waiting_room'], dict):
+            return jsonify({'message': 'waiting_room must be an object'}), 400
+        config.setdefault('waiting_room', {}).update(data['waiting_room'])
+    if 'course_capacity' in data:
+        # {courseCode: seats}; null removes a limit
+        if not isinstance(data['course_capacity'], dict):
+            return jsonify({'message': 'course_capacity must be an object'}), 400
+        capacity = config.setdefault('course_capacity', {})
+        for code, seats in data['course_capacity'].items():
+            if seats is None:
+                capacity.pop(code, None)
+                continue
+            if isinstance(seats, bool) or not isinstance(seats, (int, str)) or not str(seats).strip().isdigit():
+                return jsonify({'message': f'Invalid capacity for {code}: must be a whole number of seats',
+                                'course': code}), 400
+            capacity[code] = int(seats)
     
     write_json(CONFIG_FILE, config)
     add_log('config_update', current_user)
     
     return jsonify({'message': 'Updated'})
 
+@app.route('/api/admin/logs', methods=['GET'])
+@admin_required
+def get_logs(current_user):
+    """
+    Query the audit log, newest first
+    Filters: user, action, since, until (ISO timestamps); paginate with limit + cursor
+    """
+    try:
+        limit = min(max(int(request.args.get('limit', 50)), 1), 500)
+    except ValueError:
+        return jsonify({'message': 'Invalid limit'}), 400
+    
+    try:
+        logs, next_cursor = audit_log.query(
+            user=request.args.get('user'),
+            action=request.args.get('action'),
+            since=request.args.get('since'),
+            until=request.args.get('until'),
+            limit=limit,
+            cursor=request.args.get('cursor')
+        )
+    except ValueError:
+        return jsonify({'message': 'Invalid cursor'}), 400
+    
+    return jsonify({'logs': logs, 'next_cursor': next_cursor})
+
+@app.route('/api/admin/cache-stats', methods=['GET'])
+@admin_required
+def get_cache_stats(current_user):
+    return jsonify({'files': file_cache.stats(), 'tokens': token_cache.stats(), 'responses': response_cache.stats()})
+
+@app.route('/api/admin/waiting-room', methods=['GET'])
+@admin_required
+def get_waiting_room_stats(current_user):
+    return jsonify({'enabled': bool((read_cached_json(CONFIG_FILE).get('waiting_room') or {}).get('enabled')),
+                    'queues': waiting_room.stats()})
+
+@app.route('/api/admin/admission-stats', methods=['GET'])
+@admin_required
+def get_admission_stats(current_user):
+    # Slots and rejections seen by this worker; /metrics sums them across workers
+    return jsonify({'concurrency': admission.stats(), 'rate_limited': rate_buckets.limited,
+                    'rate_limits': {scope: limit and {'rate': limit[0], 'burst': limit[1]}
+                                    for scope, limit in rate_limits().items()}})
+
+@app.route('/api/admin/hash-stats', methods=['GET'])
+@admin_required
+def get_hash_stats(current_user):
+    return jsonify(password_hasher.stats())
+
 @app.route('/api/admin/generate-token', methods=['POST'])
 @admin_required
 def generate_token(current_user):
@@ -522,26 +1666,153 @@ def generate_token(current_user):
     if token_type == 'carryover' and not courses:
         return jsonify({'message': 'Carryover courses required'}), 400
     
-    tokens = read_json(TOKENS_FILE)
-    code = secrets.token_urlsafe(16)
+    expires_in_days, error = parse_expiry_days(data.get('expires_in_days'))
+    if error:
+        return jsonify({'message': error}), 400
     
-    token_data = {
-        'code': code,
+    token_data = new_token(token_type, matric, courses, current_user, expires_in_days)
+    tokens_store.add(token_data)
+    tokens_store.maybe_compact()
+    add_log('token_generated', current_user, f"{token_type} for {matric}")
+    
+    return jsonify({'token': token_data['code'], 'courses': courses, 'expires_at': token_data['expires_at']})
+
+def parse_expiry_days(value):
+    """
+    expires_in_days from a request -> (days, error); days is None when not given
+    """
+    if value in (None, ''):
+        return None, None
+    try:
+        days = float(value)
+    except (TypeError, ValueError):
+        days = None
+    if isinstance(value, bool) or days is None or not 0 < days < 36500:
+        return None, 'expires_in_days must be a positive number of days'
+    return days, None
+
+def new_token(token_type, matric, courses, created_by, expires_in_days=None):
+    """
+    expires_in_days is a positive number from parse_expiry_days; None uses TOKEN_TTL_DAYS (0 = never)
+    """
+    ttl = expires_in_days if expires_in_days is not None else app.config['TOKEN_TTL_DAYS']
+    now = datetime.now()
+    return {
+        'code': secrets.token_urlsafe(16),
         'matric_number': matric,
         'type': token_type,
         'courses': courses if token_type == 'carryover' else [],
-        'created_by': current_user,
-        'created_at': datetime.now().isoformat(),
+        'created_by': created_by,
+        'created_at': now.isoformat(),
+        'expires_at': (now + timedelta(days=float(ttl))).isoformat() if ttl else None,
         'used': False,
         'used_at': None
     }
+
+def parse_token_rows():
+    """
+    Rows for bulk token generation, from a CSV upload (matric_number,courses with
+    course codes separated by ';') or a JSON body {"tokens": [{matric_number, courses}]}
+    """
+    upload = request.files.get('file')
+    if upload:
+        reader = csv.DictReader(io.TextIOWrapper(upload.stream, encoding='utf-8-sig'))
+        return [
+            {
+                'matric_number': (row.get('matric_number') or '').strip(),
+                'courses': [c.strip() for c in (row.get('courses') or '').replace(',', ';').split(';') if c.strip()]
+            }
+            for row in reader
+        ]
+    return (request.json or {}).get('tokens')
+
+@app.route('/api/admin/generate-tokens/bulk', methods=['POST'])
+@admin_required
+def generate_tokens_bulk(current_user):
+    """
+    Generate tokens for a whole class in one write
+    Carryover courses may be full course objects or course codes; codes are
+    resolved against the student's department catalog for the given semester
+    """
+    options = request.form if request.files.get('file') else (request.json or {})
+    token_type = options.get('type')
+    semester = options.get('semester', 'first_semester')
     
-    tokens[token_type].append(token_data)
+    if token_type not in ['carryover', 'late_registration']:
+        return jsonify({'message': 'Invalid type'}), 400
     
-    write_json(TOKENS_FILE, tokens)
-    add_log('token_generated', current_user, f"{token_type} for {matric}")
+    if semester not in ['first_semester', 'second_semester']:
+        return jsonify({'message': 'Invalid semester'}), 400
+    
+    expires_in_days, error = parse_expiry_days(options.get('expires_in_days'))
+    if error:
+        return jsonify({'message': error}), 400
+    
+    try:
+        rows = parse_token_rows()
+    except (UnicodeDecodeError, csv.Error):
+        return jsonify({'message': 'Invalid CSV'}), 400
+    
+    if not isinstance(rows, list) or not rows:
+        return jsonify({'message': 'No rows'}), 400
+    
+    semester_name = 'first' if semester == 'first_semester' else 'second'
+    created, errors = [], []
+    
+    for i, row in enumerate(rows, 1):
+        matric = row.get('matric_number') if isinstance(row, dict) else None
+        if not matric or not isinstance(matric, str):
+            errors.append({'row': i, 'message': 'Matric number required'})
+            continue
+        
+        courses = []
+        if token_type == 'carryover':
+            student = students_store.get(matric)
+            missing = []
+            codes = row.get('courses') or []
+            for c in codes if isinstance(codes, list) else [codes]:
+                if isinstance(c, dict):
+                    courses.append(c)
+                    continue
+                # Anything but a code string is reported back as an unknown course for this row
+                found = isinstance(c, str) and student
+                course = course_catalog.course(student['department'], semester_name, c) if found else None
+                if course:
+                    courses.append(course)
+                else:
+                    missing.append(c)
+            if not student and missing:
+                errors.append({'row': i, 'matric_number': matric, 'message': 'Student not found'})
+                continue
+            if missing:
+                errors.append({'row': i, 'matric_number': matric,
+                               'message': f"Unknown courses: {', '.join(str(c) for c in missing)}"})
+                continue
+            if not courses:
+                errors.append({'row': i, 'matric_number': matric, 'message': 'Carryover courses required'})
+                continue
+        
+        created.append(new_token(token_type, matric, courses, current_user, expires_in_days))
+    
+    if created:
+        tokens_store.add_many(created)
+        add_log('token_generated', current_user, f"{len(created)} {token_type} tokens (bulk)")
+    tokens_store.maybe_compact()
     
-    return jsonify({'token': code, 'courses': courses})
+    return jsonify({
+        'created': len(created),
+        'tokens': [{'matric_number': t['matric_number'], 'token': t['code'], 'courses': t['courses']} for t in created],
+        'errors': errors
+    }), 200 if created else 400
+
+def grant_carryovers(student, courses):
+    """
+    Record a used carryover token's courses on the student, replacing earlier grants of the same code
+    """
+    granted = [c for c in courses if isinstance(c, dict) and c.get('courseCode')]
+    codes = {c['courseCode'] for c in granted}
+    kept = [c for c in student.get('carryover_courses', []) if c.get('courseCode') not in codes]
+    student['carryover_courses'] = kept + granted
 
 # ============= NEW: VALIDATE AND USE TOKEN =============
 @app.route('/api/student/validate-token', methods=['POST'])
@@ -560,38 +1831,15 @@ def validate_token(current_user, is_admin):
     if not token_code:
         return jsonify({'message': 'Token required'}), 400
     
-    tokens = read_json(TOKENS_FILE)
-    
-    # Search in both token types
-    found_token = None
-    token_list_key = None
-    token_index = None
-    
-    for key in ['carryover', 'late_registration']:
-        for idx, t in enumerate(tokens[key]):
-            if t['code'] == token_code:
-                found_token = t
-                token_list_key = key
-                token_index = idx
-                break
-        if found_token:
-            break
+    # Lookup by code, ownership/used/expiry checks and marking used happen in one place
+    found_token, error = tokens_store.use(token_code, current_user)
     
-    if not found_token:
-        return jsonify({'message': 'Invalid token'}), 404
+    if error:
+        status = {'Invalid token': 404, 'Token not assigned to you': 403}.get(error, 400)
+        return jsonify({'message': error}), status
     
-    # Check if token is for this student
-    if found_token['matric_number'] != current_user:
-        return jsonify({'message': 'Token not assigned to you'}), 403
-    
-    # Check if already used
-    if found_token['used']:
-        return jsonify({'message': 'Token already used'}), 400
-    
-    # Mark token as used
-    tokens[token_list_key][token_index]['used'] = True
-    tokens[token_list_key][token_index]['used_at'] = datetime.now().isoformat()
-    write_json(TOKENS_FILE, tokens)
+    if found_token['type'] == 'carryover':
+        students_store.update(current_user, lambda s: grant_carryovers(s, found_token.get('courses', [])))
     
     add_log('token_used', current_user, f"{found_token['type']} token used")
     
@@ -605,7 +1853,7 @@ def validate_token(current_user, is_admin):
 @app.route('/api/admin/signatures', methods=['GET'])
 @admin_required
 def get_signatures(current_user):
-    config = read_json(CONFIG_FILE)
+    config = read_cached_json(CONFIG_FILE)
     return jsonify(config.get('signatures', {}))
 
 @app.route('/api/admin/signatures', methods=['POST'])
@@ -622,15 +1870,17 @@ def save_signature(current_user):
     if 'signatures' not in config:
         config['signatures'] = {}
     
-    sig_path = None
+    sig_paths = {}
     if signature:
-        filename = secure_filename(f"{role}_{signature.filename}")
-        sig_path = os.path.join(app.config['SIGNATURES_FOLDER'], filename)
-        signature.save(sig_path)
+        try:
+            sig_paths = store_image(signature, app.config['SIGNATURES_FOLDER'], SIGNATURE_SIZES)
+        except InvalidImage:
+            return jsonify({'message': 'Invalid signature image'}), 400
     
     config['signatures'][role] = {
         'name': name,
-        'signature': sig_path,
+        'signature': sig_paths.get('print'),
+        'signature_thumb': sig_paths.get('thumb'),
         'updated_at': datetime.now().isoformat()
     }
     
@@ -645,11 +1895,14 @@ def delete_signature(current_user, role):
     config = read_json(CONFIG_FILE)
     
     if 'signatures' in config and role in config['signatures']:
-        sig_path = config['signatures'][role].get('signature')
-        if sig_path and os.path.exists(sig_path):
-            os.remove(sig_path)
+        removed = config['signatures'].pop(role)
+        
+        # Content-addressed files can be shared between roles; only delete unreferenced ones
+        still_used = {p for s in config['signatures'].values() for p in (s.get('signature'), s.get('signature_thumb'))}
+        for sig_path in (removed.get('signature'), removed.get('signature_thumb')):
+            if sig_path and sig_path not in still_used and os.path.exists(sig_path):
+                os.remove(sig_path)
         
-        del config['signatures'][role]
         write_json(CONFIG_FILE, config)
         add_log('signature_delete', current_user)
         
@@ -657,13 +1910,24 @@ def delete_signature(current_user, role):
     
     return jsonify({'message': 'Not found'}), 404
 
+def send_media(folder, filename):
+    """
+    Content-hash named files never change, so clients may cache them for a year
+    """
+    if is_immutable(filename):
+        response = send_from_directory(folder, filename, max_age=31536000)
+        response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+        response.set_etag(os.path.basename(filename).split('_', 1)[0])
+        return response.make_conditional(request)
+    return send_from_directory(folder, filename, max_age=300)
+
 @app.route('/uploads/<path:filename>')
 def serve_upload(filename):
-    return send_from_directory('uploads', filename)
+    return send_media('uploads', filename)
 
 @app.route('/signatures/<path:filename>')
 def serve_signature(filename):
-    return send_from_directory('signatures', filename)
+    return send_media('signatures', filename)
 
 # ============= PUBLIC ENDPOINTS (NO AUTH REQUIRED) =============
 @app.route('/api/public/signatures', methods=['GET'])
@@ -672,8 +1936,15 @@ def get_public_signatures():
     Public endpoint to view signatures (for course form display)
     No authentication required - students need to see signatures on their forms
     """
-    config = read_json(CONFIG_FILE)
-    return jsonify(config.get('signatures', {}))
+    config = read_cached_json(CONFIG_FILE)
+    # The file cache just checked the config's mtime; reuse it rather than stat again
+    stamp = file_cache.stamp(CONFIG_FILE)
+    if stamp is None:
+        return send_json(json_bytes(config.get('signatures', {})), cache_control='public, no-cache')
+    modified = datetime.fromtimestamp(stamp[0] / 1e9, timezone.utc)
+    return send_json(lambda: json_bytes(config.get('signatures', {})),
+                     etag=etag_for('signatures', *stamp[:2]), last_modified=modified,
+                     cache=response_cache, cache_control='public, no-cache')
 
 @app.route('/api/create-admin', methods=['POST'])
 def create_admin():
@@ -690,7 +1961,7 @@ def create_admin():
     config['admins'].append({
         'full_name': data['full_name'],
         'matric_number': data['matric_number'],
-        'password': generate_password_hash(data['password']),
+        'password': password_hasher.hash(data['password']),
         'created_at': datetime.now().isoformat()
     })
     
@@ -698,6 +1969,45 @@ def create_admin():
     
     return jsonify({'message': 'Admin created'}), 201
 
+@app.cli.command('dashboard-stats')
+@click.option('--rebuild', is_flag=True, help='Recount from student records and overwrite the counters.')
+def dashboard_stats_command(rebuild):
+    """
+    Check the incremental dashboard counters against a full recount
+    """
+    students = students_store.all()
+    
+    if rebuild:
+        counters = dashboard_stats.rebuild(students)
+        click.echo(f"Rebuilt {len(counters)} counters from {len(students)} students")
+        return
+    
+    mismatches = dashboard_stats.check(students)
+    if not mismatches:
+        click.echo(f"Dashboard counters consistent ({len(students)} students)")
+        return
+    
+    for key, (stored, actual) in sorted(mismatches.items()):
+        click.echo(f"{key}: stored {stored}, actual {actual}")
+    raise SystemExit(1)
+
+@app.cli.command('build-snapshot')
+def build_snapshot_command():
+    """
+    Compile course catalogs and config into data/snapshot.bin for fast cold starts
+    """
+    init_data_files()
+    path, catalogs, size = snapshot.build('data', SNAPSHOT_FILE)
+    click.echo(f"Wrote {path}: {catalogs} catalogs, {size} bytes")
+
+@app.cli.command('enrolment-index')
+def enrolment_index_command():
+    """
+    Rebuild the course -> students index from student records
+    """
+    rows = enrolment_index.rebuild(students_store.all())
+    click.echo(f"Indexed {rows} course registrations")
+
 if __name__ == '__main__':
     print("\n" + "="*50)
     print("🎓 IGBINEDION PORTAL - READY")
@@ -0,0 +1,215 @@
+import fcntl
+import json
+import os
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+
+class AuditLog:
+    """
+    Append-only audit trail stored as JSON-lines segments.
+
+    Entries go to the newest segment with a single append. A segment is closed
+    once it exceeds max_bytes or max_age, and a small index (time range, users,
+    actions) is written beside it so queries can skip segments without reading them.
+    """
+
+    SEGMENT_PREFIX = 'audit-'
+
+    def __init__(self, directory, max_bytes=5 * 1024 * 1024, max_age=timedelta(days=1)):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        os.makedirs(directory, exist_ok=True)
+        self._lock_path = os.path.join(directory, '.lock')
+
+    @contextmanager
+    def _locked(self):
+        with open(self._lock_path, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _segments(self):
+        # Files that only look like segments (copies, hand-made names) are left alone
+        names = [
+            n for n in os.listdir(self.directory)
+            if n.startswith(self.SEGMENT_PREFIX) and n.endswith('.jsonl') and self._segment_started(n)
+        ]
+        return sorted(names)
+
+    def _path(self, segment):
+        return os.path.join(self.directory, segment)
+
+    def _index_path(self, segment):
+        return self._path(segment[:-len('.jsonl')] + '.idx.json')
+
+    @staticmethod
+    def _segment_started(segment):
+        """
+        When the segment was opened, or None if the name is not one of ours.
+        """
+        stamp = segment[len(AuditLog.SEGMENT_PREFIX):].split('-')[0]
+        try:
+            return datetime.strptime(stamp, '%Y%m%dT%H%M%S')
+        except ValueError:
+            return None
+
+    def _new_segment_name(self, now, existing):
+        base = f"{self.SEGMENT_PREFIX}{now.strftime('%Y%m%dT%H%M%S')}"
+        seq = 0
+        while f"{base}-{seq:04d}.jsonl" in existing:
+            seq += 1
+        return f"{base}-{seq:04d}.jsonl"
+
+    def _build_index(self, segment):
+        index = {'segment': segment, 'count': 0, 'first': None, 'last': None, 'users': {}, 'actions': {}}
+        for entry in self._read_segment(segment):
+            ts = entry.get('timestamp')
+            index['count'] += 1
+            if ts and (index['first'] is None or ts < index['first']):
+                index['first'] = ts
+            if ts and (index['last'] is None or ts > index['last']):
+                index['last'] = ts
+            user = entry.get('user')
+            action = entry.get('action')
+            index['users'][user] = index['users'].get(user, 0) + 1
+            index['actions'][action] = index['actions'].get(action, 0) + 1
+
+        tmp = self._index_path(segment) + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(index, f)
+        os.replace(tmp, self._index_path(segment))
+        return index
+
+    def _read_index(self, segment):
+        try:
+            with open(self._index_path(segment), 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _read_segment(self, segment):
+        try:
+            with open(self._path(segment), 'r') as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        try:
+                            yield json.loads(line)
+                        except ValueError:
+                            continue
+        except FileNotFoundError:
+            return
+
+    def _active_segment(self, now):
+        """
+        Return the segment new entries should go to, closing the current one
+        if it has grown too large or too old. Caller must hold the lock.
+        """
+        segments = self._segments()
+        if segments:
+            current = segments[-1]
+            too_big = os.path.getsize(self._path(current)) >= self.max_bytes
+            too_old = now - self._segment_started(current) >= self.max_age
+            if not too_big and not too_old:
+                return current
+            if self._read_index(current) is None:
+                self._build_index(current)
+        return self._new_segment_name(now, set(segments))
+
+    def append(self, action, user, details=""):
+        now = datetime.now()
+        line = json.dumps({
+            "timestamp": now.isoformat(),
+            "action": action,
+            "user": user,
+            "details": details
+        }) + '\n'
+
+        with self._locked():
+            segment = self._active_segment(now)
+            with open(self._path(segment), 'a') as f:
+                f.write(line)
+
+    def import_legacy(self, legacy_file):
+        """
+        One-shot import of the old logs.json array into a closed segment.
+        Does nothing once any segment exists.
+        """
+        with self._locked():
+            if self._segments() or not os.path.exists(legacy_file):
+                return 0
+            try:
+                with open(legacy_file, 'r') as f:
+                    entries = json.load(f)
+            except ValueError:
+                return 0
+            if not entries:
+                return 0
+
+            started = entries[0].get('timestamp', '')[:19].replace('-', '').replace(':', '')
+            segment = f"{self.SEGMENT_PREFIX}{started or datetime.now().strftime('%Y%m%dT%H%M%S')}-0000.jsonl"
+            with open(self._path(segment), 'w') as f:
+                for entry in entries:
+                    f.write(json.dumps(entry) + '\n')
+            self._build_index(segment)
+            return len(entries)
+
+    def _segment_may_match(self, segment, user, action, since, until):
+        index = self._read_index(segment)
+        if index is None:
+            return True
+        if user and user not in index['users']:
+            return False
+        if action and action not in index['actions']:
+            return False
+        if since and index['last'] and index['last'] < since:
+            return False
+        if until and index['first'] and index['first'] > until:
+            return False
+        return True
+
+    def query(self, user=None, action=None, since=None, until=None, limit=50, cursor=None):
+        """
+        Return (entries, next_cursor), newest first.
+
+        The cursor is '<segment>:<line>' and points just past the last entry
+        returned, so pages stay stable while new entries are appended.
+        """
+        segments = self._segments()
+        start_segment, start_line = None, None
+        if cursor:
+            start_segment, _, line = cursor.rpartition(':')
+            start_line = int(line)
+
+        results = []
+        for segment in reversed(segments):
+            if start_segment and segment > start_segment:
+                continue
+            if not self._segment_may_match(segment, user, action, since, until):
+                continue
+
+            matches = []
+            for line_no, entry in enumerate(self._read_segment(segment)):
+                if segment == start_segment and line_no >= start_line:
+                    break
+                ts = entry.get('timestamp', '')
+                if user and entry.get('user') != user:
+                    continue
+                if action and entry.get('action') != action:
+                    continue
+                if since and ts < since:
+                    continue
+                if until and ts > until:
+                    continue
+                matches.append((line_no, entry))
+
+            for line_no, entry in reversed(matches):
+                results.append(entry)
+                if len(results) == limit:
+                    return results, f"{segment}:{line_no}"
+
+        return results, None
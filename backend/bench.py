@@ -0,0 +1,497 @@
+"""
+Load benchmark for the backend API.
+
+Generates a synthetic data directory (students, catalogs, tokens, logs),
+then drives the main endpoints either in-process through the Flask test
+client or against a local gunicorn, and reports throughput and latency
+percentiles per endpoint.
+
+    python bench.py --students 10000 --requests 300 --output baseline.json
+    python bench.py --students 10000 --gunicorn --workers 4 --concurrency 16
+    python bench.py --students 10000 --compare baseline.json
+    python bench.py --startup 20 --endpoints ''
+
+With --compare the run exits non-zero when an endpoint's p95 latency or
+throughput is worse than the baseline by more than --tolerance.
+
+--startup N also measures cold starts: N fresh interpreters each import the
+app and serve one course-list request, first without and then with a data
+snapshot (see snapshot.py). Import and first-response times are reported
+and compared like endpoints.
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+LEVELS = ['100', '200', '300', '400']
+PASSWORD = 'bench-password'
+ADMIN = 'BENCHADMIN'
+
+ENDPOINTS = ['login', 'get_courses', 'register_courses', 'admin_students', 'admin_students_page',
+             'admin_dashboard', 'approve']
+
+
+# ---------------------------------------------------------------- data
+
+def _selection(courses, max_units=24):
+    """
+    A clash-free list of course codes from one level, as a student would pick.
+    """
+    from catalog import parse_slot, find_clashes
+
+    picked, slots, units, seen = [], [], 0, set()
+    for course in courses:
+        if course['courseCode'] in seen:
+            continue
+        seen.add(course['courseCode'])
+        slot = parse_slot(course.get('schedule'))
+        candidate = slots + ([(course['courseCode'], slot)] if slot else [])
+        if units + course.get('units', 0) > max_units or find_clashes(candidate):
+            continue
+        picked.append(course)
+        slots = candidate
+        units += course.get('units', 0)
+    return picked
+
+
+def generate(data_dir, students, departments, seed, hash_method):
+    """
+    Write config, catalogs, students.json, tokens.json and logs.json into data_dir.
+    Returns the pools of matric numbers the benchmark draws from.
+    """
+    from werkzeug.security import generate_password_hash
+
+    rng = random.Random(seed)
+    os.makedirs(data_dir, exist_ok=True)
+    password_hash = generate_password_hash(PASSWORD, method=hash_method)
+
+    with open(os.path.join(data_dir, 'config.json'), 'w') as f:
+        json.dump({
+            'active_semester': 'first',
+            'registration_deadline': '2099-12-31',
+            'max_units': {level: 24 for level in LEVELS + ['500']},
+            'admins': [{'full_name': 'Bench Admin', 'matric_number': ADMIN, 'password': password_hash,
+                        'created_at': datetime.now().isoformat()}],
+            'signatures': {}
+        }, f)
+
+    # Department catalogs are copies of the shipped CSC catalogs
+    depts = [f'D{i:02d}' for i in range(departments)]
+    selections = {}
+    for semester in ['first', 'second']:
+        with open(os.path.join(BACKEND_DIR, 'data', f'csc_{semester}_semester.json')) as f:
+            catalog = json.load(f)
+        for dept in depts:
+            with open(os.path.join(data_dir, f'{dept.lower()}_{semester}_semester.json'), 'w') as f:
+                json.dump(dict(catalog, department=dept), f)
+        if semester == 'first':
+            selections = {level: _selection(catalog['courses'].get(level, [])) for level in LEVELS}
+
+    pools = {'not_started': [], 'pending': [], 'approved': [], 'all': []}
+    created = datetime(2025, 1, 1)
+    with open(os.path.join(data_dir, 'students.json'), 'w') as f:
+        f.write('[')
+        for i in range(students):
+            dept, level = depts[i % len(depts)], LEVELS[(i // len(depts)) % len(LEVELS)]
+            matric = f'{dept.lower()}/2025/{i:06d}'
+            status = rng.choices(['not_started', 'pending', 'approved'], weights=[4, 4, 2])[0]
+            courses = selections[level] if status != 'not_started' else []
+            student = {
+                'full_name': f'Student {i:06d}',
+                'matric_number': matric,
+                'department': dept,
+                'level': level,
+                'email': f'student{i}@example.com',
+                'phone': '',
+                'password': password_hash,
+                'photo': None,
+                'registered_courses': {'first_semester': courses, 'second_semester': []},
+                'registration_status': {'first_semester': status, 'second_semester': 'not_started'},
+                'created_at': (created + timedelta(seconds=i)).isoformat()
+            }
+            f.write((',' if i else '') + json.dumps(student))
+            pools[status].append(matric)
+            pools['all'].append(matric)
+        f.write(']')
+
+    with open(os.path.join(data_dir, 'tokens.json'), 'w') as f:
+        json.dump({
+            'carryover': [
+                {'code': f'bench-{i:06d}', 'matric_number': rng.choice(pools['all']), 'type': 'carryover',
+                 'courses': [], 'created_by': ADMIN, 'created_at': created.isoformat(),
+                 'used': rng.random() < 0.5, 'used_at': None}
+                for i in range(students // 10)
+            ],
+            'late_registration': []
+        }, f)
+
+    with open(os.path.join(data_dir, 'logs.json'), 'w') as f:
+        json.dump([
+            {'timestamp': (created + timedelta(seconds=i)).isoformat(), 'action': 'login',
+             'user': rng.choice(pools['all']), 'details': ''}
+            for i in range(students)
+        ], f)
+
+    for pool in pools.values():
+        rng.shuffle(pool)
+    pools['selections'] = {level: [c['courseCode'] for c in courses] for level, courses in selections.items()}
+    pools['departments'] = depts
+    return pools
+
+
+# ---------------------------------------------------------------- clients
+
+class TestClient:
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def request(self, method, path, headers, body):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        response = client.open(path, method=method, headers=headers, json=body)
+        response.close()
+        return response.status_code
+
+
+class HTTPClient:
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self._local = threading.local()
+
+    def request(self, method, path, headers, body):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=60)
+        payload = json.dumps(body).encode('utf-8') if body is not None else None
+        headers = dict(headers, **({'Content-Type': 'application/json'} if payload else {}))
+        try:
+            conn.request(method, path, body=payload, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            return response.status
+        except (http.client.HTTPException, OSError):
+            conn.close()
+            self._local.conn = None
+            raise
+
+
+def start_gunicorn(workdir, workers, port):
+    env = dict(os.environ, PYTHONPATH=BACKEND_DIR + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    process = subprocess.Popen(
+        [shutil.which('gunicorn') or 'gunicorn', '-w', str(workers), '-b', f'127.0.0.1:{port}',
+         '--log-level', 'warning', 'app:app'],
+        cwd=workdir, env=env
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit('gunicorn exited during startup')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise SystemExit('gunicorn did not start listening')
+
+
+# ---------------------------------------------------------------- scenarios
+
+def scenarios(pools, make_token, admin_token):
+    admin = {'Authorization': f'Bearer {admin_token}'}
+    tokens = {}
+
+    def student_headers(matric):
+        if matric not in tokens:
+            tokens[matric] = make_token(matric)
+        return {'Authorization': f'Bearer {tokens[matric]}'}
+
+    def level_of(matric):
+        i = int(matric.rsplit('/', 1)[1])
+        return LEVELS[(i // len(pools['departments'])) % len(LEVELS)]
+
+    everyone, depts = pools['all'], pools['departments']
+    return {
+        'login': (False, lambda i: (
+            'POST', '/api/login', {}, {'matric_number': everyone[i % len(everyone)], 'password': PASSWORD})),
+        'get_courses': (False, lambda i: (
+            'GET', f'/api/courses/{depts[i % len(depts)]}/{LEVELS[i % len(LEVELS)]}/first_semester',
+            student_headers(everyone[i % len(everyone)]), None)),
+        'register_courses': (True, lambda i: (
+            'POST', '/api/student/register-courses', student_headers(pools['not_started'][i]),
+            {'semester': 'first_semester', 'courses': pools['selections'][level_of(pools['not_started'][i])]})),
+        'admin_students': (False, lambda i: ('GET', '/api/admin/students', admin, None)),
+        'admin_students_page': (False, lambda i: (
+            'GET', f'/api/admin/students?limit=50&department={depts[i % len(depts)]}&status=pending'
+                   f'&semester=first_semester', admin, None)),
+        'admin_dashboard': (False, lambda i: ('GET', '/api/admin/dashboard', admin, None)),
+        'approve': (True, lambda i: (
+            'POST', f"/api/admin/approve/{pools['pending'][i]}/first_semester", admin, None))
+    }
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(p * len(sorted_values)))]
+
+
+def run_endpoint(client, build, count, concurrency):
+    latencies, errors = [], 0
+    lock = threading.Lock()
+
+    def one(i):
+        nonlocal errors
+        method, path, headers, body = build(i)
+        started = time.perf_counter()
+        try:
+            ok = client.request(method, path, headers, body) < 400
+        except Exception:
+            ok = False
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            if not ok:
+                errors += 1
+
+    started = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(one, range(count)))
+    else:
+        for i in range(count):
+            one(i)
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': count,
+        'errors': errors,
+        'throughput_rps': round(count / wall, 2) if wall else 0.0,
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3)
+    }
+
+
+def compare(results, baseline, tolerance):
+    """
+    Regressions of results against a baseline report, as human-readable lines.
+    """
+    problems = []
+    for name, current in results['endpoints'].items():
+        before = baseline.get('endpoints', {}).get(name)
+        if not before:
+            continue
+        if before['p95_ms'] and current['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            problems.append(f"{name}: p95 {current['p95_ms']}ms vs baseline {before['p95_ms']}ms")
+        if before['throughput_rps'] and current['throughput_rps'] < before['throughput_rps'] * (1 - tolerance):
+            problems.append(f"{name}: {current['throughput_rps']} req/s vs baseline {before['throughput_rps']} req/s")
+        if current['errors'] > before.get('errors', 0):
+            problems.append(f"{name}: {current['errors']} errors vs baseline {before.get('errors', 0)}")
+    for name, current in results.get('startup', {}).items():
+        before = baseline.get('startup', {}).get(name)
+        if not before:
+            continue
+        for key in ['import_p50_ms', 'first_response_p50_ms']:
+            if before[key] and current[key] > before[key] * (1 + tolerance):
+                problems.append(f"startup {name}: {key} {current[key]}ms vs baseline {before[key]}ms")
+    return problems
+
+
+# ---------------------------------------------------------------- startup
+
+# Runs in a fresh interpreter inside the work directory; prints one JSON line
+STARTUP_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import app as backend
+imported = time.perf_counter()
+response = backend.app.test_client().get(sys.argv[1], headers={'Authorization': 'Bearer ' + sys.argv[2]})
+done = time.perf_counter()
+print(json.dumps({'import': imported - started, 'first_response': done - imported, 'status': response.status_code}))
+"""
+
+
+def measure_startup(workdir, runs, path, token):
+    """
+    Import and first-response latency of `runs` cold processes, in ms percentiles.
+    """
+    env = dict(os.environ, PYTHONPATH=BACKEND_DIR, LOG_LEVEL='WARNING')
+    samples = {'import': [], 'first_response': [], 'process': []}
+    errors = 0
+    # The first start migrates legacy JSON into the stores; only later starts are timed
+    for i in range(runs + 1):
+        started = time.perf_counter()
+        result = subprocess.run([sys.executable, '-c', STARTUP_PROBE, path, token],
+                                cwd=workdir, env=env, capture_output=True, text=True)
+        elapsed = time.perf_counter() - started
+        if i == 0:
+            continue
+        try:
+            probe = json.loads(result.stdout.strip().splitlines()[-1])
+        except (ValueError, IndexError):
+            errors += 1
+            continue
+        errors += probe['status'] >= 400
+        samples['import'].append(probe['import'])
+        samples['first_response'].append(probe['first_response'])
+        samples['process'].append(elapsed)
+
+    report = {'runs': runs, 'errors': errors}
+    for name, values in samples.items():
+        values.sort()
+        report[f'{name}_p50_ms'] = round(percentile(values, 0.50) * 1000, 3)
+        report[f'{name}_p95_ms'] = round(percentile(values, 0.95) * 1000, 3)
+    return report
+
+
+# ---------------------------------------------------------------- main
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the backend API on synthetic data.')
+    parser.add_argument('--students', type=int, default=1000, help='synthetic students (default 1000)')
+    parser.add_argument('--departments', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=200, help='requests per endpoint')
+    parser.add_argument('--login-requests', type=int, default=20,
+                        help='requests for login, which is dominated by password hashing')
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--endpoints', default=','.join(ENDPOINTS))
+    parser.add_argument('--backend', default=os.environ.get('STORAGE_BACKEND', 'sqlite'),
+                        choices=['sqlite', 'json', 'sharded'])
+    parser.add_argument('--hash-method', default=os.environ.get('HASH_METHOD', 'scrypt:32768:8:1'))
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--workdir', help='directory for generated data (default: a temp dir, removed afterwards)')
+    parser.add_argument('--gunicorn', action='store_true', help='run against a local gunicorn instead of the test client')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn workers')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--output', help='write the JSON report here')
+    parser.add_argument('--compare', help='baseline JSON report to check against')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    parser.add_argument('--startup', type=int, default=0, metavar='N',
+                        help='also time N cold starts (import to first response), without and with a snapshot')
+    args = parser.parse_args(argv)
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = os.path.abspath(args.compare) if args.compare else None
+
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix='bench-'))
+    os.makedirs(workdir, exist_ok=True)
+    sys.path.insert(0, BACKEND_DIR)
+
+    started = time.perf_counter()
+    pools = generate(os.path.join(workdir, 'data'), args.students, args.departments, args.seed, args.hash_method)
+    generate_seconds = time.perf_counter() - started
+
+    # The app resolves data/ relative to the working directory
+    os.environ['STORAGE_BACKEND'] = args.backend
+    os.environ['HASH_METHOD'] = args.hash_method
+    # Every simulated student shares one client IP; per-client limits would only measure themselves
+    for scope in ('IP', 'MATRIC', 'LOGIN'):
+        os.environ.setdefault(f'RATE_LIMIT_{scope}', '0')
+    os.chdir(workdir)
+    started = time.perf_counter()
+    import jwt
+    import app as backend
+    startup_seconds = time.perf_counter() - started
+
+    def make_token(matric, is_admin=False):
+        return jwt.encode({'matric_number': matric, 'is_admin': is_admin,
+                           'exp': datetime.now(timezone.utc) + timedelta(hours=2)},
+                          backend.app.config['SECRET_KEY'], algorithm='HS256')
+
+    server = None
+    if args.gunicorn:
+        server = start_gunicorn(workdir, args.workers, args.port)
+        client = HTTPClient('127.0.0.1', args.port)
+    else:
+        client = TestClient(backend.app)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'students': args.students,
+            'departments': args.departments,
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'mode': f'gunicorn x{args.workers}' if args.gunicorn else 'test_client',
+            'backend': args.backend,
+            'hash_method': args.hash_method,
+            'python': platform.python_version(),
+            'generate_seconds': round(generate_seconds, 3),
+            'startup_seconds': round(startup_seconds, 3)
+        },
+        'endpoints': {}
+    }
+
+    try:
+        if args.startup:
+            import snapshot
+            path = f"/api/courses/{pools['departments'][0]}/100/first_semester"
+            token = make_token(pools['all'][0])
+            report['startup'] = {'cold': measure_startup(workdir, args.startup, path, token)}
+            snapshot.build('data')
+            report['startup']['snapshot'] = measure_startup(workdir, args.startup, path, token)
+            os.remove(os.path.join('data', 'snapshot.bin'))
+            for name, result in report['startup'].items():
+                print(f"startup/{name:<14} {result['runs']:>6} run  {result['errors']:>4} err  "
+                      f"import p50 {result['import_p50_ms']:>8.2f}ms  "
+                      f"first response p50 {result['first_response_p50_ms']:>8.2f}ms  "
+                      f"process p50 {result['process_p50_ms']:>8.2f}ms", flush=True)
+
+        table = scenarios(pools, make_token, make_token(ADMIN, is_admin=True))
+        for name in [e.strip() for e in args.endpoints.split(',') if e.strip()]:
+            if name not in table:
+                raise SystemExit(f'Unknown endpoint {name} (choose from {", ".join(ENDPOINTS)})')
+            consumes, build = table[name]
+            count = args.login_requests if name == 'login' else args.requests
+            if consumes:
+                pool = pools['not_started'] if name == 'register_courses' else pools['pending']
+                count = min(count, len(pool))
+            else:
+                run_endpoint(client, build, min(5, count), 1)
+            result = run_endpoint(client, build, count, args.concurrency)
+            report['endpoints'][name] = result
+            print(f"{name:<22} {result['requests']:>6} req  {result['errors']:>4} err  "
+                  f"{result['throughput_rps']:>9.1f} req/s  p50 {result['p50_ms']:>8.2f}ms  "
+                  f"p95 {result['p95_ms']:>8.2f}ms  p99 {result['p99_ms']:>8.2f}ms", flush=True)
+    finally:
+        if server:
+            server.send_signal(signal.SIGTERM)
+            server.wait(timeout=30)
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if baseline:
+        with open(baseline) as f:
+            problems = compare(report, json.load(f), args.tolerance)
+        for line in problems:
+            print(f'REGRESSION {line}')
+        if problems:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
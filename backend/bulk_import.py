@@ -0,0 +1,198 @@
+import csv
+import json
+import os
+import secrets
+from datetime import datetime
+
+from jobs import JobCancelled
+
+REQUIRED = ['full_name', 'matric_number', 'department', 'level', 'password']
+OPTIONAL = ['email', 'phone']
+
+# Per-row errors kept in the job file; the counters still cover every row
+MAX_ERRORS = 1000
+
+
+def detect_format(filename, content_type):
+    name = (filename or '').lower()
+    if name.endswith(('.ndjson', '.jsonl')) or 'ndjson' in (content_type or ''):
+        return 'ndjson'
+    return 'csv'
+
+
+def iter_rows(path, fmt):
+    """
+    Yield (line_number, row dict or None) from an uploaded file without loading it whole.
+    None marks a line that could not be parsed.
+    """
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        if fmt == 'ndjson':
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    yield line_no, None
+                    continue
+                yield line_no, row if isinstance(row, dict) else None
+        else:
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+
+
+def validate(row, levels):
+    """
+    Return (student fields, error message); exactly one of them is None.
+    """
+    if row is None:
+        return None, 'Unreadable row'
+    fields = {k: str(row.get(k) or '').strip() for k in REQUIRED + OPTIONAL}
+    for field in REQUIRED:
+        if not fields[field]:
+            return None, f'{field} required'
+    if levels and fields['level'] not in levels:
+        return None, f"Unknown level {fields['level']}"
+    return fields, None
+
+
+class ImportJob:
+    """
+    Progress of one bulk import, kept in data/imports/<id>.json so any worker
+    can answer progress polls while the importing worker updates it.
+    """
+
+    def __init__(self, directory, job_id, state):
+        self.directory = directory
+        self.id = job_id
+        self.state = state
+
+    @classmethod
+    def create(cls, directory, created_by, filename, fmt):
+        os.makedirs(directory, exist_ok=True)
+        job = cls(directory, secrets.token_hex(8), {
+            'status': 'queued',
+            'created_by': created_by,
+            'created_at': datetime.now().isoformat(),
+            'finished_at': None,
+            'filename': filename,
+            'format': fmt,
+            'processed': 0,
+            'imported': 0,
+            'skipped': 0,
+            'failed': 0,
+            'errors': []
+        })
+        job.save()
+        return job
+
+    @classmethod
+    def load(cls, directory, job_id):
+        if not job_id.isalnum():
+            return None
+        try:
+            with open(os.path.join(directory, f'{job_id}.json'), 'r') as f:
+                return cls(directory, job_id, json.load(f))
+        except (FileNotFoundError, ValueError):
+            return None
+
+    @property
+    def upload_path(self):
+        return os.path.join(self.directory, f'{self.id}.upload')
+
+    def save(self):
+        path = os.path.join(self.directory, f'{self.id}.json')
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.state, f)
+        os.replace(tmp, path)
+
+    def error(self, line, matric, message):
+        self.state['failed'] += 1
+        if len(self.state['errors']) < MAX_ERRORS:
+            self.state['errors'].append({'line': line, 'matric_number': matric, 'message': message})
+
+    def to_dict(self):
+        return dict(self.state, id=self.id)
+
+
+def run(job, store, hasher, levels, batch_size=200, on_batch=None):
+    """
+    Validate, dedupe, hash and insert the rows of job's upload, committing
+    one batch at a time and saving progress after each batch. on_batch(job)
+    is called after every save and may raise JobCancelled to stop early.
+    """
+    job.state['status'] = 'running'
+    job.save()
+    seen = set()
+    batch = []
+
+    def commit():
+        # Rows taken since validation (another import, a live registration) come back as skipped
+        hashes = hasher.hash_many([fields['password'] for _, fields in batch])
+        now = datetime.now().isoformat()
+        students = []
+        for (line, fields), pwhash in zip(batch, hashes):
+            students.append({
+                'full_name': fields['full_name'],
+                'matric_number': fields['matric_number'],
+                'department': fields['department'],
+                'level': fields['level'],
+                'email': fields['email'],
+                'phone': fields['phone'],
+                'password': pwhash,
+                'photo': None,
+                'photo_thumb': None,
+                'registered_courses': {'first_semester': [], 'second_semester': []},
+                'registration_status': {'first_semester': 'not_started', 'second_semester': 'not_started'},
+                'created_at': now
+            })
+        inserted = store.insert_many(students)
+        job.state['imported'] += len(inserted)
+        job.state['skipped'] += len(students) - len(inserted)
+        job.state['processed'] += len(batch)
+        batch.clear()
+        job.save()
+        if on_batch:
+            on_batch(job)
+
+    try:
+        for line, row in iter_rows(job.upload_path, job.state['format']):
+            fields, error = validate(row, levels)
+            matric = fields['matric_number'] if fields else (row or {}).get('matric_number')
+            if error:
+                job.error(line, matric, error)
+                job.state['processed'] += 1
+            elif matric in seen:
+                job.error(line, matric, 'Duplicate matric number in file')
+                job.state['processed'] += 1
+            elif store.exists(matric):
+                job.state['skipped'] += 1
+                job.state['processed'] += 1
+            else:
+                seen.add(matric)
+                batch.append((line, fields))
+                if len(batch) >= batch_size:
+                    commit()
+        if batch:
+            commit()
+        job.state['status'] = 'completed'
+    except JobCancelled:
+        job.state['status'] = 'cancelled'
+        raise
+    except (UnicodeDecodeError, csv.Error) as e:
+        job.state['status'] = 'failed'
+        job.state['message'] = f'Could not read file: {e}'
+    except Exception as e:
+        job.state['status'] = 'failed'
+        job.state['message'] = str(e)
+    finally:
+        job.state['finished_at'] = datetime.now().isoformat()
+        job.save()
+        try:
+            os.remove(job.upload_path)
+        except FileNotFoundError:
+            pass
+    return job
+
@@ -0,0 +1,151 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class FileCache:
+    """
+    Read-through cache for small JSON files (config, course catalogs).
+
+    An entry is reused while the file's (mtime, size) is unchanged and nobody
+    has called bump() for it, so edits from other workers are picked up on the
+    next read. Entries are evicted least-recently-used once either the entry
+    count or the total cached file size goes over its limit.
+
+    Cached values are shared between requests and must be treated as read-only.
+    """
+
+    def __init__(self, max_entries=64, max_bytes=16 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _stamp(path):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def get(self, path, loader=None):
+        """
+        Return the parsed contents of path, or None if it does not exist.
+        """
+        stamp = self._stamp(path)
+        if stamp is None:
+            return None
+
+        with self._lock:
+            version = self._versions.get(path, 0)
+            entry = self._entries.get(path)
+            if entry and entry[0] == stamp and entry[1] == version:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+
+        if loader is None:
+            with open(path, 'r') as f:
+                value = json.load(f)
+        else:
+            value = loader(path)
+
+        with self._lock:
+            self._store(path, (stamp, version, value, stamp[1]))
+        return value
+
+    def _store(self, path, entry):
+        old = self._entries.pop(path, None)
+        if old:
+            self._bytes -= old[3]
+        self._entries[path] = entry
+        self._bytes += entry[3]
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted[3]
+
+    def stamp(self, path):
+        """
+        (mtime_ns, size, version) of the cached copy of path, as checked by the
+        last get(), or None when it is not cached. Lets callers derive
+        validators without another stat.
+        """
+        with self._lock:
+            entry = self._entries.get(path)
+            return (*entry[0], entry[1]) if entry else None
+
+    def bump(self, path):
+        """
+        Explicitly invalidate path, e.g. right after this process rewrote it.
+        """
+        with self._lock:
+            self._versions[path] = self._versions.get(path, 0) + 1
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0,
+                'entries': len(self._entries),
+                'bytes': self._bytes
+            }
+
+
+class TokenCache:
+    """
+    LRU of verified JWT claims keyed by a digest of the token, so a token is
+    only HMAC-verified once. Entries are dropped once the token's exp passes.
+    """
+
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token):
+        return hashlib.sha256(token.encode('utf-8')).digest()
+
+    def get(self, token):
+        key = self._key(token)
+        with self._lock:
+            claims = self._entries.get(key)
+            if claims is not None and claims.get('exp', 0) > time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return claims
+            if claims is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, token, claims):
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = claims
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0,
+                'entries': len(self._entries)
+            }
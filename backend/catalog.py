@@ -0,0 +1,256 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+TIME = re.compile(r'^\s*(\d{1,2})(?::(\d{2}))?\s*([AaPp][Mm])?\s*$')
+
+
+def parse_time(text):
+    """
+    Minutes after midnight for "9:00 AM", "9AM", "13:30" or "09:00"; None if unparseable.
+    """
+    match = TIME.match(text or '')
+    if not match:
+        return None
+    hour, minute, meridiem = int(match.group(1)), int(match.group(2) or 0), (match.group(3) or '').upper()
+    if meridiem:
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if meridiem == 'PM' else 0)
+    if hour > 23 or minute > 59:
+        return None
+    return hour * 60 + minute
+
+
+def parse_slot(schedule):
+    """
+    (day, start, end) for a course schedule such as
+    {"day": "Monday", "time": "9:00 AM - 12:00 PM"}, or None if it has no usable time.
+    """
+    if not isinstance(schedule, dict):
+        return None
+    day = (schedule.get('day') or '').strip().lower()
+    parts = re.split(r'\s*[-\u2013\u2014]\s*|\s+to\s+', schedule.get('time') or '')
+    if not day or len(parts) != 2:
+        return None
+    start, end = parse_time(parts[0]), parse_time(parts[1])
+    if start is None or end is None or end <= start:
+        return None
+    return (day, start, end)
+
+
+def find_clashes(slots):
+    """
+    Overlapping pairs among [(code, (day, start, end))]. Slots are swept in
+    (day, start) order, so only courses that are still running are compared.
+    """
+    clashes = []
+    running = []
+    for code, slot in sorted(slots, key=lambda item: item[1]):
+        day, start, _ = slot
+        running = [(c, s) for c, s in running if s[0] == day and s[2] > start]
+        clashes.extend((c, code) for c, _ in running)
+        running.append((code, slot))
+    return clashes
+
+
+class _CompiledEntry(dict):
+    """
+    A level entry read from a snapshot: body and etag are ready to serve, and
+    courses, slots and clashes are only parsed from the body when first used.
+    """
+
+    def __missing__(self, key):
+        if key not in ('courses', 'slots', 'clashes'):
+            raise KeyError(key)
+        self.update(CourseCatalog._entry(json.loads(self['body'])))
+        return self[key]
+
+
+class CourseCatalog:
+    """
+    All {dept}_{first|second}_semester.json files, parsed once and indexed by
+    (department, level, semester) and by courseCode.
+
+    Each level's course list is serialized up front together with a strong
+    ETag, so requests only pick a ready-made body. Files are re-checked at most
+    every check_interval seconds and re-indexed when they change on disk.
+
+    Schedules are parsed into (day, start, end) minute intervals at index time,
+    and each level keeps the clashing pairs among its own courses, so
+    registration checks never parse time strings.
+
+    With a snapshot (see snapshot.py) files it has a current copy of are not
+    parsed at all until a request needs their courses rather than their body.
+    """
+
+    SUFFIXES = {'_first_semester.json': 'first', '_second_semester.json': 'second'}
+
+    def __init__(self, data_dir, check_interval=2.0, snapshot=None):
+        self.data_dir = data_dir
+        self.check_interval = check_interval
+        self.snapshot = snapshot
+        self._lock = threading.Lock()
+        self._files = {}
+        self._codes = None
+        self._checked_at = 0.0
+        self._empty = self._entry([])
+        self.reload()
+
+    def _catalog_files(self):
+        files = {}
+        for name in os.listdir(self.data_dir):
+            for suffix, semester in self.SUFFIXES.items():
+                if name.endswith(suffix):
+                    department = name[:-len(suffix)].lower()
+                    files[(department, semester)] = os.path.join(self.data_dir, name)
+        return files
+
+    @staticmethod
+    def _stamp(path):
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+
+    @staticmethod
+    def _entry(courses):
+        body = json.dumps(courses, separators=(',', ':')).encode('utf-8')
+        slots = {}
+        for course in courses:
+            slot = parse_slot(course.get('schedule'))
+            # First definition of a code wins, as in the code index
+            if course.get('courseCode') and slot:
+                slots.setdefault(course['courseCode'], slot)
+        clashes = {}
+        for a, b in find_clashes(slots.items()):
+            clashes.setdefault(a, set()).add(b)
+            clashes.setdefault(b, set()).add(a)
+        return {
+            'courses': courses,
+            'body': body,
+            'etag': hashlib.sha256(body).hexdigest()[:32],
+            'slots': slots,
+            'clashes': clashes
+        }
+
+    def _index_file(self, path, key=None):
+        compiled = self.snapshot.catalog(key[0], key[1], path) if self.snapshot and key else None
+        if compiled:
+            levels, fallback = compiled
+            return {
+                'path': path,
+                'stamp': self._stamp(path),
+                'levels': {level: _CompiledEntry(body=body, etag=etag) for level, (body, etag) in levels.items()},
+                'fallback': _CompiledEntry(body=fallback[0], etag=fallback[1]) if fallback else None
+            }
+
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning('skipping unreadable catalog', extra={'path': path, 'error': str(e)})
+            return None
+
+        # Nested structure: {"courses": {"100": [...], "200": [...]}}; a bare list applies to every level
+        if isinstance(data, dict) and 'courses' in data:
+            by_level = {str(level): courses for level, courses in data['courses'].items()}
+            fallback = None
+        else:
+            by_level = {}
+            fallback = data if isinstance(data, list) else []
+
+        return {
+            'path': path,
+            'stamp': self._stamp(path),
+            'levels': {level: self._entry(courses) for level, courses in by_level.items()},
+            'fallback': self._entry(fallback) if fallback is not None else None
+        }
+
+    def _code(self, department, semester, code):
+        codes = self._codes
+        if codes is None:
+            with self._lock:
+                if self._codes is None:
+                    self._rebuild_codes()
+                codes = self._codes
+        return codes.get((department.lower(), semester, code))
+
+    def _rebuild_codes(self):
+        codes = {}
+        for (department, semester), indexed in self._files.items():
+            for level, entry in indexed['levels'].items():
+                for course in entry['courses']:
+                    code = course.get('courseCode')
+                    if code and (department, semester, code) not in codes:
+                        codes[(department, semester, code)] = (dict(course, level=level), entry['slots'].get(code))
+        self._codes = codes
+
+    def reload(self, force=False):
+        """
+        Re-index catalog files that were added, removed or changed on disk.
+        """
+        with self._lock:
+            current = self._catalog_files()
+            changed = False
+
+            for key in list(self._files):
+                if key not in current:
+                    del self._files[key]
+                    changed = True
+
+            for key, path in current.items():
+                indexed = self._files.get(key)
+                try:
+                    if not force and indexed and indexed['stamp'] == self._stamp(path):
+                        continue
+                except FileNotFoundError:
+                    continue
+                fresh = self._index_file(path, key)
+                if fresh:
+                    self._files[key] = fresh
+                    changed = True
+
+            if changed:
+                # Rebuilt on the next course()/slot() lookup, so serving bodies never parses courses
+                self._codes = None
+            self._checked_at = time.monotonic()
+
+    def _maybe_reload(self):
+        if time.monotonic() - self._checked_at >= self.check_interval:
+            self.reload()
+
+    def has(self, department, semester):
+        self._maybe_reload()
+        return (department.lower(), semester) in self._files
+
+    def level(self, department, level, semester):
+        """
+        Return the pre-serialized entry for one level, or None if the
+        department/semester has no catalog file.
+        """
+        self._maybe_reload()
+        indexed = self._files.get((department.lower(), semester))
+        if indexed is None:
+            return None
+        entry = indexed['levels'].get(str(level))
+        if entry is None:
+            entry = indexed['fallback'] or self._empty
+        return entry
+
+    def course(self, department, semester, code):
+        self._maybe_reload()
+        found = self._code(department, semester, code)
+        return found[0] if found else None
+
+    def slot(self, department, semester, code):
+        """
+        Pre-parsed (day, start, end) for a course, or None.
+        """
+        self._maybe_reload()
+        found = self._code(department, semester, code)
+        return found[1] if found else None
@@ -0,0 +1,135 @@
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+SEMESTERS = ['first_semester', 'second_semester']
+
+# New registration status -> event name
+EVENTS = {'pending': 'submitted', 'approved': 'approved', 'rejected': 'rejected', 'not_started': 'reset'}
+
+
+def registration_events(before, after):
+    """
+    An event dict (without version) for each semester whose registration
+    status differs between two versions of a student.
+    """
+    if after is None:
+        return []
+    old = (before or {}).get('registration_status') or {}
+    new = after.get('registration_status') or {}
+    found = []
+    for sem in SEMESTERS:
+        previous, status = old.get(sem, 'not_started'), new.get(sem, 'not_started')
+        if previous == status or status not in EVENTS:
+            continue
+        event = {
+            'event': EVENTS[status],
+            'matric_number': after['matric_number'],
+            'full_name': after.get('full_name'),
+            'department': after.get('department'),
+            'level': after.get('level'),
+            'semester': sem,
+            'status': status,
+            'previous': previous
+        }
+        if status == 'pending':
+            # What an approver needs, so admin lists can add the row without refetching
+            courses = (after.get('registered_courses') or {}).get(sem, [])
+            event['courses'] = courses
+            event['total_units'] = sum(c.get('units', 0) for c in courses if isinstance(c, dict))
+        found.append(event)
+    return found
+
+
+class ChangeFeed:
+    """
+    Registration events (submitted, approved, rejected, reset) in SQLite,
+    shared by all workers.
+
+    apply() is a student store listener, so every write path records its
+    events. Each event gets the next version number; readers keep the last
+    version they saw and ask for what came after it. Only the newest keep
+    events are retained; a reader that fell further behind is told to reset.
+    """
+
+    def __init__(self, path, keep=50000):
+        self.path = path
+        self.keep = keep
+        self._local = threading.local()
+        self._conn().executescript("""
+            CREATE TABLE IF NOT EXISTS events (
+                version INTEGER PRIMARY KEY AUTOINCREMENT,
+                time REAL NOT NULL,
+                data TEXT NOT NULL
+            );
+        """)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def apply(self, changes):
+        """
+        Store listener: record the events in a list of (before, after) students.
+        """
+        rows = [json.dumps(event) for before, after in changes for event in registration_events(before, after)]
+        if not rows:
+            return
+        now = time.time()
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany('INSERT INTO events (time, data) VALUES (?, ?)', [(now, row) for row in rows])
+            conn.execute('DELETE FROM events WHERE version <= ?', (self._version(conn) - self.keep,))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    @staticmethod
+    def _version(conn):
+        # AUTOINCREMENT never reuses numbers, so the sequence survives pruning
+        row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'events'").fetchone()
+        return row[0] if row else 0
+
+    def version(self):
+        return self._version(self._conn())
+
+    def since(self, version, limit=500):
+        """
+        Events after version, oldest first: {'version', 'events', 'more', 'reset'}.
+
+        version in the result is the one to ask from next. reset is True when
+        events after the given version are no longer kept (or it is from a
+        feed that was since recreated); the reader should reload in full and
+        continue from the returned version.
+        """
+        conn = self._conn()
+        current = self._version(conn)
+        oldest = conn.execute('SELECT MIN(version) FROM events').fetchone()[0]
+        if version > current or (version < current and (oldest is None or version < oldest - 1)):
+            return {'version': current, 'events': [], 'more': False, 'reset': True}
+
+        rows = conn.execute(
+            'SELECT version, time, data FROM events WHERE version > ? ORDER BY version LIMIT ?',
+            (version, limit + 1)
+        ).fetchall()
+        events = []
+        for number, stamp, data in rows[:limit]:
+            event = json.loads(data)
+            event['version'] = number
+            event['time'] = datetime.fromtimestamp(stamp, timezone.utc).isoformat()
+            events.append(event)
+        return {
+            'version': events[-1]['version'] if events else version,
+            'events': events,
+            'more': len(rows) > limit,
+            'reset': False
+        }
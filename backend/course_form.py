@@ -0,0 +1,298 @@
+import hashlib
+import io
+import json
+import os
+import threading
+import zipfile
+from collections import OrderedDict
+from datetime import date, datetime
+from functools import lru_cache
+from xml.sax.saxutils import escape
+
+# reportlab adds ~80ms to import time, so it is only imported once the first form is rendered
+PRIMARY = '#0056B3'
+
+SIGNATURE_ROLES = [
+    ('course_advisor', 'Course Advisor'),
+    ('hod', 'Head of Department'),
+    ('dean', 'Dean of Faculty'),
+    ('registrar', 'Registrar')
+]
+
+STATUS_TEXT = {
+    'approved': 'Registration Approved',
+    'pending': 'Awaiting Approval',
+    'rejected': 'Registration Rejected'
+}
+
+
+class ImageCache:
+    """
+    Decoded images (signatures, photos) keyed by path and mtime, so each file
+    is only read and decoded once per process.
+    """
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        if not path or not os.path.exists(path):
+            return None
+        key = (path, os.stat(path).st_mtime_ns)
+        with self._lock:
+            reader = self._entries.get(key)
+            if reader is not None:
+                self._entries.move_to_end(key)
+                return reader
+        from reportlab.lib.utils import ImageReader
+        try:
+            with open(path, 'rb') as f:
+                reader = ImageReader(io.BytesIO(f.read()))
+        except Exception:
+            return None
+        with self._lock:
+            self._entries[key] = reader
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return reader
+
+
+class RenderCache:
+    """
+    Rendered PDFs keyed by (matric, semester, form version), bounded by total size.
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            pdf = self._entries.get(key)
+            if pdf is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return pdf
+
+    def put(self, key, pdf):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._entries[key] = pdf
+            self._bytes += len(pdf)
+            while self._entries and self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries), 'bytes': self._bytes}
+
+
+images = ImageCache()
+renders = RenderCache()
+
+
+def form_version(student, semester, signatures):
+    """
+    Digest of everything that appears on the form; changes whenever the
+    registration, the student's details or a signature changes, and daily
+    for the generation date and session year printed on it.
+    """
+    payload = [
+        date.today().isoformat(),
+        student.get('full_name'), student['matric_number'], student.get('department'),
+        student.get('level'), student.get('photo'),
+        student['registered_courses'].get(semester, []),
+        student['registration_status'].get(semester, 'not_started'),
+        {role: [s.get('name'), s.get('signature'), s.get('updated_at')] for role, s in (signatures or {}).items()}
+    ]
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()[:32]
+
+
+@lru_cache(maxsize=None)
+def _cached_image_class():
+    from reportlab.platypus import Flowable
+
+    class CachedImage(Flowable):
+        """
+        Draws an already-decoded ImageReader scaled to fit the box, keeping its aspect ratio.
+        """
+
+        def __init__(self, reader, width, height):
+            super().__init__()
+            iw, ih = reader.getSize()
+            scale = min(width / iw, height / ih)
+            self.reader = reader
+            self.width = iw * scale
+            self.height = ih * scale
+
+        def wrap(self, available_width, available_height):
+            return self.width, self.height
+
+        def draw(self):
+            self.canv.drawImage(self.reader, 0, 0, self.width, self.height, mask='auto')
+
+    return CachedImage
+
+
+def _image(path, width, height):
+    reader = images.get(path)
+    if reader is None:
+        return None
+    return _cached_image_class()(reader, width, height)
+
+
+def render(student, semester, signatures):
+    """
+    Build the course registration form for one student and semester as PDF bytes.
+    """
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.units import mm
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+
+    primary = colors.HexColor(PRIMARY)
+    styles = getSampleStyleSheet()
+    title = ParagraphStyle('title', parent=styles['Title'], textColor=primary, fontSize=16, spaceAfter=2)
+    subtitle = ParagraphStyle('subtitle', parent=styles['Heading2'], alignment=1, fontSize=12, spaceAfter=2)
+    small = ParagraphStyle('small', parent=styles['Normal'], fontSize=8, textColor=colors.grey)
+    centered_small = ParagraphStyle('centered_small', parent=small, alignment=1)
+    normal = styles['Normal']
+
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, leftMargin=15 * mm, rightMargin=15 * mm,
+                            topMargin=12 * mm, bottomMargin=12 * mm,
+                            title=f"Course Form {student['matric_number']}")
+
+    year = datetime.now().year
+    semester_label = 'First' if semester == 'first_semester' else 'Second'
+    heading = [
+        Paragraph('IGBINEDION UNIVERSITY OKADA', title),
+        Paragraph('COURSE REGISTRATION FORM', subtitle),
+        Paragraph(f'{semester_label} Semester {year}/{year + 1} Academic Session', centered_small)
+    ]
+    photo = _image(student.get('photo'), 22 * mm, 26 * mm) or ''
+    story = [
+        Table([[heading, photo]], colWidths=[150 * mm, 30 * mm],
+              style=[('VALIGN', (0, 0), (-1, -1), 'MIDDLE')]),
+        Spacer(1, 6 * mm)
+    ]
+
+    info = [
+        [Paragraph('Full Name:', small), Paragraph(f"<b>{escape(student.get('full_name', ''))}</b>", normal),
+         Paragraph('Matric Number:', small), Paragraph(f"<b>{escape(student['matric_number'])}</b>", normal)],
+        [Paragraph('Department:', small), Paragraph(f"<b>{escape(student.get('department', ''))}</b>", normal),
+         Paragraph('Level:', small), Paragraph(f"<b>{escape(student.get('level', ''))}</b>", normal)]
+    ]
+    story += [Table(info, colWidths=[25 * mm, 65 * mm, 28 * mm, 62 * mm]), Spacer(1, 6 * mm)]
+
+    courses = student['registered_courses'].get(semester, [])
+    rows = [['S/N', 'Course Code', 'Course Title', 'Units', 'Status']]
+    for i, course in enumerate(courses, 1):
+        rows.append([
+            str(i), course.get('courseCode', ''), Paragraph(escape(course.get('courseTitle', '')), normal),
+            str(course.get('units', 0)), 'Core' if course.get('isCore') else 'Elective'
+        ])
+    rows.append(['', '', 'TOTAL UNITS:', str(sum(c.get('units', 0) for c in courses)), ''])
+
+    table = Table(rows, colWidths=[12 * mm, 28 * mm, 100 * mm, 16 * mm, 24 * mm], repeatRows=1)
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), primary),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+        ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#F9FAFB')),
+        ('ALIGN', (3, 0), (-1, -1), 'CENTER'),
+        ('ALIGN', (2, -1), (2, -1), 'RIGHT'),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#D1D5DB')),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('FONTSIZE', (0, 0), (-1, -1), 9)
+    ]))
+    story += [Paragraph('<b>Registered Courses</b>', styles['Heading3']), table, Spacer(1, 6 * mm)]
+
+    status = student['registration_status'].get(semester, 'not_started')
+    story += [Paragraph(f"<b>{STATUS_TEXT.get(status, 'Not Submitted')}</b>", normal), Spacer(1, 10 * mm)]
+
+    cells = []
+    for role, label in SIGNATURE_ROLES:
+        entry = (signatures or {}).get(role) or {}
+        sig = _image(entry.get('signature'), 35 * mm, 14 * mm) or Spacer(1, 14 * mm)
+        cells.append([sig, Paragraph(f"<b>{escape(entry.get('name') or '___________________')}</b>", centered_small),
+                      Paragraph(label, centered_small)])
+    story.append(Table([cells], colWidths=[45 * mm] * 4,
+                       style=[('ALIGN', (0, 0), (-1, -1), 'CENTER'), ('VALIGN', (0, 0), (-1, -1), 'BOTTOM')]))
+
+    story += [
+        Spacer(1, 8 * mm),
+        Paragraph(f"Generated {datetime.now().strftime('%d %B %Y')}", centered_small),
+        Paragraph('Igbinedion University Okada • Course Registration System', centered_small)
+    ]
+
+    doc.build(story)
+    return buffer.getvalue()
+
+
+def get_pdf(student, semester, signatures, store=True):
+    """
+    Return (pdf_bytes, version), rendering only when the form has changed.
+    Bulk exports pass store=False so they don't evict forms students are viewing.
+    """
+    version = form_version(student, semester, signatures)
+    key = (student['matric_number'], semester, version)
+    pdf = renders.get(key)
+    if pdf is None:
+        pdf = render(student, semester, signatures)
+        if store:
+            renders.put(key, pdf)
+    return pdf, version
+
+
+class _ChunkWriter(io.RawIOBase):
+    """
+    Write-only, non-seekable sink that lets zipfile stream into a generator.
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.offset = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.offset
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_zip(students, semester, signatures):
+    """
+    Yield a ZIP of course forms one PDF at a time; only the current form is held in memory.
+    """
+    sink = _ChunkWriter()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for student in students:
+            pdf, _ = get_pdf(student, semester, signatures, store=False)
+            name = student['matric_number'].replace('/', '_') + f'_{semester}.pdf'
+            archive.writestr(name, pdf)
+            yield sink.drain()
+    yield sink.drain()
@@ -0,0 +1,209 @@
+import sqlite3
+import threading
+
+SEMESTERS = ['first_semester', 'second_semester']
+
+# Registrations in these states hold a seat against a course's capacity
+HOLDS_SEAT = ('pending', 'approved')
+
+
+def entries(student):
+    """
+    {(semester, courseCode): status} for every course a student has registered.
+    """
+    if student is None:
+        return {}
+    status = student.get('registration_status') or {}
+    found = {}
+    for sem in SEMESTERS:
+        for course in (student.get('registered_courses') or {}).get(sem, []):
+            code = course.get('courseCode') if isinstance(course, dict) else None
+            if code:
+                found[(sem, code)] = status.get(sem, 'not_started')
+    return found
+
+
+class EnrolmentIndex:
+    """
+    Inverted index (semester, courseCode) -> matric numbers, with the
+    registration status of each row, kept in SQLite and shared by all workers.
+
+    apply() is a student store listener, so every write path (registration,
+    approve, reject, delete, bulk actions) keeps it current. reserve() lets
+    register_courses claim seats in capped courses atomically.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._conn().executescript("""
+            CREATE TABLE IF NOT EXISTS enrolments (
+                semester TEXT NOT NULL,
+                course_code TEXT NOT NULL,
+                matric_number TEXT NOT NULL,
+                status TEXT NOT NULL,
+                PRIMARY KEY (semester, course_code, matric_number)
+            );
+            CREATE INDEX IF NOT EXISTS idx_enrolments_matric ON enrolments (matric_number);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        """)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _sync(conn, matric, before, after):
+        for sem, code in set(before) - set(after):
+            conn.execute(
+                'DELETE FROM enrolments WHERE semester = ? AND course_code = ? AND matric_number = ?',
+                (sem, code, matric)
+            )
+        for (sem, code), status in after.items():
+            conn.execute(
+                'INSERT INTO enrolments (semester, course_code, matric_number, status) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT(semester, course_code, matric_number) DO UPDATE SET status = excluded.status',
+                (sem, code, matric, status)
+            )
+
+    def apply(self, changes):
+        """
+        Store listener: move index rows for a list of (before, after) students.
+        """
+        updates = []
+        for before, after in changes:
+            old, new = entries(before), entries(after)
+            if old != new:
+                updates.append(((after or before)['matric_number'], old, new))
+        if not updates:
+            return
+
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for matric, old, new in updates:
+                self._sync(conn, matric, old, new)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def reserve(self, matric, semester, codes, capacities):
+        """
+        Claim pending seats for matric in semester's courses. Courses listed in
+        capacities are checked against pending + approved registrations of other
+        students inside the same transaction. Returns the codes that are full;
+        nothing is written unless that list is empty.
+        """
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            full = []
+            for code in codes:
+                limit = capacities.get(code)
+                if limit is None:
+                    continue
+                taken = conn.execute(
+                    'SELECT COUNT(*) FROM enrolments WHERE semester = ? AND course_code = ? '
+                    'AND matric_number != ? AND status IN (?, ?)',
+                    (semester, code, matric) + HOLDS_SEAT
+                ).fetchone()[0]
+                if taken >= limit:
+                    full.append(code)
+            if full:
+                conn.execute('ROLLBACK')
+                return full
+
+            old = self._semester_rows(conn, matric, semester)
+            self._sync(conn, matric, old, {(semester, code): 'pending' for code in codes})
+            conn.execute('COMMIT')
+            return []
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def release(self, matric, semester, student):
+        """
+        Undo a reserve() whose registration was not saved: matric's rows for
+        semester go back to what the stored student record holds (none if
+        student is None).
+        """
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            old = self._semester_rows(conn, matric, semester)
+            new = {key: status for key, status in entries(student).items() if key[0] == semester}
+            self._sync(conn, matric, old, new)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    @staticmethod
+    def _semester_rows(conn, matric, semester):
+        return {
+            (semester, code): status
+            for code, status in conn.execute(
+                'SELECT course_code, status FROM enrolments WHERE semester = ? AND matric_number = ?',
+                (semester, matric)
+            )
+        }
+
+    def roster(self, semester, code, status=None, limit=100, after=None):
+        """
+        One page of (matric_number, status) rows for a course in matric order.
+        """
+        sql = 'SELECT matric_number, status FROM enrolments WHERE semester = ? AND course_code = ?'
+        params = [semester, code]
+        if status:
+            sql += ' AND status = ?'
+            params.append(status)
+        if after:
+            sql += ' AND matric_number > ?'
+            params.append(after)
+        sql += ' ORDER BY matric_number LIMIT ?'
+        params.append(limit)
+        return self._conn().execute(sql, params).fetchall()
+
+    def counts(self, semester, codes=None):
+        """
+        {courseCode: {status: n}} for a semester, optionally limited to codes.
+        """
+        sql = 'SELECT course_code, status, COUNT(*) FROM enrolments WHERE semester = ?'
+        params = [semester]
+        if codes:
+            sql += f" AND course_code IN ({', '.join('?' * len(codes))})"
+            params.extend(codes)
+        sql += ' GROUP BY course_code, status'
+        result = {}
+        for code, status, n in self._conn().execute(sql, params):
+            result.setdefault(code, {})[status] = n
+        return result
+
+    def is_built(self):
+        return self._conn().execute("SELECT 1 FROM meta WHERE key = 'built'").fetchone() is not None
+
+    def rebuild(self, students):
+        conn = self._conn()
+        rows = 0
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('DELETE FROM enrolments')
+            for student in students:
+                found = entries(student)
+                conn.executemany(
+                    'INSERT INTO enrolments (semester, course_code, matric_number, status) VALUES (?, ?, ?, ?)',
+                    [(sem, code, student['matric_number'], status) for (sem, code), status in found.items()]
+                )
+                rows += len(found)
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('built', '1')")
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return rows
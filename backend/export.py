@@ -0,0 +1,85 @@
+import csv
+import io
+import json
+
+SEMESTERS = ['first_semester', 'second_semester']
+
+COURSE_FIELDS = ['matric_number', 'full_name', 'department', 'level', 'semester', 'status',
+                 'course_code', 'course_title', 'units', 'is_core']
+STUDENT_FIELDS = ['matric_number', 'full_name', 'department', 'level', 'email', 'phone', 'semester',
+                  'status', 'course_count', 'total_units', 'course_codes']
+
+# Rows are buffered into chunks of roughly this size before being yielded
+CHUNK_BYTES = 64 * 1024
+
+
+def course_rows(student, semesters, status=None):
+    for semester in semesters:
+        state = student['registration_status'].get(semester, 'not_started')
+        if status and state != status:
+            continue
+        for course in student['registered_courses'].get(semester, []):
+            yield {
+                'matric_number': student['matric_number'],
+                'full_name': student.get('full_name', ''),
+                'department': student.get('department', ''),
+                'level': student.get('level', ''),
+                'semester': semester,
+                'status': state,
+                'course_code': course.get('courseCode', ''),
+                'course_title': course.get('courseTitle', ''),
+                'units': course.get('units', 0),
+                'is_core': bool(course.get('isCore'))
+            }
+
+
+def student_rows(student, semesters, status=None):
+    for semester in semesters:
+        state = student['registration_status'].get(semester, 'not_started')
+        if status and state != status:
+            continue
+        courses = student['registered_courses'].get(semester, [])
+        yield {
+            'matric_number': student['matric_number'],
+            'full_name': student.get('full_name', ''),
+            'department': student.get('department', ''),
+            'level': student.get('level', ''),
+            'email': student.get('email', ''),
+            'phone': student.get('phone', ''),
+            'semester': semester,
+            'status': state,
+            'course_count': len(courses),
+            'total_units': sum(c.get('units', 0) for c in courses),
+            'course_codes': ';'.join(c.get('courseCode', '') for c in courses)
+        }
+
+
+def stream(students, fmt='csv', per='course', semester=None, status=None):
+    """
+    Yield an export of students as CSV or NDJSON text chunks.
+
+    per='course' gives one row per (student, semester, course) and
+    per='student' one row per (student, semester). Only the current chunk
+    is held in memory, so students can be any lazy iterable.
+    """
+    semesters = [semester] if semester else SEMESTERS
+    rows_for, fields = (course_rows, COURSE_FIELDS) if per == 'course' else (student_rows, STUDENT_FIELDS)
+
+    buffer = io.StringIO()
+    if fmt == 'csv':
+        writer = csv.DictWriter(buffer, fieldnames=fields, lineterminator='\n')
+        writer.writeheader()
+        write = writer.writerow
+    else:
+        def write(row):
+            buffer.write(json.dumps(row))
+            buffer.write('\n')
+
+    for student in students:
+        for row in rows_for(student, semesters, status):
+            write(row)
+        if buffer.tell() >= CHUNK_BYTES:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
@@ -0,0 +1,139 @@
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class HashPoolBusy(Exception):
+    """
+    Raised when the hashing queue is full; the request should be retried later.
+    """
+
+    def __init__(self, retry_after):
+        super().__init__('Password hashing queue full')
+        self.retry_after = retry_after
+
+
+def _hash(password, method):
+    return generate_password_hash(password, method=method)
+
+
+def _verify(pwhash, password):
+    return check_password_hash(pwhash, password)
+
+
+class PasswordHasher:
+    """
+    Runs password hashing and verification in a small process pool so scrypt
+    work cannot occupy every request worker.
+
+    At most workers + queue_size calls are admitted at once; callers wait up to
+    queue_timeout seconds for a slot and otherwise get HashPoolBusy. With
+    workers=0 hashing runs inline but admission still applies.
+    """
+
+    def __init__(self, method='scrypt:32768:8:1', workers=2, queue_size=16, queue_timeout=2.0, retry_after=2):
+        self.method = method
+        # werkzeug writes the full parameters into each hash ('scrypt' -> 'scrypt:32768:8:1'),
+        # so rehash decisions compare against the prefix this method actually produces
+        self.prefix = _hash('', method).split('$', 1)[0]
+        self.workers = workers
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self._slots = threading.BoundedSemaphore(max(workers, 1) + queue_size)
+        self._pool = None
+        self._pool_pid = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+        self._rehashed = 0
+        self._latencies = deque(maxlen=1000)
+
+    def _executor(self):
+        # Pools do not survive fork, so each gunicorn worker builds its own on first use
+        with self._lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    @contextmanager
+    def _admitted(self):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            with self._lock:
+                self._rejected += 1
+            raise HashPoolBusy(self.retry_after)
+
+        with self._lock:
+            self._in_flight += 1
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self._in_flight -= 1
+                self._completed += 1
+                self._latencies.append(elapsed)
+            self._slots.release()
+
+    def _run(self, fn, *args):
+        with self._admitted():
+            if self.workers > 0:
+                return self._executor().submit(fn, *args).result()
+            return fn(*args)
+
+    def hash(self, password):
+        return self._run(_hash, password, self.method)
+
+    def hash_many(self, passwords):
+        """
+        Hash a batch of passwords across the pool's workers. The whole batch
+        takes one admission slot, so a bulk import cannot fill the queue that
+        logins and registrations wait in.
+        """
+        if not passwords:
+            return []
+        with self._admitted():
+            if self.workers > 0:
+                chunksize = max(1, len(passwords) // (self.workers * 4))
+                return list(self._executor().map(
+                    _hash, passwords, [self.method] * len(passwords), chunksize=chunksize
+                ))
+            return [_hash(p, self.method) for p in passwords]
+
+    def verify(self, pwhash, password):
+        return self._run(_verify, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        return pwhash.split('$', 1)[0] != self.prefix
+
+    def rehashed(self):
+        with self._lock:
+            self._rehashed += 1
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            in_flight = self._in_flight
+
+            def pct(p):
+                if not latencies:
+                    return 0.0
+                return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 2)
+
+            return {
+                'method': self.method,
+                'workers': self.workers,
+                'in_flight': in_flight,
+                'queue_depth': max(in_flight - max(self.workers, 1), 0),
+                'completed': self._completed,
+                'rejected': self._rejected,
+                'rehashed': self._rehashed,
+                'latency_ms': {'p50': pct(0.5), 'p95': pct(0.95), 'p99': pct(0.99)}
+            }
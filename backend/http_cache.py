@@ -0,0 +1,164 @@
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+
+from flask import Response, request
+from werkzeug.http import is_resource_modified
+
+# Bodies smaller than this aren't worth a gzip header and a CPU round trip
+MIN_COMPRESS_SIZE = 1024
+COMPRESSIBLE = ('application/json', 'text/')
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+class ResponseCache:
+    """
+    Serialized (and gzipped) response bodies keyed by ETag, bounded by total size.
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, key, body):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._entries[key] = body
+            self._bytes += len(body)
+            while self._entries and self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0,
+                'entries': len(self._entries),
+                'bytes': self._bytes
+            }
+
+
+def accepts_gzip():
+    return request.accept_encodings.quality('gzip') > 0
+
+
+def etag_for(*parts):
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()[:24]
+
+
+def compress(body):
+    # mtime=0 keeps the output byte-identical for identical input
+    return gzip.compress(body, compresslevel=6, mtime=0)
+
+
+def send_json(body, etag=None, last_modified=None, cache=None, cache_control='private, no-cache'):
+    """
+    Serve a JSON body with validators and Accept-Encoding negotiation.
+
+    body is bytes, or a callable returning bytes that is only called when the
+    client's copy is stale and the body isn't in cache. Without an etag one is
+    derived from the body. A gzipped body gets its own ETag ('<etag>-gz'), so
+    both representations validate independently, and is cached under it;
+    bodies too small to compress keep the plain ETag.
+    """
+    if etag is None:
+        body = body() if callable(body) else body
+        etag = etag_for(body)
+
+    gzipped = accepts_gzip()
+    # Whether the body is sent compressed depends on its size, so the client's
+    # own tag is trusted to say which variant it holds
+    if gzipped and f'{etag}-gz' in request.if_none_match:
+        tag = f'{etag}-gz'
+    elif not gzipped or etag in request.if_none_match:
+        tag = etag
+    else:
+        tag = None
+
+    payload = None
+    if tag is None or is_resource_modified(request.environ, etag=tag, last_modified=last_modified):
+        payload = _payload(body, etag, gzipped, cache)
+        tag = f'{etag}-gz' if payload[:2] == GZIP_MAGIC else etag
+        if not is_resource_modified(request.environ, etag=tag, last_modified=last_modified):
+            payload = None
+
+    if payload is None:
+        response = Response(status=304)
+    else:
+        response = Response(payload, mimetype='application/json')
+        # JSON never starts with the gzip magic, so the body says which variant it is
+        if payload[:2] == GZIP_MAGIC:
+            response.headers['Content-Encoding'] = 'gzip'
+
+    response.set_etag(tag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = cache_control
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def _payload(body, etag, gzipped, cache):
+    """
+    The bytes to send: the plain body cached under etag, its gzipped form
+    under '<etag>-gz' when the client accepts gzip and it is big enough.
+    """
+    if gzipped and cache is not None:
+        payload = cache.get(f'{etag}-gz')
+        if payload is not None:
+            return payload
+    payload = cache.get(etag) if cache is not None else None
+    if payload is None:
+        payload = body() if callable(body) else body
+        if cache is not None:
+            cache.put(etag, payload)
+    if gzipped and len(payload) >= MIN_COMPRESS_SIZE:
+        payload = compress(payload)
+        if cache is not None:
+            cache.put(f'{etag}-gz', payload)
+    return payload
+
+
+def compress_response(response):
+    """
+    after_request hook: gzip other buffered text/JSON responses for clients that accept it.
+    """
+    if (response.status_code < 200 or response.status_code in (204, 304)
+            or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or not (response.mimetype or '').startswith(COMPRESSIBLE)):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    if not accepts_gzip():
+        return response
+    body = response.get_data()
+    if len(body) < MIN_COMPRESS_SIZE:
+        return response
+
+    response.set_data(compress(body))
+    response.headers['Content-Encoding'] = 'gzip'
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(f'{etag}-gz', weak)
+    return response
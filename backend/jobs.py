@@ -0,0 +1,454 @@
+import atexit
+import fcntl
+import importlib
+import json
+import logging
+import multiprocessing
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+FINISHED = ('completed', 'failed', 'cancelled')
+
+# name -> fn(job, **params); filled by @task at import time of the module that defines them
+TASKS = {}
+
+
+def task(name):
+    """
+    Register fn(job, **params) as the handler for jobs of kind name.
+    """
+    def register(fn):
+        TASKS[name] = fn
+        return fn
+    return register
+
+
+class JobCancelled(Exception):
+    """
+    Raised from Job.progress() once the job has been cancelled; tasks should let it propagate.
+    """
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _iso(ts):
+    return datetime.fromtimestamp(ts).isoformat() if ts else None
+
+
+class Job:
+    """
+    What a task sees of its job: params, progress reporting and a result file.
+    """
+
+    def __init__(self, queue, row):
+        self.queue = queue
+        self.id = row['id']
+        self.kind = row['kind']
+        self.params = json.loads(row['params'])
+        self.attempt = row['attempts']
+        self.result_file = None
+        self.done = 0
+
+    def progress(self, done, total=None, message=None):
+        """
+        Record progress; raises JobCancelled if an admin cancelled the job.
+        """
+        if self.queue.progress(self.id, done, total, message):
+            raise JobCancelled()
+
+    def track(self, items, every=100):
+        """
+        Yield from items, reporting progress every `every` items and at the end.
+        """
+        for item in items:
+            yield item
+            self.done += 1
+            if self.done % every == 0:
+                self.progress(self.done)
+        self.progress(self.done)
+
+    def output(self, ext, name, mimetype):
+        """
+        Path to write the job's downloadable result to.
+        """
+        self.result_file = (f'{self.id}.{ext}', name, mimetype)
+        return os.path.join(self.queue.directory, self.result_file[0])
+
+
+class JobQueue:
+    """
+    Background jobs kept in SQLite and result files in a directory, shared by
+    every web worker and job worker process on the host.
+
+    Workers claim the oldest queued job inside a write transaction and
+    heartbeat while it runs. A running job whose worker process died (or
+    stopped heartbeating) is put back in the queue until it has been tried
+    max_attempts times; a task that raises fails without a retry.
+    """
+
+    def __init__(self, path, directory, max_attempts=3, heartbeat_timeout=30):
+        self.path = path
+        self.directory = directory
+        self.max_attempts = max_attempts
+        self.heartbeat_timeout = heartbeat_timeout
+        self._local = threading.local()
+        os.makedirs(directory, exist_ok=True)
+        self._conn().executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                params TEXT NOT NULL,
+                status TEXT NOT NULL,
+                created_by TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL,
+                worker_pid INTEGER,
+                heartbeat REAL,
+                done INTEGER NOT NULL DEFAULT 0,
+                total INTEGER,
+                message TEXT,
+                cancel_requested INTEGER NOT NULL DEFAULT 0,
+                result TEXT,
+                result_file TEXT,
+                result_name TEXT,
+                result_type TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at);
+        """)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def to_dict(row):
+        return {
+            'id': row['id'],
+            'kind': row['kind'],
+            'params': json.loads(row['params']),
+            'status': 'cancelling' if row['status'] == 'running' and row['cancel_requested'] else row['status'],
+            'created_by': row['created_by'],
+            'created_at': _iso(row['created_at']),
+            'started_at': _iso(row['started_at']),
+            'finished_at': _iso(row['finished_at']),
+            'attempts': row['attempts'],
+            'max_attempts': row['max_attempts'],
+            'progress': {'done': row['done'], 'total': row['total']},
+            'message': row['message'],
+            'result': json.loads(row['result']) if row['result'] else None,
+            'has_file': bool(row['result_file'])
+        }
+
+    def enqueue(self, kind, params, created_by=None, job_id=None):
+        if kind not in TASKS:
+            raise ValueError(f'Unknown job kind {kind}')
+        job_id = job_id or secrets.token_hex(8)
+        self._conn().execute(
+            'INSERT INTO jobs (id, kind, params, status, created_by, created_at, max_attempts) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (job_id, kind, json.dumps(params), 'queued', created_by, time.time(), self.max_attempts)
+        )
+        return self.get(job_id)
+
+    def row(self, job_id):
+        if not job_id or not job_id.isalnum():
+            return None
+        return self._conn().execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+
+    def get(self, job_id):
+        row = self.row(job_id)
+        return self.to_dict(row) if row else None
+
+    def list(self, created_by=None, status=None, limit=50):
+        sql = 'SELECT * FROM jobs WHERE 1 = 1'
+        params = []
+        if created_by:
+            sql += ' AND created_by = ?'
+            params.append(created_by)
+        if status:
+            sql += ' AND status = ?'
+            params.append(status)
+        sql += ' ORDER BY created_at DESC LIMIT ?'
+        params.append(limit)
+        return [self.to_dict(row) for row in self._conn().execute(sql, params)]
+
+    def cancel(self, job_id):
+        """
+        Cancel a queued job at once, or ask a running one to stop at its next
+        progress report. Returns the job, or None if it does not exist.
+        """
+        conn = self._conn()
+        conn.execute(
+            "UPDATE jobs SET status = 'cancelled', finished_at = ?, message = 'Cancelled' "
+            "WHERE id = ? AND status = 'queued'",
+            (time.time(), job_id)
+        )
+        conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = 'running'", (job_id,))
+        return self.get(job_id)
+
+    def progress(self, job_id, done, total=None, message=None):
+        """
+        Save progress and heartbeat; returns True if the job should stop.
+        """
+        conn = self._conn()
+        conn.execute(
+            'UPDATE jobs SET done = ?, total = COALESCE(?, total), message = COALESCE(?, message), '
+            'heartbeat = ? WHERE id = ?',
+            (done, total, message, time.time(), job_id)
+        )
+        row = conn.execute('SELECT cancel_requested FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return bool(row and row[0])
+
+    def heartbeat(self, job_id):
+        self._conn().execute('UPDATE jobs SET heartbeat = ? WHERE id = ?', (time.time(), job_id))
+
+    def recover(self):
+        """
+        Requeue (or fail, once out of attempts) running jobs whose worker is gone.
+        """
+        conn = self._conn()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            rows = conn.execute("SELECT * FROM jobs WHERE status = 'running'").fetchall()
+            for row in rows:
+                stale = (row['heartbeat'] or 0) < now - self.heartbeat_timeout
+                if not stale and _pid_alive(row['worker_pid']):
+                    continue
+                if row['cancel_requested']:
+                    status, message = 'cancelled', 'Cancelled'
+                elif row['attempts'] < row['max_attempts']:
+                    status, message = 'queued', f"Worker exited unexpectedly; retrying (attempt {row['attempts']} failed)"
+                else:
+                    status, message = 'failed', f"Worker exited unexpectedly {row['attempts']} times"
+                conn.execute(
+                    'UPDATE jobs SET status = ?, message = ?, worker_pid = NULL, finished_at = ? WHERE id = ?',
+                    (status, message, None if status == 'queued' else now, row['id'])
+                )
+                logger.warning('job worker lost', extra={'job': row['id'], 'kind': row['kind'], 'status': status})
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def claim(self):
+        """
+        Take the oldest queued job for this process, or return None.
+        """
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                conn.execute('COMMIT')
+                return None
+            now = time.time()
+            conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, worker_pid = ?, "
+                'started_at = ?, heartbeat = ?, done = 0, total = NULL WHERE id = ?',
+                (os.getpid(), now, now, row['id'])
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return Job(self, self.row(row['id']))
+
+    def finish(self, job, status, result=None, message=None):
+        result_file, result_name, result_type = job.result_file or (None, None, None)
+        if status != 'completed' and result_file:
+            try:
+                os.remove(os.path.join(self.directory, result_file))
+            except FileNotFoundError:
+                pass
+            result_file = result_name = result_type = None
+        self._conn().execute(
+            'UPDATE jobs SET status = ?, finished_at = ?, result = ?, message = ?, result_file = ?, '
+            'result_name = ?, result_type = ?, worker_pid = NULL WHERE id = ?',
+            (status, time.time(), json.dumps(result) if result is not None else None, message,
+             result_file, result_name, result_type, job.id)
+        )
+
+    def run(self, job):
+        """
+        Run a claimed job in this process, heartbeating from a side thread.
+        """
+        stop = threading.Event()
+
+        def beat():
+            while not stop.wait(self.heartbeat_timeout / 5):
+                self.heartbeat(job.id)
+
+        threading.Thread(target=beat, daemon=True).start()
+        try:
+            result = TASKS[job.kind](job, **job.params)
+            self.finish(job, 'completed', result)
+        except JobCancelled:
+            self.finish(job, 'cancelled', message='Cancelled')
+        except Exception as e:
+            logger.exception('job failed', extra={'job': job.id, 'kind': job.kind})
+            self.finish(job, 'failed', message=str(e) or type(e).__name__)
+        finally:
+            stop.set()
+
+    def result_file(self, job_id):
+        """
+        (path, download name, mimetype) of a completed job's file, or None.
+        """
+        row = self.row(job_id)
+        if not row or row['status'] != 'completed' or not row['result_file']:
+            return None
+        return os.path.join(self.directory, row['result_file']), row['result_name'], row['result_type']
+
+    def purge(self, older_than_days=7):
+        """
+        Drop finished jobs, and their files, that ended more than older_than_days ago.
+        """
+        conn = self._conn()
+        cutoff = time.time() - older_than_days * 86400
+        rows = conn.execute(
+            f"SELECT id, result_file FROM jobs WHERE status IN ({', '.join('?' * len(FINISHED))}) "
+            'AND finished_at < ?',
+            FINISHED + (cutoff,)
+        ).fetchall()
+        for row in rows:
+            if row['result_file']:
+                try:
+                    os.remove(os.path.join(self.directory, row['result_file']))
+                except FileNotFoundError:
+                    pass
+            conn.execute('DELETE FROM jobs WHERE id = ?', (row['id'],))
+        return len(rows)
+
+
+def _worker_main(path, directory, module, poll_interval):
+    importlib.import_module(module)
+    queue = JobQueue(path, directory)
+    parent = os.getppid()
+    while os.getppid() == parent:
+        job = queue.claim()
+        if job is None:
+            time.sleep(poll_interval)
+            continue
+        queue.run(job)
+
+
+class WorkerPool:
+    """
+    Keeps `workers` job processes running and restarts any that die.
+
+    One pool per host: start() takes an exclusive lock next to the database,
+    so whichever web worker (or `flask jobs-worker`) gets it first runs the
+    pool and every other start() is a no-op. Worker processes are spawned
+    fresh and import module to register its @task handlers.
+    """
+
+    def __init__(self, queue, module, workers=2, poll_interval=0.5, retention_days=7):
+        self.queue = queue
+        self.module = module
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.retention_days = retention_days
+        self._processes = []
+        self._lock_file = None
+        self._lock_pid = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    def _acquire(self):
+        lock_file = open(f'{self.queue.path}.lock', 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    def run(self):
+        """
+        Run the pool in the foreground; returns False if another process already runs it.
+        """
+        if not self._acquire():
+            return False
+        self._lock_pid = os.getpid()
+        self.supervise()
+
+    def start(self):
+        """
+        Start the pool in a background thread if no process on this host runs one.
+        """
+        if self.workers <= 0:
+            return False
+        with self._lock:
+            if self._lock_file is not None and self._lock_pid == os.getpid():
+                return True
+            self._lock_file = None
+            if not self._acquire():
+                return False
+            self._lock_pid = os.getpid()
+        threading.Thread(target=self.supervise, daemon=True).start()
+        return True
+
+    def _spawn(self):
+        context = multiprocessing.get_context('spawn')
+        process = context.Process(
+            target=_worker_main,
+            args=(self.queue.path, self.queue.directory, self.module, self.poll_interval),
+            name='job-worker'
+        )
+        process.start()
+        return process
+
+    def stop(self):
+        self._stopping.set()
+        for process in self._processes:
+            if process.is_alive():
+                process.terminate()
+        for process in self._processes:
+            process.join(5)
+
+    def supervise(self):
+        """
+        Run the pool in the current thread until the process exits.
+        """
+        atexit.register(self.stop)
+        self._processes = [self._spawn() for _ in range(self.workers)]
+        logger.info('job workers started', extra={'workers': self.workers})
+        last_purge = 0
+        while not self._stopping.is_set():
+            for i, process in enumerate(self._processes):
+                if not process.is_alive() and not self._stopping.is_set():
+                    process.join()
+                    logger.warning('job worker died, restarting', extra={'exitcode': process.exitcode})
+                    self._processes[i] = self._spawn()
+            self.queue.recover()
+            if time.time() - last_purge > 3600:
+                self.queue.purge(self.retention_days)
+                last_purge = time.time()
+            self._stopping.wait(1)
@@ -0,0 +1,44 @@
+import threading
+
+
+def once(fn):
+    """
+    Run fn the first time the wrapper is called and return that result from
+    then on, in every thread of the process.
+    """
+    lock = threading.Lock()
+    done = []
+
+    def wrapper():
+        if not done:
+            with lock:
+                if not done:
+                    done.append(fn())
+        return done[0]
+
+    wrapper.__name__ = fn.__name__
+    wrapper.__doc__ = fn.__doc__
+    return wrapper
+
+
+class Lazy:
+    """
+    Stands in for an object that is only built on first attribute access.
+
+    Module-level services (stores, indexes, pools) are declared as Lazy so
+    importing the app has no side effects on disk and a cold process only pays
+    for what its first request touches. Attribute access is forwarded, so
+    callers use the proxy exactly like the object it builds.
+    """
+
+    def __init__(self, factory):
+        self._factory = once(factory)
+        self.built = False
+
+    def resolve(self):
+        value = self._factory()
+        self.built = True
+        return value
+
+    def __getattr__(self, name):
+        return getattr(self.resolve(), name)
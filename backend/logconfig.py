@@ -0,0 +1,52 @@
+import json
+import logging
+import os
+import sys
+from datetime import datetime, timezone
+
+# Attributes every LogRecord has; anything else came in through extra={...}
+_STANDARD = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    One JSON object per line: time, level, logger, message, pid and any extra fields.
+    """
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'message': record.getMessage(),
+            'pid': record.process
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure(level=None, fmt=None):
+    """
+    Send application logs to stderr, as JSON lines or plain text (LOG_FORMAT=text),
+    at LOG_LEVEL (default INFO). Safe to call more than once.
+    """
+    level = (level or os.environ.get('LOG_LEVEL', 'INFO')).upper()
+    fmt = fmt or os.environ.get('LOG_FORMAT', 'json')
+
+    handler = logging.StreamHandler(sys.stderr)
+    if fmt == 'text':
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+    else:
+        handler.setFormatter(JSONFormatter())
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        if getattr(existing, '_portal', False):
+            root.removeHandler(existing)
+    handler._portal = True
+    root.addHandler(handler)
+    root.setLevel(level)
@@ -0,0 +1,69 @@
+import hashlib
+import io
+import os
+import re
+
+# (max width, max height) per stored variant
+PHOTO_SIZES = {'print': (600, 600), 'thumb': (160, 160)}
+SIGNATURE_SIZES = {'print': (600, 200), 'thumb': (240, 80)}
+
+# Names written by store_image: <sha256 hex>_<variant>.<ext>
+CONTENT_ADDRESSED = re.compile(r'^[0-9a-f]{64}_[a-z]+\.(jpg|png)$')
+
+
+class InvalidImage(Exception):
+    pass
+
+
+def _encode(image, keep_alpha):
+    buffer = io.BytesIO()
+    if keep_alpha:
+        image.save(buffer, format='PNG', optimize=True)
+        return buffer.getvalue(), 'png'
+    image.save(buffer, format='JPEG', quality=82, optimize=True, progressive=True)
+    return buffer.getvalue(), 'jpg'
+
+
+def store_image(upload, folder, sizes):
+    """
+    Normalise an uploaded image and write one file per size variant.
+
+    The image is rotated according to its EXIF orientation, downscaled to fit
+    each size and recompressed (JPEG, or PNG when it has transparency). Files
+    are named after the hash of their bytes, so a name never changes content
+    and identical uploads share a file. Returns {variant: path}.
+    """
+    # Pillow is only needed for uploads, so it isn't imported with the app
+    from PIL import Image, ImageOps
+
+    # Pillow decodes lazily: load() here so truncated or corrupt pixel data (and
+    # decompression bombs) fail inside the try instead of in convert()/thumbnail()
+    try:
+        image = Image.open(upload.stream)
+        image.load()
+        image = ImageOps.exif_transpose(image)
+        keep_alpha = image.mode in ('RGBA', 'LA', 'P') and (
+            image.mode != 'P' or 'transparency' in image.info
+        )
+        image = image.convert('RGBA' if keep_alpha else 'RGB')
+    except (OSError, ValueError, Image.DecompressionBombError):
+        raise InvalidImage('Unsupported or corrupt image')
+
+    paths = {}
+    for variant, box in sizes.items():
+        resized = image.copy()
+        resized.thumbnail(box, Image.LANCZOS)
+        data, ext = _encode(resized, keep_alpha)
+        name = f"{hashlib.sha256(data).hexdigest()}_{variant}.{ext}"
+        path = os.path.join(folder, name)
+        if not os.path.exists(path):
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+        paths[variant] = path
+    return paths
+
+
+def is_immutable(filename):
+    return bool(CONTENT_ADDRESSED.match(os.path.basename(filename)))
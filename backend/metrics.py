@@ -0,0 +1,311 @@
+import atexit
+import fcntl
+import json
+import os
+import threading
+import time
+
+# Latency buckets in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HELP = {
+    'http_requests_total': ('counter', 'HTTP requests by method, route and status.'),
+    'http_request_duration_seconds': ('histogram', 'Time to produce a response, by method and route.'),
+    'storage_operation_seconds': ('histogram', 'Student store call time, by operation kind and method.'),
+    'storage_bytes_total': ('counter', 'Student record bytes decoded (read) and encoded (write).'),
+    'cache_hits_total': ('counter', 'Cache hits by cache.'),
+    'cache_misses_total': ('counter', 'Cache misses by cache.'),
+    'cache_hit_ratio': ('gauge', 'Hits / (hits + misses) by cache, across all workers.'),
+    'hash_pool_in_flight': ('gauge', 'Password hash calls running or queued.'),
+    'hash_pool_queue_depth': ('gauge', 'Password hash calls waiting for a pool worker.'),
+    'hash_pool_completed_total': ('counter', 'Password hash calls completed.'),
+    'hash_pool_rejected_total': ('counter', 'Password hash calls rejected because the queue was full.'),
+    'admission_rejected_total': ('counter', 'Requests turned away by a rate limit (429) or a concurrency limit (503).'),
+    'admission_in_flight': ('gauge', 'Requests holding a concurrency slot, by route class.')
+}
+
+
+def _labels(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+# Counters and histograms of exited workers, folded together so their snapshots can be deleted
+RETIRED = 'retired.json'
+
+
+def _add(counters, histograms, snapshot):
+    for metric, labels, value in snapshot['counters']:
+        key = (metric, tuple(tuple(p) for p in labels))
+        counters[key] = counters.get(key, 0) + value
+    for metric, labels, hist in snapshot['histograms']:
+        key = (metric, tuple(tuple(p) for p in labels))
+        merged = histograms.setdefault(key, [0] * len(hist))
+        for i, v in enumerate(hist):
+            merged[i] += v
+
+
+def _start(name):
+    # <pid>-<start>.json; files from before start times were recorded count as oldest
+    _, _, start = name[:-len('.json')].partition('-')
+    return int(start) if start.isdigit() else 0
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class Metrics:
+    """
+    In-process counters, gauges and histograms, rendered in Prometheus text format.
+
+    Each process (gunicorn worker) snapshots its values to
+    <directory>/<pid>-<start>.json from a background thread every
+    flush_interval seconds while it has new data, and once more at exit.
+    render() merges every snapshot, so whichever worker answers /metrics
+    reports the whole server. Snapshots of exited workers are folded into
+    retired.json and deleted, so counters stay monotonic across restarts and
+    the directory does not grow; gauges only count live workers.
+
+    Collectors registered with collect() are called at snapshot time and
+    return (kind, name, labels, value) samples of state other objects already
+    keep (cache hit counts, hash pool depth).
+    """
+
+    def __init__(self, directory, flush_interval=1.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._counters = {}
+        self._histograms = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._flusher_pid = None
+        self._file_pid = None
+        self._file_name = None
+        os.makedirs(directory, exist_ok=True)
+
+    def inc(self, name, labels=None, value=1):
+        key = (name, _labels(labels or {}))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, labels, seconds):
+        key = (name, _labels(labels))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = [0] * len(BUCKETS) + [0.0, 0]
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    hist[i] += 1
+                    break
+            hist[-2] += seconds
+            hist[-1] += 1
+
+    def collect(self, fn):
+        self._collectors.append(fn)
+
+    def _snapshot(self):
+        with self._lock:
+            counters = [[name, list(labels), v] for (name, labels), v in self._counters.items()]
+            histograms = [[name, list(labels), list(h)] for (name, labels), h in self._histograms.items()]
+        gauges = []
+        for fn in self._collectors:
+            for kind, name, labels, value in fn():
+                target = counters if kind == 'counter' else gauges
+                target.append([name, list(_labels(labels)), value])
+        return {'pid': os.getpid(), 'counters': counters, 'histograms': histograms, 'gauges': gauges}
+
+    def _path(self):
+        # Keyed by pid and start time, so a reused pid never overwrites an older worker's totals
+        if self._file_pid != os.getpid():
+            self._file_pid = os.getpid()
+            self._file_name = f'{os.getpid()}-{time.time_ns()}.json'
+        return os.path.join(self.directory, self._file_name)
+
+    def flush(self):
+        path = self._path()
+        tmp = f'{path}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self._snapshot(), f)
+        os.replace(tmp, path)
+
+    def _final_flush(self):
+        try:
+            self.flush()
+        except OSError:
+            # The data directory may already be gone (tests, benchmarks)
+            pass
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            if self._dirty:
+                self._dirty = False
+                try:
+                    self.flush()
+                except OSError:
+                    self._dirty = True
+
+    def maybe_flush(self):
+        """
+        Mark this process's metrics as changed; the flusher thread writes them out.
+        """
+        self._dirty = True
+        if self._flusher_pid != os.getpid():
+            # Threads don't survive fork, so each worker starts its own on first use
+            with self._lock:
+                if self._flusher_pid != os.getpid():
+                    self._flusher_pid = os.getpid()
+                    threading.Thread(target=self._flush_loop, daemon=True).start()
+                    atexit.register(self._final_flush)
+
+    def _read(self, name):
+        try:
+            with open(os.path.join(self.directory, name)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _merged(self):
+        counters, histograms, gauges = {}, {}, {}
+        # One reader at a time, so a snapshot is never counted both in its file and in retired.json
+        with open(os.path.join(self.directory, '.lock'), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            retired = self._read(RETIRED) or {'counters': [], 'histograms': [], 'folded': []}
+            folded = set(retired['folded'])
+            snapshots, latest = [], {}
+            for name in os.listdir(self.directory):
+                if not name.endswith('.json') or name == RETIRED:
+                    continue
+                if name in folded:
+                    # Already in retired.json; only the delete failed last time
+                    self._remove(name)
+                    continue
+                snapshot = self._read(name)
+                if snapshot is None:
+                    continue
+                start = _start(name)
+                snapshots.append((name, start, snapshot))
+                latest[snapshot['pid']] = max(latest.get(snapshot['pid'], start), start)
+
+            dead = []
+            for name, start, snapshot in snapshots:
+                # An older file for a pid is from a process that exited before the pid was reused
+                if start < latest[snapshot['pid']] or not _pid_alive(snapshot['pid']):
+                    dead.append((name, snapshot))
+                    continue
+                _add(counters, histograms, snapshot)
+                for metric, labels, value in snapshot['gauges']:
+                    key = (metric, tuple(tuple(p) for p in labels))
+                    gauges[key] = gauges.get(key, 0) + value
+
+            if dead:
+                totals_c, totals_h = {}, {}
+                _add(totals_c, totals_h, retired)
+                for _, snapshot in dead:
+                    _add(totals_c, totals_h, snapshot)
+                retired = {
+                    'counters': [[m, [list(p) for p in labels], v] for (m, labels), v in totals_c.items()],
+                    'histograms': [[m, [list(p) for p in labels], h] for (m, labels), h in totals_h.items()],
+                    'folded': [name for name, _ in dead] + [
+                        name for name in folded if os.path.exists(os.path.join(self.directory, name))
+                    ]
+                }
+                path = os.path.join(self.directory, RETIRED)
+                with open(f'{path}.tmp', 'w') as f:
+                    json.dump(retired, f)
+                os.replace(f'{path}.tmp', path)
+                for name, _ in dead:
+                    self._remove(name)
+            _add(counters, histograms, retired)
+        return counters, histograms, gauges
+
+    def _remove(self, name):
+        try:
+            os.remove(os.path.join(self.directory, name))
+        except FileNotFoundError:
+            pass
+
+    def render(self):
+        """
+        Prometheus text exposition of all workers' metrics.
+        """
+        self.flush()
+        counters, histograms, gauges = self._merged()
+
+        # Hit ratios can't be summed per worker, so they are derived from the merged counts
+        for (metric, labels), hits in list(counters.items()):
+            if metric == 'cache_hits_total':
+                total = hits + counters.get(('cache_misses_total', labels), 0)
+                gauges[('cache_hit_ratio', labels)] = round(hits / total, 4) if total else 0.0
+
+        by_name = {}
+        for kind, samples in (('counter', counters), ('gauge', gauges), ('histogram', histograms)):
+            for (metric, labels), value in samples.items():
+                by_name.setdefault(metric, (kind, []))[1].append((labels, value))
+
+        lines = []
+        for metric in sorted(by_name):
+            kind, samples = by_name[metric]
+            lines.append(f'# HELP {metric} {HELP.get(metric, (kind, metric))[1]}')
+            lines.append(f'# TYPE {metric} {kind}')
+            for labels, value in sorted(samples):
+                if kind != 'histogram':
+                    lines.append(f'{metric}{_format_labels(labels)} {value}')
+                    continue
+                cumulative = 0
+                for bound, n in zip(BUCKETS, value):
+                    cumulative += n
+                    lines.append(f'{metric}_bucket{_format_labels(labels, [("le", bound)])} {cumulative}')
+                lines.append(f'{metric}_bucket{_format_labels(labels, [("le", "+Inf")])} {value[-1]}')
+                lines.append(f'{metric}_sum{_format_labels(labels)} {round(value[-2], 6)}')
+                lines.append(f'{metric}_count{_format_labels(labels)} {value[-1]}')
+        return '\n'.join(lines) + '\n'
+
+
+class InstrumentedStore:
+    """
+    Wraps a student store and times its calls into storage_operation_seconds.
+    Everything else is passed through to the wrapped store.
+    """
+
+    READS = {'get', 'exists', 'all', 'count', 'query'}
+    WRITES = {'insert', 'insert_many', 'save', 'save_many', 'update', 'update_many'}
+
+    def __init__(self, store, metrics):
+        self._store = store
+        self._metrics = metrics
+        for method in self.READS | self.WRITES:
+            if hasattr(store, method):
+                setattr(self, method, self._timed(method, 'read' if method in self.READS else 'write'))
+
+    def _timed(self, method, kind):
+        fn = getattr(self._store, method)
+        labels = {'kind': kind, 'method': method, 'backend': type(self._store).__name__}
+
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._metrics.observe('storage_operation_seconds', labels, time.perf_counter() - started)
+
+        return timed
+
+    def __getattr__(self, name):
+        return getattr(self._store, name)
@@ -0,0 +1,161 @@
+from datetime import datetime, timezone
+from catalog import parse_slot, find_clashes
+
+
+def _code(item):
+    if isinstance(item, dict):
+        return (item.get('courseCode') or '').strip()
+    return str(item or '').strip()
+
+
+def _label(slot):
+    day, start, end = slot
+
+    def clock(minutes):
+        hour, minute = divmod(minutes, 60)
+        return f"{(hour - 1) % 12 + 1}:{minute:02d} {'AM' if hour < 12 else 'PM'}"
+
+    return f"{day.capitalize()} {clock(start)} - {clock(end)}"
+
+
+def check_selection(catalog, student, semester, submitted, max_units, carryover_courses=()):
+    """
+    Resolve a submitted course selection against the catalog.
+
+    submitted may hold course codes or course objects; only their courseCode
+    is used, and each course is replaced by the catalog copy (so units come
+    from the server). Carryover courses issued to the student by token are
+    accepted even if they are not in the department catalog. Clashes are
+    found from the catalog's pre-parsed (day, start, end) slots.
+
+    Returns {'courses', 'total_units', 'max_units', 'unknown', 'duplicates',
+    'clashes', 'errors', 'valid'}.
+    """
+    semester_name = 'first' if semester == 'first_semester' else 'second'
+    department = student.get('department', '')
+    carryovers = {_code(c): c for c in carryover_courses if _code(c)}
+
+    courses, slots, unknown, duplicates, seen = [], [], [], [], set()
+    for item in submitted or []:
+        code = _code(item)
+        if not code:
+            unknown.append(code)
+            continue
+        if code in seen:
+            duplicates.append(code)
+            continue
+        seen.add(code)
+
+        course = catalog.course(department, semester_name, code)
+        if course is not None:
+            course = {k: v for k, v in course.items() if k != 'level'}
+            slot = catalog.slot(department, semester_name, code)
+        elif code in carryovers:
+            course = dict(carryovers[code])
+            slot = parse_slot(course.get('schedule'))
+        else:
+            unknown.append(code)
+            continue
+
+        if code in carryovers:
+            course['isCarryover'] = True
+        courses.append(course)
+        if slot:
+            slots.append((code, slot))
+
+    by_code = dict(slots)
+    clashes = [
+        {'course1': a, 'course2': b, 'time': _label(by_code[a])}
+        for a, b in find_clashes(slots)
+    ]
+    total_units = sum(c.get('units', 0) for c in courses)
+
+    errors = []
+    if unknown:
+        errors.append(f"Unknown courses: {', '.join(c or '(blank)' for c in unknown)}")
+    if duplicates:
+        errors.append(f"Duplicate courses: {', '.join(duplicates)}")
+    for clash in clashes:
+        errors.append(f"Timetable clash: {clash['course1']} and {clash['course2']} at {clash['time']}")
+    if total_units > max_units:
+        errors.append(f'Exceeded max ({max_units})')
+
+    return {
+        'courses': courses,
+        'total_units': total_units,
+        'max_units': max_units,
+        'unknown': unknown,
+        'duplicates': duplicates,
+        'clashes': clashes,
+        'errors': errors,
+        'valid': not errors
+    }
+
+
+def parse_timestamp(value):
+    """
+    An ISO 8601 date or datetime as an aware datetime; naive values are server local time.
+    """
+    moment = datetime.fromisoformat(str(value))
+    return moment if moment.tzinfo else moment.astimezone()
+
+
+def check_window(window):
+    """
+    Validate a registration window from config. Returns an error message or None.
+    """
+    if not isinstance(window, dict):
+        return 'Each window must be an object'
+    try:
+        start, end = parse_timestamp(window['start']), parse_timestamp(window['end'])
+    except (KeyError, ValueError):
+        return 'Each window needs ISO start and end times'
+    if end <= start:
+        return 'Window end must be after its start'
+    rate = window.get('admit_per_minute')
+    if rate is not None and (not isinstance(rate, (int, float)) or rate <= 0):
+        return 'admit_per_minute must be a positive number'
+    return None
+
+
+def find_window(windows, department, level):
+    """
+    The registration window that applies to a department and level. An entry
+    naming both beats one naming only the department, which beats one naming
+    only the level, which beats a catch-all. None when nothing applies, in
+    which case registration is open for the whole semester as before.
+    """
+    best, best_rank = None, -1
+    for window in windows or []:
+        dept, lvl = window.get('department'), window.get('level')
+        if dept and dept.upper() != str(department).upper():
+            continue
+        if lvl and str(lvl) != str(level):
+            continue
+        rank = (2 if dept else 0) + (1 if lvl else 0)
+        if rank > best_rank:
+            best, best_rank = window, rank
+    return best
+
+
+def window_scope(window):
+    """
+    Waiting-room queue name for a window: one FIFO queue per department/level slot.
+    """
+    if window is None:
+        return '*/*'
+    return f"{(window.get('department') or '*').upper()}/{window.get('level') or '*'}"
+
+
+def window_status(window, now=None):
+    """
+    'open', 'upcoming' or 'closed'; a missing window is always open.
+    """
+    if window is None:
+        return 'open'
+    now = now or datetime.now(timezone.utc)
+    if now < parse_timestamp(window['start']):
+        return 'upcoming'
+    if now >= parse_timestamp(window['end']):
+        return 'closed'
+    return 'open'
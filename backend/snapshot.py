@@ -0,0 +1,159 @@
+"""
+Compile the course catalogs and config.json into one binary snapshot.
+
+    python snapshot.py [data_dir]        (or: flask build-snapshot)
+
+Run it as a build step. At startup the snapshot is memory-mapped, and each
+catalog level's pre-serialized body and ETag are sliced out of it instead of
+parsing and re-serializing the JSON. Records carry the source file's
+(mtime, size) and a content digest. A file that was edited after the build
+is read from disk as usual.
+"""
+import hashlib
+import json
+import marshal
+import mmap
+import os
+import struct
+import sys
+
+MAGIC = b'ICRHSNAP'
+FORMAT = 1
+# magic, format, marshal version, index length
+HEADER = struct.Struct('<8sHHI')
+
+
+def _stamp(path):
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _digest(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def build(data_dir, out_path=None, config_name='config.json'):
+    """
+    Write data_dir/snapshot.bin (or out_path); returns (path, catalog files, bytes).
+    """
+    from catalog import CourseCatalog
+
+    out_path = out_path or os.path.join(data_dir, 'snapshot.bin')
+    blobs = []
+    size = 0
+
+    def add(data):
+        nonlocal size
+        blobs.append(data)
+        span = (size, len(data))
+        size += len(data)
+        return span
+
+    def record(path):
+        return {'name': os.path.basename(path), 'stamp': _stamp(path), 'digest': _digest(path)}
+
+    catalog = CourseCatalog(data_dir)
+    catalogs = {}
+    for (department, semester), indexed in sorted(catalog._files.items()):
+        entry = record(indexed['path'])
+        entry['levels'] = {
+            level: add(e['body']) + (e['etag'],) for level, e in indexed['levels'].items()
+        }
+        fallback = indexed['fallback']
+        entry['fallback'] = add(fallback['body']) + (fallback['etag'],) if fallback else None
+        catalogs[f'{department}|{semester}'] = entry
+
+    files = {}
+    config_path = os.path.join(data_dir, config_name)
+    if os.path.exists(config_path):
+        with open(config_path, 'r') as f:
+            config = json.load(f)
+        files[config_name] = dict(record(config_path), blob=add(marshal.dumps(config)))
+
+    index = marshal.dumps({'catalogs': catalogs, 'files': files})
+    tmp = f'{out_path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, FORMAT, marshal.version, len(index)))
+        f.write(index)
+        for blob in blobs:
+            f.write(blob)
+    os.replace(tmp, out_path)
+    return out_path, len(catalogs), HEADER.size + len(index) + size
+
+
+class Snapshot:
+    """
+    Read side of a snapshot file. A missing, foreign or outdated-format file
+    gives an empty snapshot, so callers never need to special-case it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.catalogs = {}
+        self.files = {}
+        self._map = None
+        self._base = 0
+        try:
+            with open(path, 'rb') as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            return
+        if len(self._map) < HEADER.size:
+            return
+        magic, fmt, marshal_version, index_len = HEADER.unpack_from(self._map)
+        if magic != MAGIC or fmt != FORMAT or marshal_version != marshal.version:
+            return
+        index = marshal.loads(self._map[HEADER.size:HEADER.size + index_len])
+        self.catalogs = index['catalogs']
+        self.files = index['files']
+        self._base = HEADER.size + index_len
+
+    def __bool__(self):
+        return bool(self.catalogs or self.files)
+
+    def blob(self, span):
+        offset, length = span[0], span[1]
+        start = self._base + offset
+        return self._map[start:start + length]
+
+    @staticmethod
+    def current(entry, path):
+        """
+        True if path still has the content entry was built from.
+        """
+        try:
+            if tuple(entry['stamp']) == _stamp(path):
+                return True
+            # Deploys often reset mtimes; the content digest settles it
+            return entry['digest'] == _digest(path)
+        except FileNotFoundError:
+            return False
+
+    def catalog(self, department, semester, path):
+        """
+        {level: (body, etag)} and the fallback (body, etag) or None for a
+        catalog file, or None if the snapshot has no current copy of it.
+        """
+        entry = self.catalogs.get(f'{department}|{semester}')
+        if not entry or entry['name'] != os.path.basename(path) or not self.current(entry, path):
+            return None
+        levels = {level: (self.blob(span), span[2]) for level, span in entry['levels'].items()}
+        fallback = (self.blob(entry['fallback']), entry['fallback'][2]) if entry['fallback'] else None
+        return levels, fallback
+
+    def load_json(self, path):
+        """
+        FileCache loader: the compiled copy of path if it is current, else the file itself.
+        """
+        entry = self.files.get(os.path.basename(path))
+        if entry and self.current(entry, path):
+            return marshal.loads(self.blob(entry['blob']))
+        with open(path, 'r') as f:
+            return json.load(f)
+
+
+if __name__ == '__main__':
+    target = sys.argv[1] if len(sys.argv) > 1 else 'data'
+    path, catalogs, size = build(target)
+    print(f'Wrote {path}: {catalogs} catalogs, {size} bytes')
@@ -0,0 +1,161 @@
+import sqlite3
+import threading
+import time
+
+SEMESTERS = ['first_semester', 'second_semester']
+STATUSES = ['not_started', 'pending', 'approved', 'rejected']
+
+
+def contributions(student):
+    """
+    The counter keys a single student adds 1 to.
+    """
+    if student is None:
+        return {}
+
+    status = student.get('registration_status') or {}
+    keys = {
+        'total': 1,
+        f"level:{student.get('level', 'Unknown')}": 1,
+        f"department:{student.get('department', 'Unknown')}": 1
+    }
+    if any(status.get(sem) == 'pending' for sem in SEMESTERS):
+        keys['pending'] = 1
+    for sem in SEMESTERS:
+        keys[f"status:{sem}:{status.get(sem, 'not_started')}"] = 1
+    return keys
+
+
+def compute(students):
+    counters = {}
+    for student in students:
+        for key, n in contributions(student).items():
+            counters[key] = counters.get(key, 0) + n
+    return counters
+
+
+class DashboardStats:
+    """
+    Admin dashboard counters kept in a small SQLite table and adjusted by the
+    delta of every student change, so reading them never scans students.
+    Shared by all workers through the database file.
+
+    Every student write also bumps a data version (with its time), which read
+    endpoints use as a cheap ETag/Last-Modified source.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._conn().executescript("""
+            CREATE TABLE IF NOT EXISTS counters (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+            CREATE TABLE IF NOT EXISTS version (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                value INTEGER NOT NULL,
+                modified REAL NOT NULL
+            );
+        """)
+
+    @staticmethod
+    def _bump(conn):
+        conn.execute(
+            'INSERT INTO version (id, value, modified) VALUES (1, 1, ?) '
+            'ON CONFLICT(id) DO UPDATE SET value = value + 1, modified = excluded.modified',
+            (time.time(),)
+        )
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def apply(self, changes):
+        """
+        Store listener: adjust counters for a list of (before, after) students.
+        """
+        delta = {}
+        for before, after in changes:
+            for key, n in contributions(before).items():
+                delta[key] = delta.get(key, 0) - n
+            for key, n in contributions(after).items():
+                delta[key] = delta.get(key, 0) + n
+
+        delta = [(key, n) for key, n in delta.items() if n]
+
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany(
+                'INSERT INTO counters (key, value) VALUES (?, ?) '
+                'ON CONFLICT(key) DO UPDATE SET value = value + excluded.value',
+                delta
+            )
+            self._bump(conn)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def version(self):
+        """
+        (version, modified unix time) of the student data; (0, 0.0) before any write.
+        """
+        row = self._conn().execute('SELECT value, modified FROM version WHERE id = 1').fetchone()
+        return (row[0], row[1]) if row else (0, 0.0)
+
+    def counters(self):
+        return dict(self._conn().execute('SELECT key, value FROM counters WHERE value != 0'))
+
+    def is_empty(self):
+        return self._conn().execute('SELECT 1 FROM counters LIMIT 1').fetchone() is None
+
+    def snapshot(self):
+        counters = self.counters()
+        stats = {
+            'total_students': counters.get('total', 0),
+            'pending_approvals': counters.get('pending', 0),
+            'by_level': {},
+            'by_department': {},
+            'by_semester_status': {sem: {status: 0 for status in STATUSES} for sem in SEMESTERS}
+        }
+        for key, value in counters.items():
+            kind, _, rest = key.partition(':')
+            if kind == 'level':
+                stats['by_level'][rest] = value
+            elif kind == 'department':
+                stats['by_department'][rest] = value
+            elif kind == 'status':
+                sem, _, status = rest.partition(':')
+                stats['by_semester_status'].setdefault(sem, {})[status] = value
+        return stats
+
+    def check(self, students):
+        """
+        Compare stored counters with a full recount. Returns {key: (stored, actual)}
+        for every counter that disagrees.
+        """
+        stored = self.counters()
+        actual = compute(students)
+        return {
+            key: (stored.get(key, 0), actual.get(key, 0))
+            for key in set(stored) | set(actual)
+            if stored.get(key, 0) != actual.get(key, 0)
+        }
+
+    def rebuild(self, students):
+        counters = compute(students)
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('DELETE FROM counters')
+            conn.executemany('INSERT INTO counters (key, value) VALUES (?, ?)', list(counters.items()))
+            self._bump(conn)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return counters
@@ -0,0 +1,721 @@
+import fcntl
+import json
+import os
+import sqlite3
+import threading
+import zlib
+from contextlib import contextmanager
+
+
+def _copy(value):
+    return json.loads(json.dumps(value))
+
+
+class StudentStore:
+    """
+    Behaviour shared by the storage backends.
+
+    Functions registered with subscribe() are called after every committed
+    write with a list of (before, after) student pairs; before is None for
+    newly created records.
+
+    bytes_read and bytes_written count serialized record data moved to and
+    from disk by this process.
+    """
+
+    def __init__(self):
+        self._listeners = []
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+    def _decode(self, text):
+        self.bytes_read += len(text)
+        return json.loads(text)
+
+    def _encode(self, student):
+        text = json.dumps(student)
+        self.bytes_written += len(text)
+        return text
+
+    def subscribe(self, fn):
+        self._listeners.append(fn)
+
+    def _notify(self, changes):
+        if not changes:
+            return
+        for fn in self._listeners:
+            fn(changes)
+
+    def save(self, student):
+        self.save_many([student])
+
+    def update(self, matric, fn):
+        """
+        Apply fn(student) to one record and persist it. Returns the updated
+        student, or None if the matric number does not exist.
+        """
+        return self.update_many([(matric, fn)])[matric]
+
+
+class JSONStudentStore(StudentStore):
+    """
+    Compatibility backend: keeps students in the original data/students.json list.
+    Lookups go through an in-memory index that is rebuilt when the file changes.
+    """
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self._lock = threading.RLock()
+        self._stamp = None
+        self._students = []
+        self._index = {}
+
+    def _load(self):
+        try:
+            st = os.stat(self.path)
+            stamp = (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            stamp = None
+
+        if stamp == self._stamp and stamp is not None:
+            return
+
+        try:
+            with open(self.path, 'r') as f:
+                students = self._decode(f.read())
+        except (FileNotFoundError, ValueError):
+            students = []
+
+        self._students = students
+        self._index = {s['matric_number']: i for i, s in enumerate(students)}
+        self._stamp = stamp
+
+    def _flush(self):
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as f:
+            f.write(json.dumps(self._students, indent=2))
+        self.bytes_written += os.path.getsize(tmp)
+        os.replace(tmp, self.path)
+        st = os.stat(self.path)
+        self._stamp = (st.st_mtime_ns, st.st_size)
+
+    def get(self, matric):
+        with self._lock:
+            self._load()
+            idx = self._index.get(matric)
+            return _copy(self._students[idx]) if idx is not None else None
+
+    def exists(self, matric):
+        with self._lock:
+            self._load()
+            return matric in self._index
+
+    def all(self):
+        with self._lock:
+            self._load()
+            return _copy(self._students)
+
+    def count(self):
+        with self._lock:
+            self._load()
+            return len(self._students)
+
+    def insert(self, student):
+        with self._lock:
+            self._load()
+            if student['matric_number'] in self._index:
+                return False
+            self._index[student['matric_number']] = len(self._students)
+            self._students.append(student)
+            self._flush()
+        self._notify([(None, _copy(student))])
+        return True
+
+    def insert_many(self, students):
+        """
+        Insert the students whose matric number is not taken, with one write.
+        Returns the list of matric numbers actually inserted.
+        """
+        changes = []
+        with self._lock:
+            self._load()
+            for student in students:
+                if student['matric_number'] in self._index:
+                    continue
+                self._index[student['matric_number']] = len(self._students)
+                self._students.append(student)
+                changes.append((None, _copy(student)))
+            if changes:
+                self._flush()
+        self._notify(changes)
+        return [after['matric_number'] for _, after in changes]
+
+    def save_many(self, students):
+        changes = []
+        with self._lock:
+            self._load()
+            for student in students:
+                idx = self._index.get(student['matric_number'])
+                if idx is None:
+                    changes.append((None, _copy(student)))
+                    self._index[student['matric_number']] = len(self._students)
+                    self._students.append(student)
+                else:
+                    changes.append((self._students[idx], _copy(student)))
+                    self._students[idx] = student
+            self._flush()
+        self._notify(changes)
+
+    def update_many(self, updates):
+        """
+        Apply a list of (matric, fn) pairs and persist them with one write.
+        Returns {matric: updated student or None}.
+        """
+        originals, working, results = {}, {}, {}
+        with self._lock:
+            self._load()
+            for matric, fn in updates:
+                idx = self._index.get(matric)
+                if idx is None:
+                    results[matric] = None
+                    continue
+                if matric not in originals:
+                    originals[matric] = self._students[idx]
+                    working[matric] = _copy(self._students[idx])
+                fn(working[matric])
+                results[matric] = working[matric]
+            # Only swapped in once every fn has succeeded, so a failing batch leaves the cache as on disk
+            for matric, student in working.items():
+                self._students[self._index[matric]] = student
+            if originals:
+                try:
+                    self._flush()
+                except BaseException:
+                    for matric, student in originals.items():
+                        self._students[self._index[matric]] = student
+                    raise
+            results = _copy(results)
+        self._notify([(originals[m], results[m]) for m in originals])
+        return results
+
+    def query(self, **filters):
+        with self._lock:
+            self._load()
+            return _copy(query_students(self._students, **filters))
+
+
+class SQLiteStudentStore(StudentStore):
+    """
+    Default backend: one row per student keyed by matric_number, in WAL mode so
+    readers never block the single writer. The fields admin listings filter
+    and sort on are copied into indexed columns next to the JSON document.
+    """
+
+    # full_name_key holds name_key(full_name): the listing sorts, pages and searches on it, with the
+    # same casefold query_students uses, so cursors mean the same thing on every backend
+    COLUMNS = ['department', 'level', 'full_name', 'created_at', 'status_first', 'status_second', 'full_name_key']
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self._local = threading.local()
+        self._init_schema()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._conn()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS students (
+                matric_number TEXT PRIMARY KEY,
+                department TEXT,
+                level TEXT,
+                data TEXT NOT NULL
+            );
+        """)
+
+        # Databases created before the listing columns existed get them added and backfilled
+        existing = {r[1] for r in conn.execute('PRAGMA table_info(students)')}
+        missing = [c for c in self.COLUMNS if c not in existing]
+        if missing:
+            conn.execute('BEGIN IMMEDIATE')
+            for column in missing:
+                collate = ' COLLATE NOCASE' if column == 'full_name' else ''
+                conn.execute(f"ALTER TABLE students ADD COLUMN {column} TEXT NOT NULL DEFAULT ''{collate}")
+            rows = conn.execute('SELECT data FROM students').fetchall()
+            conn.executemany(self._update_sql(), [self._update_params(self._decode(r[0])) for r in rows])
+            conn.execute('COMMIT')
+
+        conn.executescript("""
+            CREATE INDEX IF NOT EXISTS idx_students_dept_level ON students (department, level);
+            CREATE INDEX IF NOT EXISTS idx_students_status_first ON students (status_first);
+            CREATE INDEX IF NOT EXISTS idx_students_status_second ON students (status_second);
+            DROP INDEX IF EXISTS idx_students_full_name;
+            CREATE INDEX IF NOT EXISTS idx_students_full_name_key ON students (full_name_key);
+            CREATE INDEX IF NOT EXISTS idx_students_created_at ON students (created_at);
+        """)
+
+    @staticmethod
+    def _columns(student):
+        status = student.get('registration_status') or {}
+        return (
+            student.get('department') or '',
+            student.get('level') or '',
+            student.get('full_name') or '',
+            student.get('created_at') or '',
+            status.get('first_semester') or '',
+            status.get('second_semester') or '',
+            name_key(student.get('full_name'))
+        )
+
+    def _insert_sql(self, replace=False):
+        columns = ', '.join(['matric_number'] + self.COLUMNS + ['data'])
+        marks = ', '.join('?' * (len(self.COLUMNS) + 2))
+        verb = 'INSERT OR REPLACE' if replace else 'INSERT'
+        return f'{verb} INTO students ({columns}) VALUES ({marks})'
+
+    def _insert_params(self, student):
+        return (student['matric_number'],) + self._columns(student) + (self._encode(student),)
+
+    def _update_sql(self):
+        assignments = ', '.join(f'{c} = ?' for c in self.COLUMNS + ['data'])
+        return f'UPDATE students SET {assignments} WHERE matric_number = ?'
+
+    def _update_params(self, student):
+        return self._columns(student) + (self._encode(student), student['matric_number'])
+
+    def get(self, matric):
+        row = self._conn().execute(
+            'SELECT data FROM students WHERE matric_number = ?', (matric,)
+        ).fetchone()
+        return self._decode(row[0]) if row else None
+
+    def exists(self, matric):
+        return self._conn().execute(
+            'SELECT 1 FROM students WHERE matric_number = ?', (matric,)
+        ).fetchone() is not None
+
+    def all(self):
+        rows = self._conn().execute('SELECT data FROM students ORDER BY rowid')
+        return [self._decode(r[0]) for r in rows]
+
+    def count(self):
+        return self._conn().execute('SELECT COUNT(*) FROM students').fetchone()[0]
+
+    def insert(self, student):
+        try:
+            self._conn().execute(self._insert_sql(), self._insert_params(student))
+        except sqlite3.IntegrityError:
+            return False
+        self._notify([(None, _copy(student))])
+        return True
+
+    def insert_many(self, students):
+        """
+        Insert the students whose matric number is not taken, in one transaction.
+        Returns the list of matric numbers actually inserted.
+        """
+        conn = self._conn()
+        sql = self._insert_sql().replace('INSERT', 'INSERT OR IGNORE', 1)
+        changes = []
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for student in students:
+                if conn.execute(sql, self._insert_params(student)).rowcount:
+                    changes.append((None, _copy(student)))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        self._notify(changes)
+        return [after['matric_number'] for _, after in changes]
+
+    def save_many(self, students):
+        conn = self._conn()
+        changes = []
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for student in students:
+                row = conn.execute(
+                    'SELECT data FROM students WHERE matric_number = ?', (student['matric_number'],)
+                ).fetchone()
+                if row:
+                    conn.execute(self._update_sql(), self._update_params(student))
+                else:
+                    conn.execute(self._insert_sql(), self._insert_params(student))
+                changes.append((self._decode(row[0]) if row else None, _copy(student)))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        self._notify(changes)
+
+    def update_many(self, updates):
+        """
+        Apply a list of (matric, fn) pairs in a single transaction.
+        Returns {matric: updated student or None}.
+        """
+        conn = self._conn()
+        originals, results = {}, {}
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for matric, fn in updates:
+                student = results.get(matric)
+                if student is None:
+                    row = conn.execute(
+                        'SELECT data FROM students WHERE matric_number = ?', (matric,)
+                    ).fetchone()
+                    if not row:
+                        results[matric] = None
+                        continue
+                    student = self._decode(row[0])
+                    originals[matric] = self._decode(row[0])
+                fn(student)
+                results[matric] = student
+            conn.executemany(
+                self._update_sql(),
+                [self._update_params(s) for s in results.values() if s is not None]
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        self._notify([(originals[m], _copy(results[m])) for m in originals])
+        return results
+
+    def query(self, department=None, level=None, status=None, semester=None, search=None,
+              sort='created_at', descending=False, limit=50, after=None):
+        """
+        One page of students using the indexed columns. See query_students.
+        """
+        where, params = [], []
+        if department:
+            where.append('department = ?')
+            params.append(department)
+        if level:
+            where.append('level = ?')
+            params.append(level)
+        if status:
+            if semester == 'first_semester':
+                where.append('status_first = ?')
+                params.append(status)
+            elif semester == 'second_semester':
+                where.append('status_second = ?')
+                params.append(status)
+            else:
+                where.append('(status_first = ? OR status_second = ?)')
+                params.extend([status, status])
+        if search:
+            pattern = name_key(search).replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+            where.append("(full_name_key LIKE ? ESCAPE '\\' OR matric_number LIKE ? ESCAPE '\\')")
+            params.extend([pattern, pattern])
+
+        column = sort if sort in SORT_KEYS else 'created_at'
+        if column == 'full_name':
+            column = 'full_name_key'
+        op, order = ('<', 'DESC') if descending else ('>', 'ASC')
+        if after:
+            where.append(f'({column} {op} ? OR ({column} = ? AND matric_number {op} ?))')
+            params.extend([after[0], after[0], after[1]])
+
+        sql = 'SELECT data FROM students'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        if column == 'matric_number':
+            sql += f' ORDER BY matric_number {order} LIMIT ?'
+        else:
+            sql += f' ORDER BY {column} {order}, matric_number {order} LIMIT ?'
+        params.append(limit)
+
+        return [self._decode(r[0]) for r in self._conn().execute(sql, params)]
+
+
+class ShardedStudentStore(StudentStore):
+    """
+    Students spread over hash buckets (data/students/shard-NNN.json), each a
+    {matric_number: student} object with its own lock file.
+
+    Writers take an exclusive flock on one shard, re-read it, apply the change
+    and atomically rename a new file into place, so updates to students in
+    different shards never wait on each other, across threads or processes.
+    """
+
+    def __init__(self, directory, shards=64):
+        super().__init__()
+        self.directory = directory
+        self.shards = shards
+        os.makedirs(directory, exist_ok=True)
+        self._cache = {}
+        self._cache_lock = threading.Lock()
+        self._thread_locks = [threading.Lock() for _ in range(shards)]
+
+    def _shard(self, matric):
+        return zlib.crc32(matric.encode('utf-8')) % self.shards
+
+    def _path(self, shard):
+        return os.path.join(self.directory, f'shard-{shard:03d}.json')
+
+    @contextmanager
+    def _locked(self, shard):
+        # flock only excludes other processes; the thread lock covers this one
+        with self._thread_locks[shard]:
+            with open(os.path.join(self.directory, f'shard-{shard:03d}.lock'), 'a') as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _read(self, shard):
+        path = self._path(shard)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return {}
+        stamp = (st.st_mtime_ns, st.st_size)
+
+        with self._cache_lock:
+            cached = self._cache.get(shard)
+        if cached and cached[0] == stamp:
+            return cached[1]
+
+        try:
+            with open(path, 'r') as f:
+                records = self._decode(f.read())
+        except (FileNotFoundError, ValueError):
+            records = {}
+        with self._cache_lock:
+            self._cache[shard] = (stamp, records)
+        return records
+
+    def _write(self, shard, records):
+        path = self._path(shard)
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'w') as f:
+            f.write(self._encode(records))
+        os.replace(tmp, path)
+        st = os.stat(path)
+        with self._cache_lock:
+            self._cache[shard] = ((st.st_mtime_ns, st.st_size), records)
+
+    def get(self, matric):
+        student = self._read(self._shard(matric)).get(matric)
+        return _copy(student) if student else None
+
+    def exists(self, matric):
+        return matric in self._read(self._shard(matric))
+
+    def all(self):
+        students = []
+        for shard in range(self.shards):
+            students.extend(self._read(shard).values())
+        students.sort(key=lambda s: s.get('created_at', ''))
+        return _copy(students)
+
+    def count(self):
+        return sum(len(self._read(shard)) for shard in range(self.shards))
+
+    def insert(self, student):
+        shard = self._shard(student['matric_number'])
+        with self._locked(shard):
+            records = dict(self._read(shard))
+            if student['matric_number'] in records:
+                return False
+            records[student['matric_number']] = student
+            self._write(shard, records)
+        self._notify([(None, _copy(student))])
+        return True
+
+    def insert_many(self, students):
+        """
+        Insert the students whose matric number is not taken, with one write
+        per touched shard. Returns the list of matric numbers actually inserted.
+        """
+        by_shard = {}
+        for student in students:
+            by_shard.setdefault(self._shard(student['matric_number']), []).append(student)
+
+        changes = []
+        for shard in sorted(by_shard):
+            with self._locked(shard):
+                records = dict(self._read(shard))
+                added = False
+                for student in by_shard[shard]:
+                    if student['matric_number'] in records:
+                        continue
+                    records[student['matric_number']] = student
+                    changes.append((None, _copy(student)))
+                    added = True
+                if added:
+                    self._write(shard, records)
+        self._notify(changes)
+        return [after['matric_number'] for _, after in changes]
+
+    def save_many(self, students):
+        by_shard = {}
+        for student in students:
+            by_shard.setdefault(self._shard(student['matric_number']), []).append(student)
+
+        changes = []
+        for shard in sorted(by_shard):
+            with self._locked(shard):
+                records = dict(self._read(shard))
+                for student in by_shard[shard]:
+                    changes.append((records.get(student['matric_number']), _copy(student)))
+                    records[student['matric_number']] = student
+                self._write(shard, records)
+        self._notify(changes)
+
+    def update_many(self, updates):
+        """
+        Apply a list of (matric, fn) pairs with one write per touched shard,
+        each under its shard lock. Returns {matric: updated student or None}.
+        """
+        by_shard = {}
+        for matric, fn in updates:
+            by_shard.setdefault(self._shard(matric), []).append((matric, fn))
+
+        originals, results = {}, {}
+        for shard in sorted(by_shard):
+            with self._locked(shard):
+                records = dict(self._read(shard))
+                touched = False
+                for matric, fn in by_shard[shard]:
+                    if matric not in records:
+                        results[matric] = None
+                        continue
+                    if matric not in originals:
+                        originals[matric] = records[matric]
+                    student = _copy(records[matric])
+                    fn(student)
+                    records[matric] = student
+                    results[matric] = student
+                    touched = True
+                if touched:
+                    self._write(shard, records)
+        results = _copy(results)
+        self._notify([(_copy(originals[m]), results[m]) for m in originals])
+        return results
+
+    def query(self, **filters):
+        def everyone():
+            for shard in range(self.shards):
+                yield from self._read(shard).values()
+        return _copy(query_students(everyone(), **filters))
+
+
+SORT_KEYS = ['created_at', 'matric_number', 'full_name', 'department', 'level']
+
+
+def name_key(name):
+    """
+    The case-insensitive form names are sorted and compared by. Every backend
+    (and the SQLite full_name_key column) uses this, never a collation.
+    """
+    return (name or '').casefold()
+
+
+def sort_value(student, sort):
+    if sort == 'full_name':
+        return name_key(student.get('full_name'))
+    return student.get(sort) or ''
+
+
+def query_students(students, department=None, level=None, status=None, semester=None, search=None,
+                   sort='created_at', descending=False, limit=50, after=None):
+    """
+    Filter, sort and page an iterable of students.
+
+    status matches the given semester, or either semester when none is given.
+    search is a case-insensitive prefix of full_name or matric_number. after is
+    the (sort value, matric_number) of the last row of the previous page.
+    """
+    semesters = [semester] if semester else ['first_semester', 'second_semester']
+    prefix = name_key(search) if search else None
+    sort = sort if sort in SORT_KEYS else 'created_at'
+
+    matched = []
+    for s in students:
+        if department and s.get('department') != department:
+            continue
+        if level and s.get('level') != level:
+            continue
+        if status and not any((s.get('registration_status') or {}).get(sem) == status for sem in semesters):
+            continue
+        if prefix and not (name_key(s.get('full_name')).startswith(prefix)
+                           or name_key(s['matric_number']).startswith(prefix)):
+            continue
+        key = (sort_value(s, sort), s['matric_number'])
+        if after and (key <= tuple(after) if not descending else key >= tuple(after)):
+            continue
+        matched.append((key, s))
+
+    matched.sort(key=lambda pair: pair[0], reverse=descending)
+    return [s for _, s in matched[:limit]]
+
+
+def migrate_students(json_path, store):
+    """
+    One-shot import of a students.json list into another store.
+    Records that already exist in the target are left untouched.
+    """
+    try:
+        with open(json_path, 'r') as f:
+            students = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+    new = [s for s in students if not store.exists(s['matric_number'])]
+    if new:
+        store.save_many(new)
+    return len(new)
+
+
+def open_student_store(backend, data_dir='data'):
+    if backend == 'json':
+        return JSONStudentStore(os.path.join(data_dir, 'students.json'))
+
+    if backend == 'sqlite':
+        db_path = os.path.join(data_dir, 'students.db')
+        fresh = not os.path.exists(db_path)
+        store = SQLiteStudentStore(db_path)
+        if fresh:
+            migrate_students(os.path.join(data_dir, 'students.json'), store)
+        return store
+
+    if backend == 'sharded':
+        shard_dir = os.path.join(data_dir, 'students')
+        fresh = not os.path.isdir(shard_dir)
+        store = ShardedStudentStore(shard_dir)
+        if fresh:
+            migrate_students(os.path.join(data_dir, 'students.json'), store)
+        return store
+
+    raise ValueError(f'Unknown storage backend: {backend}')
+
+
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) < 2 or sys.argv[1] != 'migrate':
+        print('Usage: python storage.py migrate [sqlite|sharded] [data_dir]')
+        sys.exit(1)
+
+    backend = sys.argv[2] if len(sys.argv) > 2 else 'sqlite'
+    data_dir = sys.argv[3] if len(sys.argv) > 3 else 'data'
+    if backend == 'sharded':
+        target = ShardedStudentStore(os.path.join(data_dir, 'students'))
+        location = target.directory
+    else:
+        target = SQLiteStudentStore(os.path.join(data_dir, 'students.db'))
+        location = target.path
+    count = migrate_students(os.path.join(data_dir, 'students.json'), target)
+    print(f'Migrated {count} students into {location}')
@@ -0,0 +1,60 @@
+import os
+
+import pytest
+
+from admission import ConcurrencyLimiter, Overloaded, TokenBuckets, parse_rate
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('5/40', (5.0, 40.0)),
+    ('0.2', (0.2, 1.0)),
+    ('3', (3.0, 3.0)),
+    ('off', None),
+    ('0', None),
+    ('', None),
+    ('1/0.5', None)
+])
+def test_parse_rate(value, expected):
+    assert parse_rate(value) == expected
+
+
+def test_bucket_allows_a_burst_then_limits(tmp_path):
+    buckets = TokenBuckets(os.path.join(tmp_path, 'buckets'), slots=64)
+
+    assert [buckets.take('ip:1', 1, 3) for _ in range(3)] == [0, 0, 0]
+    wait = buckets.take('ip:1', 1, 3)
+    assert 0 < wait <= 1
+    assert buckets.limited == 1
+    # Other keys have their own bucket
+    assert buckets.take('ip:2', 1, 3) == 0
+
+
+def test_buckets_are_shared_through_the_file(tmp_path):
+    path = os.path.join(tmp_path, 'buckets')
+    TokenBuckets(path, slots=64).take('ip:1', 0.001, 1)
+
+    assert TokenBuckets(path, slots=64).take('ip:1', 0.001, 1) > 0
+
+
+def test_full_group_recycles_a_bucket(tmp_path):
+    # One group of four slots, so a fifth key must take over an existing slot
+    buckets = TokenBuckets(os.path.join(tmp_path, 'buckets'), slots=4)
+    for i in range(5):
+        assert buckets.take(f'k{i}', 0.001, 1) == 0
+
+
+def test_limiter_caps_in_flight_requests(tmp_path):
+    limiter = ConcurrencyLimiter(os.path.join(tmp_path, 'slots'), {'write': 2, 'read': 0}, retry_after=3)
+
+    first, second = limiter.acquire('write'), limiter.acquire('write')
+    with pytest.raises(Overloaded) as caught:
+        limiter.acquire('write')
+    assert caught.value.retry_after == 3
+    assert limiter.stats()['write'] == {'limit': 2, 'in_flight': 2, 'rejected': 1}
+
+    limiter.release(first)
+    limiter.release(first)
+    third = limiter.acquire('write')
+    assert third is not None and third != second
+    # Unlimited classes never take a slot
+    assert limiter.acquire('read') is None
@@ -0,0 +1,54 @@
+import os
+
+import pytest
+
+from audit import AuditLog
+
+
+@pytest.fixture
+def log(tmp_path):
+    # Small segments, so entries spread over several of them
+    log = AuditLog(str(tmp_path), max_bytes=400)
+    for i in range(30):
+        log.append('approve' if i % 3 else 'reject', f'admin{i % 2}', f'entry {i}')
+    return log
+
+
+def page_all(log, limit=7, **filters):
+    seen, cursor = [], None
+    while True:
+        entries, cursor = log.query(limit=limit, cursor=cursor, **filters)
+        seen.extend(e['details'] for e in entries)
+        if cursor is None:
+            return seen
+
+
+def test_log_rotates_into_segments(log):
+    assert len(log._segments()) > 3
+
+
+def test_cursor_pages_newest_first(log):
+    assert page_all(log) == [f'entry {i}' for i in reversed(range(30))]
+
+
+def test_pages_stay_stable_while_entries_are_appended(log):
+    first, cursor = log.query(limit=10)
+    log.append('approve', 'admin0', 'new')
+
+    rest, _ = log.query(limit=100, cursor=cursor)
+
+    assert [e['details'] for e in first + rest] == [f'entry {i}' for i in reversed(range(30))]
+
+
+def test_filters(log):
+    assert page_all(log, user='admin1', action='reject') == [f'entry {i}' for i in reversed(range(30)) if i % 6 == 3]
+
+
+def test_stray_files_are_ignored(log, tmp_path):
+    with open(os.path.join(tmp_path, 'audit-backup.jsonl'), 'w') as f:
+        f.write('{"details": "stray"}\n')
+
+    log.append('approve', 'admin0', 'after')
+
+    assert page_all(log)[:2] == ['after', 'entry 29']
+    assert 'stray' not in page_all(log)
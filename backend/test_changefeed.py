@@ -0,0 +1,70 @@
+import os
+
+import pytest
+
+from changefeed import ChangeFeed, registration_events
+
+
+def student(matric, status, *codes):
+    return {
+        'matric_number': matric,
+        'full_name': 'Student',
+        'registration_status': {'first_semester': status, 'second_semester': 'not_started'},
+        'registered_courses': {'first_semester': [{'courseCode': c, 'units': 3} for c in codes]}
+    }
+
+
+@pytest.fixture
+def feed(tmp_path):
+    return ChangeFeed(os.path.join(tmp_path, 'changes.db'), keep=5)
+
+
+def submit(feed, *matrics):
+    feed.apply([(student(m, 'not_started'), student(m, 'pending', 'CSC101')) for m in matrics])
+
+
+def test_registration_events():
+    before, after = student('a', 'not_started'), student('a', 'pending', 'CSC101', 'MTH101')
+
+    (event,) = registration_events(before, after)
+
+    assert event['event'] == 'submitted'
+    assert event['previous'] == 'not_started'
+    assert event['total_units'] == 6
+    assert registration_events(after, after) == []
+    assert registration_events(after, None) == []
+
+
+def test_since_pages_in_order(feed):
+    submit(feed, 'a', 'b', 'c')
+
+    first = feed.since(0, limit=2)
+    rest = feed.since(first['version'], limit=2)
+
+    assert [e['matric_number'] for e in first['events']] == ['a', 'b']
+    assert first['more'] and not first['reset']
+    assert [e['matric_number'] for e in rest['events']] == ['c']
+    assert rest['version'] == feed.version() == 3
+    assert not rest['more']
+    assert feed.since(3) == {'version': 3, 'events': [], 'more': False, 'reset': False}
+
+
+def test_reader_that_fell_behind_is_reset(feed):
+    submit(feed, *'abcdefgh')
+
+    assert feed.since(0)['reset']
+    assert feed.since(2)['reset']
+    # The oldest kept event is 4, so a reader at 3 has missed nothing
+    caught_up = feed.since(3)
+    assert not caught_up['reset']
+    assert [e['version'] for e in caught_up['events']] == [4, 5, 6, 7, 8]
+
+
+def test_version_from_another_feed_is_reset(feed):
+    submit(feed, 'a')
+
+    assert feed.since(50) == {'version': 1, 'events': [], 'more': False, 'reset': True}
+
+
+def test_empty_feed(feed):
+    assert feed.since(0) == {'version': 0, 'events': [], 'more': False, 'reset': False}
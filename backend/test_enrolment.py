@@ -0,0 +1,83 @@
+import os
+import threading
+
+import pytest
+
+from enrolment import EnrolmentIndex
+
+
+def student(matric, status, *codes, semester='first_semester'):
+    return {
+        'matric_number': matric,
+        'registration_status': {semester: status},
+        'registered_courses': {semester: [{'courseCode': code} for code in codes]}
+    }
+
+
+@pytest.fixture
+def index(tmp_path):
+    return EnrolmentIndex(os.path.join(tmp_path, 'enrolment.db'))
+
+
+def test_reserve_until_full(index):
+    capacities = {'CSC101': 2}
+
+    assert index.reserve('a', 'first_semester', ['CSC101', 'GST101'], capacities) == []
+    assert index.reserve('b', 'first_semester', ['CSC101'], capacities) == []
+    assert index.reserve('c', 'first_semester', ['CSC101', 'GST101'], capacities) == ['CSC101']
+
+    # Nothing is written for a rejected reservation
+    assert index.counts('first_semester') == {'CSC101': {'pending': 2}, 'GST101': {'pending': 1}}
+
+
+def test_reserving_again_keeps_the_students_own_seat(index):
+    capacities = {'CSC101': 1}
+    index.reserve('a', 'first_semester', ['CSC101', 'MTH101'], capacities)
+
+    assert index.reserve('a', 'first_semester', ['CSC101'], capacities) == []
+    assert index.roster('first_semester', 'CSC101') == [('a', 'pending')]
+    assert index.counts('first_semester', ['MTH101']) == {}
+
+
+def test_only_pending_and_approved_hold_seats(index):
+    index.apply([(None, student('a', 'approved', 'CSC101')), (None, student('b', 'rejected', 'CSC101'))])
+
+    assert index.reserve('c', 'first_semester', ['CSC101'], {'CSC101': 2}) == []
+    assert index.reserve('d', 'first_semester', ['CSC101'], {'CSC101': 2}) == ['CSC101']
+    assert index.reserve('d', 'second_semester', ['CSC101'], {'CSC101': 2}) == []
+
+
+def test_release_gives_the_seat_back(index):
+    capacities = {'CSC101': 1}
+    index.reserve('a', 'first_semester', ['CSC101'], capacities)
+
+    index.release('a', 'first_semester', None)
+
+    assert index.reserve('b', 'first_semester', ['CSC101'], capacities) == []
+
+
+def test_release_restores_the_stored_registration(index):
+    saved = student('a', 'pending', 'CSC101')
+    index.apply([(None, saved)])
+    index.reserve('a', 'first_semester', ['MTH101'], {})
+
+    index.release('a', 'first_semester', saved)
+
+    assert index.roster('first_semester', 'CSC101') == [('a', 'pending')]
+    assert index.roster('first_semester', 'MTH101') == []
+
+
+def test_concurrent_reservations_never_overbook(index):
+    results = {}
+
+    def claim(matric):
+        results[matric] = index.reserve(matric, 'first_semester', ['CSC101'], {'CSC101': 5})
+
+    threads = [threading.Thread(target=claim, args=(f's{i}',)) for i in range(20)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert sum(1 for full in results.values() if not full) == 5
+    assert index.counts('first_semester') == {'CSC101': {'pending': 5}}
@@ -0,0 +1,71 @@
+import gzip
+from datetime import datetime, timezone
+
+import pytest
+from flask import Flask
+
+from http_cache import MIN_COMPRESS_SIZE, ResponseCache, send_json
+
+SMALL = b'{"a":1}'
+LARGE = b'{"a":"' + b'x' * MIN_COMPRESS_SIZE + b'"}'
+MODIFIED = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    cache = ResponseCache()
+    app.add_url_rule('/small', 'small', lambda: send_json(lambda: SMALL, etag='s', cache=cache))
+    app.add_url_rule('/large', 'large', lambda: send_json(lambda: LARGE, etag='l', cache=cache,
+                                                          last_modified=MODIFIED))
+    return app.test_client()
+
+
+def test_large_body_is_gzipped_under_its_own_etag(client):
+    plain = client.get('/large', headers={'Accept-Encoding': 'identity'})
+    zipped = client.get('/large', headers={'Accept-Encoding': 'gzip'})
+
+    assert plain.headers['ETag'] == '"l"' and plain.data == LARGE
+    assert zipped.headers['ETag'] == '"l-gz"' and zipped.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(zipped.data) == LARGE
+    assert 'Accept-Encoding' in zipped.headers['Vary']
+
+
+def test_small_body_keeps_the_plain_etag(client):
+    response = client.get('/small', headers={'Accept-Encoding': 'gzip'})
+
+    assert response.data == SMALL
+    assert 'Content-Encoding' not in response.headers
+    assert response.headers['ETag'] == '"s"'
+
+
+@pytest.mark.parametrize('path, encoding', [('/small', 'gzip'), ('/large', 'gzip'), ('/large', 'identity')])
+def test_matching_etag_is_not_modified(client, path, encoding):
+    etag = client.get(path, headers={'Accept-Encoding': encoding}).headers['ETag']
+
+    response = client.get(path, headers={'Accept-Encoding': encoding, 'If-None-Match': etag})
+
+    assert response.status_code == 304
+    assert response.headers['ETag'] == etag
+
+
+def test_plain_copy_is_still_valid_once_gzip_is_accepted(client):
+    response = client.get('/large', headers={'Accept-Encoding': 'gzip', 'If-None-Match': '"l"'})
+
+    assert response.status_code == 304
+    assert response.headers['ETag'] == '"l"'
+
+
+def test_stale_etag_gets_the_body(client):
+    response = client.get('/large', headers={'Accept-Encoding': 'gzip', 'If-None-Match': '"old-gz"'})
+
+    assert response.status_code == 200
+    assert response.headers['ETag'] == '"l-gz"'
+
+
+def test_if_modified_since(client):
+    response = client.get('/large', headers={'Accept-Encoding': 'gzip',
+                                             'If-Modified-Since': 'Wed, 01 Jan 2025 00:00:00 GMT'})
+
+    assert response.status_code == 304
+    assert response.headers['ETag'] == '"l-gz"'
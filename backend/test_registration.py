@@ -0,0 +1,97 @@
+import json
+import os
+
+import pytest
+
+from catalog import CourseCatalog, find_clashes, parse_slot
+from registration import check_selection
+
+COURSES = {
+    'courses': {
+        '100': [
+            {'courseCode': 'CSC101', 'units': 3, 'schedule': {'day': 'Monday', 'time': '9:00 AM - 11:00 AM'}},
+            {'courseCode': 'MTH101', 'units': 3, 'schedule': {'day': 'Monday', 'time': '10:00 AM - 12:00 PM'}},
+            {'courseCode': 'PHY101', 'units': 4, 'schedule': {'day': 'Monday', 'time': '11:00 AM - 1:00 PM'}},
+            {'courseCode': 'GST101', 'units': 2, 'schedule': {'day': 'Tuesday', 'time': '9:00 AM - 11:00 AM'}}
+        ]
+    }
+}
+
+STUDENT = {'matric_number': 'csc/1', 'department': 'CSC', 'level': '100'}
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    with open(os.path.join(tmp_path, 'csc_first_semester.json'), 'w') as f:
+        json.dump(COURSES, f)
+    return CourseCatalog(str(tmp_path))
+
+
+@pytest.mark.parametrize('schedule, expected', [
+    ({'day': 'Monday', 'time': '9:00 AM - 12:00 PM'}, ('monday', 540, 720)),
+    ({'day': 'friday', 'time': '13:30 to 15:00'}, ('friday', 810, 900)),
+    ({'day': 'Tuesday', 'time': '9AM–11AM'}, ('tuesday', 540, 660)),
+    ({'day': 'Monday', 'time': '12:00 PM - 12:00 AM'}, None),
+    ({'day': 'Monday', 'time': '13:00 PM - 2:00 PM'}, None),
+    ({'day': '', 'time': '9:00 AM - 10:00 AM'}, None),
+    ({'day': 'Monday', 'time': 'TBA'}, None),
+    ('Monday 9-10', None),
+    (None, None)
+])
+def test_parse_slot(schedule, expected):
+    assert parse_slot(schedule) == expected
+
+
+def test_find_clashes_only_pairs_overlapping_courses_on_the_same_day():
+    slots = [
+        ('A', ('monday', 540, 660)),
+        ('B', ('monday', 600, 720)),
+        ('C', ('monday', 660, 780)),
+        ('D', ('tuesday', 540, 660))
+    ]
+
+    assert sorted(find_clashes(slots)) == [('A', 'B'), ('B', 'C')]
+
+
+def test_valid_selection_uses_catalog_units(catalog):
+    result = check_selection(catalog, STUDENT, 'first_semester',
+                             [{'courseCode': 'CSC101', 'units': 99}, 'GST101'], 24)
+
+    assert result['valid']
+    assert [c['courseCode'] for c in result['courses']] == ['CSC101', 'GST101']
+    assert result['total_units'] == 5
+
+
+def test_unknown_and_duplicate_courses(catalog):
+    result = check_selection(catalog, STUDENT, 'first_semester', ['CSC101', 'csc101 ', 'CSC101', 'XYZ999', ''], 24)
+
+    assert not result['valid']
+    assert result['unknown'] == ['csc101', 'XYZ999', '']
+    assert result['duplicates'] == ['CSC101']
+
+
+def test_timetable_clash(catalog):
+    result = check_selection(catalog, STUDENT, 'first_semester', ['CSC101', 'MTH101', 'GST101'], 24)
+
+    assert not result['valid']
+    assert result['clashes'] == [{'course1': 'CSC101', 'course2': 'MTH101', 'time': 'Monday 9:00 AM - 11:00 AM'}]
+
+
+def test_back_to_back_courses_do_not_clash(catalog):
+    assert check_selection(catalog, STUDENT, 'first_semester', ['CSC101', 'PHY101'], 24)['valid']
+
+
+def test_max_units(catalog):
+    result = check_selection(catalog, STUDENT, 'first_semester', ['CSC101', 'PHY101', 'GST101'], 8)
+
+    assert result['total_units'] == 9
+    assert result['errors'] == ['Exceeded max (8)']
+
+
+def test_carryover_courses_outside_the_catalog(catalog):
+    carryover = {'courseCode': 'CSC201', 'units': 3, 'schedule': {'day': 'Tuesday', 'time': '10:00 AM - 12:00 PM'}}
+
+    result = check_selection(catalog, STUDENT, 'first_semester', ['CSC201', 'GST101'], 24, [carryover])
+
+    assert result['courses'][0]['isCarryover']
+    assert [c['course1'] + c['course2'] for c in result['clashes']] == ['GST101CSC201']
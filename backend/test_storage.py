@@ -0,0 +1,88 @@
+import os
+import random
+
+import pytest
+
+from storage import JSONStudentStore, SQLiteStudentStore, ShardedStudentStore, name_key, sort_value
+
+NAMES = ['adaeze', 'Adaeze', 'ADAEZE', 'Émile', 'émile', 'Zoë', 'zoe', 'Øyvind', 'Łukasz', 'straße',
+         'STRASSE', 'İlkay', 'ıpek', 'Çelik', 'Ñandú', 'Ngozi', 'ngozi', 'Şule', 'Ådne', 'Ōtani']
+
+
+def make_students(count=200, seed=7):
+    rng = random.Random(seed)
+    students = []
+    for i in range(count):
+        name = f'{rng.choice(NAMES)} {rng.choice(NAMES)}' if i % 3 else rng.choice(NAMES)
+        students.append({
+            'matric_number': f'csc/{rng.randrange(10**6):06d}/{i}',
+            'full_name': name,
+            'department': 'CSC',
+            'level': '100',
+            'created_at': f'2025-01-01T00:00:{i % 60:02d}',
+            'registration_status': {'first_semester': 'not_started', 'second_semester': 'not_started'}
+        })
+    return students
+
+
+@pytest.fixture(params=['json', 'sqlite', 'sharded'])
+def store(request, tmp_path):
+    if request.param == 'json':
+        path = os.path.join(tmp_path, 'students.json')
+        with open(path, 'w') as f:
+            f.write('[]')
+        store = JSONStudentStore(path)
+    elif request.param == 'sqlite':
+        store = SQLiteStudentStore(os.path.join(tmp_path, 'students.db'))
+    else:
+        store = ShardedStudentStore(os.path.join(tmp_path, 'students'), shards=8)
+    store.insert_many(make_students())
+    return store
+
+
+def page_all(store, sort, descending, limit=7, **filters):
+    seen, after = [], None
+    for _ in range(1000):
+        page = store.query(sort=sort, descending=descending, limit=limit, after=after, **filters)
+        seen.extend(s['matric_number'] for s in page)
+        if len(page) < limit:
+            return seen
+        after = (sort_value(page[-1], sort), page[-1]['matric_number'])
+    raise AssertionError('paging did not terminate')
+
+
+@pytest.mark.parametrize('descending', [False, True])
+@pytest.mark.parametrize('sort', ['full_name', 'created_at', 'matric_number'])
+def test_keyset_paging_visits_every_student_once(store, sort, descending):
+    students = make_students()
+    expected = sorted(students, key=lambda s: (sort_value(s, sort), s['matric_number']), reverse=descending)
+
+    assert page_all(store, sort, descending) == [s['matric_number'] for s in expected]
+
+
+def test_search_is_casefolded_on_every_backend(store):
+    expected = sorted(s['matric_number'] for s in make_students() if name_key(s['full_name']).startswith('émile'))
+
+    assert expected
+    assert sorted(page_all(store, 'full_name', False, search='ÉMILE')) == expected
+
+
+def test_failed_update_many_changes_nothing(store):
+    students = make_students()
+    first, second = students[0]['matric_number'], students[1]['matric_number']
+    changes = []
+    store.subscribe(changes.append)
+
+    def approve(s):
+        s['registration_status']['first_semester'] = 'approved'
+
+    def fail(s):
+        s['registration_status']['first_semester'] = 'approved'
+        raise RuntimeError('boom')
+
+    with pytest.raises(RuntimeError):
+        store.update_many([(first, approve), (second, fail)])
+
+    assert store.get(first)['registration_status']['first_semester'] == 'not_started'
+    assert store.get(second)['registration_status']['first_semester'] == 'not_started'
+    assert changes == []
@@ -0,0 +1,82 @@
+import os
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from tokens import TokenStore
+
+
+def token(code, matric='csc/1', expires_in=timedelta(days=1), **fields):
+    return dict({
+        'code': code,
+        'matric_number': matric,
+        'type': 'carryover',
+        'courses': [{'courseCode': 'CSC201', 'units': 3}],
+        'expires_at': (datetime.now() + expires_in).isoformat() if expires_in else None,
+        'used': False,
+        'used_at': None
+    }, **fields)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return TokenStore(os.path.join(tmp_path, 'tokens.db'))
+
+
+def test_token_can_be_used_once(store):
+    store.add(token('abc'))
+
+    used, error = store.use('abc', 'csc/1')
+
+    assert error is None
+    assert used['used'] and used['used_at']
+    assert store.get('abc')['used']
+    assert store.use('abc', 'csc/1') == (None, 'Token already used')
+
+
+@pytest.mark.parametrize('code, matric, error', [
+    ('nope', 'csc/1', 'Invalid token'),
+    ('abc', 'csc/2', 'Token not assigned to you')
+])
+def test_rejected_use_leaves_the_token_unused(store, code, matric, error):
+    store.add(token('abc'))
+
+    assert store.use(code, matric) == (None, error)
+    assert not store.get('abc')['used']
+
+
+def test_expired_token(store):
+    store.add(token('old', expires_in=timedelta(days=-1)))
+
+    assert store.use('old', 'csc/1') == (None, 'Token expired')
+
+
+def test_concurrent_use_succeeds_once(store):
+    store.add(token('abc'))
+    results = []
+
+    def use():
+        results.append(store.use('abc', 'csc/1')[1])
+
+    threads = [threading.Thread(target=use) for _ in range(10)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert results.count(None) == 1
+    assert results.count('Token already used') == 9
+
+
+def test_compact_removes_expired_and_long_used_tokens(store):
+    long_ago = (datetime.now() - timedelta(days=60)).isoformat()
+    store.add_many([
+        token('expired', expires_in=timedelta(days=-1)),
+        token('used-long-ago', used=True, used_at=long_ago),
+        token('used-recently', used=True, used_at=datetime.now().isoformat()),
+        token('open', expires_in=None)
+    ])
+
+    assert store.compact() == 2
+    assert [t['code'] for t in store.for_student('csc/1')] == ['used-recently', 'open']
@@ -0,0 +1,159 @@
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+
+class TokenStore:
+    """
+    Carryover and late-registration tokens in SQLite, indexed by code (primary
+    key) and by matric_number.
+
+    Tokens may carry an expires_at timestamp. compact() deletes tokens that are
+    expired or were used longer than the retention period ago; maybe_compact()
+    runs it at most once per interval from request handlers.
+    """
+
+    TYPES = ['carryover', 'late_registration']
+
+    def __init__(self, path, retention_days=30, compact_interval=3600):
+        self.path = path
+        self.retention_days = retention_days
+        self.compact_interval = compact_interval
+        self._compacted_at = 0.0
+        self._local = threading.local()
+        self._conn().executescript("""
+            CREATE TABLE IF NOT EXISTS tokens (
+                code TEXT PRIMARY KEY,
+                matric_number TEXT NOT NULL,
+                type TEXT NOT NULL,
+                used INTEGER NOT NULL DEFAULT 0,
+                used_at TEXT,
+                expires_at TEXT,
+                data TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_tokens_matric ON tokens (matric_number);
+        """)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _row(token):
+        return (
+            token['code'], token['matric_number'], token['type'],
+            1 if token.get('used') else 0, token.get('used_at'), token.get('expires_at'),
+            json.dumps(token)
+        )
+
+    def add_many(self, tokens):
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany(
+                'INSERT INTO tokens (code, matric_number, type, used, used_at, expires_at, data) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [self._row(t) for t in tokens]
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def add(self, token):
+        self.add_many([token])
+
+    def get(self, code):
+        row = self._conn().execute('SELECT data FROM tokens WHERE code = ?', (code,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def for_student(self, matric):
+        rows = self._conn().execute(
+            'SELECT data FROM tokens WHERE matric_number = ? ORDER BY rowid', (matric,)
+        )
+        return [json.loads(r[0]) for r in rows]
+
+    def use(self, code, matric):
+        """
+        Mark a token used by matric. Returns (token, error); exactly one of
+        them is None. The check-and-set is a single conditional UPDATE, so a
+        token cannot be redeemed twice.
+        """
+        token = self.get(code)
+        if token is None:
+            return None, 'Invalid token'
+        if token['matric_number'] != matric:
+            return None, 'Token not assigned to you'
+        if token.get('used'):
+            return None, 'Token already used'
+        if token.get('expires_at') and token['expires_at'] < datetime.now().isoformat():
+            return None, 'Token expired'
+
+        token['used'] = True
+        token['used_at'] = datetime.now().isoformat()
+        updated = self._conn().execute(
+            'UPDATE tokens SET used = 1, used_at = ?, data = ? WHERE code = ? AND used = 0',
+            (token['used_at'], json.dumps(token), code)
+        ).rowcount
+        if not updated:
+            return None, 'Token already used'
+        return token, None
+
+    def compact(self):
+        """
+        Delete expired tokens and tokens used more than retention_days ago.
+        Courses granted by a used carryover token are kept on the student
+        record, so registration checks do not depend on the token surviving.
+        """
+        now = datetime.now()
+        cutoff = datetime.fromtimestamp(now.timestamp() - self.retention_days * 86400).isoformat()
+        removed = self._conn().execute(
+            'DELETE FROM tokens WHERE (expires_at IS NOT NULL AND expires_at < ?) '
+            'OR (used = 1 AND used_at IS NOT NULL AND used_at < ?)',
+            (now.isoformat(), cutoff)
+        ).rowcount
+        self._compacted_at = time.monotonic()
+        return removed
+
+    def maybe_compact(self):
+        if time.monotonic() - self._compacted_at >= self.compact_interval:
+            self.compact()
+
+    def import_legacy(self, legacy_file):
+        """
+        One-shot import of the old tokens.json lists. Does nothing once the table has rows.
+        """
+        try:
+            with open(legacy_file, 'r') as f:
+                legacy = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+        tokens = []
+        for token_type in self.TYPES:
+            for t in legacy.get(token_type, []):
+                tokens.append(dict({'type': token_type, 'courses': [], 'used_at': None}, **t))
+
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if conn.execute('SELECT 1 FROM tokens LIMIT 1').fetchone():
+                conn.execute('ROLLBACK')
+                return 0
+            conn.executemany(
+                'INSERT OR IGNORE INTO tokens (code, matric_number, type, used, used_at, expires_at, data) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [self._row(t) for t in tokens]
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return len(tokens)
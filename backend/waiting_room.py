@@ -0,0 +1,186 @@
+import sqlite3
+import threading
+import time
+
+# A waiting student's last-seen time is refreshed at most this often (seconds)
+SEEN_EVERY = 15
+# Clients are told to poll no faster / slower than this (seconds)
+MIN_POLL, MAX_POLL = 2, 30
+
+
+class WaitingRoom:
+    """
+    FIFO waiting rooms in SQLite, one queue per registration slot, shared by
+    all workers through the database file.
+
+    Admission is paced rather than capacity based: a queue earns
+    admit_per_minute admissions a minute, and whichever poll notices the
+    credit admits the next students in join order. An admission lasts
+    ticket_ttl seconds. Students who stop polling for abandon_after seconds
+    are dropped when admissions are handed out, without using one up.
+    """
+
+    def __init__(self, path, ticket_ttl=600, abandon_after=90):
+        self.path = path
+        self.ticket_ttl = ticket_ttl
+        self.abandon_after = abandon_after
+        self._local = threading.local()
+        self._conn().executescript("""
+            CREATE TABLE IF NOT EXISTS queue (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                matric_number TEXT NOT NULL UNIQUE,
+                scope TEXT NOT NULL,
+                semester TEXT NOT NULL,
+                joined REAL NOT NULL,
+                seen REAL NOT NULL,
+                admitted REAL,
+                expires REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_queue_waiting ON queue (scope, seq) WHERE admitted IS NULL;
+            CREATE TABLE IF NOT EXISTS pacing (
+                scope TEXT PRIMARY KEY,
+                credit REAL NOT NULL,
+                updated REAL NOT NULL
+            );
+        """)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _burst(rate):
+        # Up to five seconds of admissions can bank up between polls
+        return max(1.0, rate / 60 * 5)
+
+    def join(self, matric, scope, semester, rate):
+        """
+        Put a student at the back of a queue (a no-op while they are already
+        waiting in it or hold a live admission) and return their status().
+        """
+        now = time.time()
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                'SELECT scope, semester, admitted, expires FROM queue WHERE matric_number = ?', (matric,)
+            ).fetchone()
+            keep = row and row[0] == scope and row[1] == semester and (row[2] is None or row[3] > now)
+            if not keep:
+                conn.execute('DELETE FROM queue WHERE matric_number = ?', (matric,))
+                conn.execute(
+                    'INSERT INTO queue (matric_number, scope, semester, joined, seen) VALUES (?, ?, ?, ?, ?)',
+                    (matric, scope, semester, now, now)
+                )
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return self.status(matric, rate)
+
+    def status(self, matric, rate):
+        """
+        {'status': 'waiting', 'position', 'wait_seconds', 'poll_after'},
+        {'status': 'admitted', 'expires'} or {'status': 'expired'}; None if
+        the student never joined. Mostly reads: the database is written only
+        when admissions are due or the student's last-seen time is stale.
+        """
+        now = time.time()
+        conn = self._conn()
+        row = conn.execute(
+            'SELECT seq, scope, seen, admitted, expires FROM queue WHERE matric_number = ?', (matric,)
+        ).fetchone()
+        if row is None:
+            return None
+        seq, scope, seen, admitted, expires = row
+
+        if admitted is None and self._due(conn, scope, rate, now):
+            self._release(scope, rate, now)
+            admitted, expires = conn.execute(
+                'SELECT admitted, expires FROM queue WHERE seq = ?', (seq,)
+            ).fetchone() or (None, None)
+        if admitted is not None:
+            return {'status': 'admitted', 'expires': expires} if expires > now else {'status': 'expired'}
+
+        if now - seen > SEEN_EVERY:
+            conn.execute('UPDATE queue SET seen = ? WHERE seq = ?', (now, seq))
+        head = conn.execute(
+            'SELECT MIN(seq) FROM queue WHERE scope = ? AND admitted IS NULL', (scope,)
+        ).fetchone()[0]
+        # Sequence numbers of students who left in between are counted too, so this is an upper bound
+        position = seq - (head or seq) + 1
+        wait = position / rate * 60
+        return {
+            'status': 'waiting',
+            'position': position,
+            'wait_seconds': round(wait),
+            'poll_after': int(min(max(wait / 4, MIN_POLL), MAX_POLL))
+        }
+
+    def _due(self, conn, scope, rate, now):
+        row = conn.execute('SELECT credit, updated FROM pacing WHERE scope = ?', (scope,)).fetchone()
+        return row is None or row[0] + (now - row[1]) * rate / 60 >= 1
+
+    def _release(self, scope, rate, now):
+        """
+        Admit as many students from the head of scope's queue as its credit allows.
+        """
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT credit, updated FROM pacing WHERE scope = ?', (scope,)).fetchone()
+            credit = 1.0 if row is None else min(self._burst(rate), row[0] + max(now - row[1], 0) * rate / 60)
+            conn.execute(
+                'DELETE FROM queue WHERE scope = ? AND admitted IS NULL AND seen < ?',
+                (scope, now - self.abandon_after)
+            )
+            admit = int(credit)
+            if admit:
+                seqs = [seq for (seq,) in conn.execute(
+                    'SELECT seq FROM queue WHERE scope = ? AND admitted IS NULL ORDER BY seq LIMIT ?',
+                    (scope, admit)
+                )]
+                conn.executemany(
+                    'UPDATE queue SET admitted = ?, expires = ? WHERE seq = ?',
+                    [(now, now + self.ticket_ttl, seq) for seq in seqs]
+                )
+                credit -= len(seqs)
+            conn.execute(
+                'INSERT INTO pacing (scope, credit, updated) VALUES (?, ?, ?) '
+                'ON CONFLICT(scope) DO UPDATE SET credit = excluded.credit, updated = excluded.updated',
+                (scope, credit, now)
+            )
+            conn.execute('DELETE FROM queue WHERE expires < ?', (now - 3600,))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def admitted(self, matric, semester):
+        """
+        True while the student holds a live admission for semester.
+        """
+        row = self._conn().execute(
+            'SELECT 1 FROM queue WHERE matric_number = ? AND semester = ? AND admitted IS NOT NULL AND expires > ?',
+            (matric, semester, time.time())
+        ).fetchone()
+        return row is not None
+
+    def leave(self, matric):
+        self._conn().execute('DELETE FROM queue WHERE matric_number = ?', (matric,))
+
+    def stats(self):
+        """
+        {scope: {'waiting', 'admitted'}} with admitted counting live admissions only.
+        """
+        rows = self._conn().execute(
+            'SELECT scope, SUM(admitted IS NULL), SUM(admitted IS NOT NULL AND expires > ?) '
+            'FROM queue GROUP BY scope ORDER BY scope',
+            (time.time(),)
+        )
+        return {scope: {'waiting': waiting, 'admitted': admitted} for scope, waiting, admitted in rows}
@@ -26,10 +26,51 @@ const CourseSelection = () => {
   const [tokenLoading, setTokenLoading] = useState(false);
   const [hasCarryoverCourses, setHasCarryoverCourses] = useState(false);
 
+  // Waiting room (only when the admin has turned it on for the active semester)
+  const [room, setRoom] = useState(null);
+  const [joining, setJoining] = useState(false);
+
   useEffect(() => {
     loadCourses();
   }, [semester]);
 
+  const roomEnabled = !!config?.waiting_room && config?.active_semester === semester;
+
+  useEffect(() => {
+    if (!roomEnabled) {
+      setRoom(null);
+      return;
+    }
+    refreshRoom();
+  }, [roomEnabled]);
+
+  // Poll only while waiting, no faster than the server asks
+  useEffect(() => {
+    if (room?.status !== 'waiting') return undefined;
+    const timer = setTimeout(refreshRoom, (room.poll_after || 5) * 1000);
+    return () => clearTimeout(timer);
+  }, [room]);
+
+  const refreshRoom = async () => {
+    try {
+      setRoom(await studentAPI.getWaitingRoom());
+    } catch (err) {
+      console.error('Waiting room poll failed:', err);
+      setRoom((current) => current && { ...current, poll_after: 10 });
+    }
+  };
+
+  const handleJoinRoom = async () => {
+    setJoining(true);
+    try {
+      setRoom(await studentAPI.joinWaitingRoom());
+    } catch (err) {
+      setError(err.response?.data?.message || 'Could not join the waiting room. Please try again.');
+    } finally {
+      setJoining(false);
+    }
+  };
+
   const loadCourses = async () => {
     setLoading(true);
     setError('');
@@ -124,6 +165,17 @@ const CourseSelection = () => {
       }
 
       setSelectedCourses(newSelection);
+
+      // Server-side check against the catalog timetable (overlapping times, not just identical slots)
+      studentAPI.validateRegistration({
+        semester: `${semester}_semester`,
+        courses: newSelection.map(c => c.courseCode),
+      }).then((result) => {
+        if (result.clashes.length > 0) {
+          const clash = result.clashes[0];
+          setError(`Timetable clash detected: ${clash.course1} and ${clash.course2} at ${clash.time}`);
+        }
+      }).catch(() => {});
     }
   };
 
@@ -169,6 +221,9 @@ const CourseSelection = () => {
       }, 1500);
     } catch (err) {
       setError(err.response?.data?.message || 'Registration failed. Please try again.');
+      if (err.response?.data?.waiting_room) {
+        refreshRoom();
+      }
     } finally {
       setSubmitting(false);
     }
@@ -189,6 +244,8 @@ const CourseSelection = () => {
   const maxUnits = config?.max_units?.[user.level] || 24;
   const isOverloaded = totalUnits > maxUnits;
   const carryoverCount = selectedCourses.filter(c => c.isCarryover).length;
+  const regWindow = config?.registration_window;
+  const awaitingAdmission = roomEnabled && room?.status !== 'admitted' && room?.status !== 'open';
 
   return (
     <div className="min-h-screen bg-gray-50">
@@ -283,6 +340,50 @@ const CourseSelection = () => {
           </div>
         </div>
 
+        {/* Registration window / waiting room */}
+        {regWindow && regWindow.status !== 'open' && (
+          <div className="card mb-6 bg-yellow-50 border-2 border-yellow-300">
+            <div className="flex items-start space-x-3">
+              <Icons.Calendar size={24} color="#FF9800" />
+              <p className="text-sm text-yellow-800">
+                {regWindow.status === 'upcoming'
+                  ? `Registration for your level and department opens ${new Date(regWindow.start).toLocaleString()}.`
+                  : `Registration for your level and department closed ${new Date(regWindow.end).toLocaleString()}.`}
+              </p>
+            </div>
+          </div>
+        )}
+
+        {roomEnabled && room && (
+          <div className="card mb-6 bg-blue-50 border-2 border-blue-200">
+            <div className="flex items-center justify-between">
+              <div>
+                <h3 className="font-bold text-gray-800">Registration Waiting Room</h3>
+                <p className="text-sm text-gray-600">
+                  {room.status === 'waiting' &&
+                    `You are number ${room.position} in line (about ${Math.max(1, Math.round(room.wait_seconds / 60))} min). Keep this page open.`}
+                  {room.status === 'admitted' &&
+                    `It's your turn. Submit your registration before ${new Date(room.expires_at).toLocaleTimeString()}.`}
+                  {(room.status === 'not_joined' || room.status === 'expired') &&
+                    (room.status === 'expired'
+                      ? 'Your turn expired. Join the line again to register.'
+                      : 'Join the line to register. Students are let in a few at a time.')}
+                  {room.status === 'registered' && 'You have already registered for this semester.'}
+                </p>
+              </div>
+              {(room.status === 'not_joined' || room.status === 'expired') && (
+                <button
+                  onClick={handleJoinRoom}
+                  disabled={joining}
+                  className="btn-primary px-6 disabled:opacity-50"
+                >
+                  {joining ? 'Joining...' : 'Join Line'}
+                </button>
+              )}
+            </div>
+          </div>
+        )}
+
         {/* Messages */}
         {error && (
           <div className="mb-6 p-4 bg-red-50 border border-red-200 rounded-lg flex items-start space-x-2">
@@ -453,7 +554,7 @@ const CourseSelection = () => {
               {/* Submit Button */}
               <button
                 onClick={handleSubmit}
-                disabled={submitting || selectedCourses.length === 0 || isOverloaded}
+                disabled={submitting || selectedCourses.length === 0 || isOverloaded || awaitingAdmission}
                 className="w-full btn-primary flex items-center justify-center space-x-2 disabled:opacity-50 disabled:cursor-not-allowed"
               >
                 {submitting ? (
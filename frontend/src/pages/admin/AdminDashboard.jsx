@@ -12,6 +12,18 @@ const AdminDashboard = () => {
 
   useEffect(() => {
     loadDashboard();
+
+    // Counters are cheap to read; refresh them when a registration changes instead of on a timer
+    let timer = null;
+    const refresh = () => {
+      clearTimeout(timer);
+      timer = setTimeout(loadDashboard, 500);
+    };
+    const source = adminAPI.streamChanges(null, refresh, refresh);
+    return () => {
+      clearTimeout(timer);
+      source.close();
+    };
   }, []);
 
   const loadDashboard = async () => {
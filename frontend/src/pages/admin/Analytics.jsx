@@ -0,0 +1,120 @@
+import React, { useState, useEffect } from 'react';
+import { adminAPI } from '../../utils/api';
+import Header from '../../components/Header';
+
+const Analytics = () => {
+  const [semester, setSemester] = useState('first_semester');
+  const [courses, setCourses] = useState([]);
+  const [loading, setLoading] = useState(true);
+  const [roster, setRoster] = useState(null);
+
+  useEffect(() => {
+    loadEnrolments();
+  }, [semester]);
+
+  const loadEnrolments = async () => {
+    setLoading(true);
+    setRoster(null);
+    try {
+      const data = await adminAPI.getEnrolments(semester);
+      setCourses(data.courses);
+    } catch (error) {
+      console.error('Error loading enrolments:', error);
+    } finally {
+      setLoading(false);
+    }
+  };
+
+  const openRoster = async (courseCode) => {
+    try {
+      const data = await adminAPI.getCourseRoster(semester, courseCode, { limit: 500 });
+      setRoster(data);
+    } catch (error) {
+      console.error('Error loading roster:', error);
+    }
+  };
+
+  return (
+    <div className="min-h-screen bg-gray-50">
+      <Header title="Analytics" />
+
+      <div className="max-w-7xl mx-auto px-4 py-8">
+        <div className="card mb-6">
+          <div className="flex flex-col md:flex-row justify-between items-start md:items-center space-y-4 md:space-y-0">
+            <h2 className="text-2xl font-bold text-gray-800">Course Enrolment</h2>
+            <select
+              value={semester}
+              onChange={(e) => setSemester(e.target.value)}
+              className="input-field md:w-56"
+            >
+              <option value="first_semester">First Semester</option>
+              <option value="second_semester">Second Semester</option>
+            </select>
+          </div>
+        </div>
+
+        <div className="card overflow-x-auto mb-6">
+          {loading ? (
+            <div className="flex items-center justify-center h-48">
+              <div className="animate-spin rounded-full h-12 w-12 border-b-2 border-primary"></div>
+            </div>
+          ) : courses.length === 0 ? (
+            <p className="text-gray-500 text-center py-8">No registrations for this semester yet.</p>
+          ) : (
+            <table className="w-full text-sm">
+              <thead>
+                <tr className="text-left text-gray-600 border-b">
+                  <th className="py-2">Course</th>
+                  <th className="py-2">Pending</th>
+                  <th className="py-2">Approved</th>
+                  <th className="py-2">Rejected</th>
+                  <th className="py-2">Capacity</th>
+                  <th className="py-2"></th>
+                </tr>
+              </thead>
+              <tbody>
+                {courses.map(course => (
+                  <tr key={course.course_code} className="border-b last:border-0">
+                    <td className="py-2 font-semibold">{course.course_code}</td>
+                    <td className="py-2">{course.pending}</td>
+                    <td className="py-2">{course.approved}</td>
+                    <td className="py-2">{course.rejected}</td>
+                    <td className="py-2">
+                      {course.capacity === null ? '—' : `${course.capacity - course.available}/${course.capacity}`}
+                    </td>
+                    <td className="py-2 text-right">
+                      <button
+                        onClick={() => openRoster(course.course_code)}
+                        className="text-primary hover:underline"
+                      >
+                        View roster
+                      </button>
+                    </td>
+                  </tr>
+                ))}
+              </tbody>
+            </table>
+          )}
+        </div>
+
+        {roster && (
+          <div className="card">
+            <h3 className="text-xl font-bold text-gray-800 mb-4">
+              {roster.course_code} — {roster.students.length} student(s)
+            </h3>
+            <ul className="divide-y">
+              {roster.students.map(student => (
+                <li key={student.matric_number} className="py-2 flex justify-between">
+                  <span>{student.full_name} <span className="text-gray-500">({student.matric_number})</span></span>
+                  <span className="text-gray-600 capitalize">{student.status}</span>
+                </li>
+              ))}
+            </ul>
+          </div>
+        )}
+      </div>
+    </div>
+  );
+};
+
+export default Analytics;
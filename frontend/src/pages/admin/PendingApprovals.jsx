@@ -14,9 +14,49 @@ const PendingApprovals = () => {
   const [rejectTarget, setRejectTarget] = useState(null);
 
   useEffect(() => {
-    loadStudents();
+    let source = null;
+    let closed = false;
+
+    // Load the list once, then apply registration events instead of re-fetching every student
+    const start = async () => {
+      let version = null;
+      try {
+        version = (await adminAPI.getChanges()).version;
+      } catch (error) {
+        console.error('Error reading change feed version:', error);
+      }
+      await loadStudents();
+      if (!closed && version !== null) {
+        source = adminAPI.streamChanges(version, applyChange, loadStudents);
+      }
+    };
+
+    start();
+    return () => {
+      closed = true;
+      if (source) source.close();
+    };
   }, []);
 
+  const applyChange = (event) => {
+    setStudents((current) => {
+      const patch = (student) => ({
+        ...student,
+        registration_status: { ...student.registration_status, [event.semester]: event.status },
+        registered_courses: {
+          ...student.registered_courses,
+          [event.semester]: event.courses || (event.status === 'not_started' ? [] : student.registered_courses?.[event.semester] || []),
+        },
+      });
+
+      if (current.some((s) => s.matric_number === event.matric_number)) {
+        return current.map((s) => (s.matric_number === event.matric_number ? patch(s) : s));
+      }
+      const { matric_number, full_name, department, level } = event;
+      return [...current, patch({ matric_number, full_name, department, level, registration_status: {}, registered_courses: {} })];
+    });
+  };
+
   const loadStudents = async () => {
     try {
       setLoading(true);
@@ -43,6 +83,31 @@ const PendingApprovals = () => {
     }
   };
 
+  const handleApproveAll = async () => {
+    const items = filteredRegistrations
+      .filter(reg => reg.status === 'pending')
+      .map(reg => ({ matric: reg.matric_number, semester: reg.semester, action: 'approve' }));
+
+    if (items.length === 0) return;
+    if (!window.confirm(`Approve all ${items.length} pending registrations shown?`)) return;
+
+    setProcessing('bulk-approve');
+    try {
+      const result = await adminAPI.bulkUpdateRegistrations(items);
+      if (result.failed > 0) {
+        alert(`⚠️ Approved ${result.applied}, ${result.failed} failed`);
+      } else {
+        alert(`✅ Approved ${result.applied} registrations`);
+      }
+      loadStudents();
+    } catch (error) {
+      console.error('Bulk approval error:', error);
+      alert('❌ Bulk approval failed: ' + (error.response?.data?.message || 'Unknown error'));
+    } finally {
+      setProcessing(null);
+    }
+  };
+
   const confirmReject = (student, semester) => {
     setRejectTarget({ student, semester });
     setShowRejectModal(true);
@@ -243,6 +308,20 @@ const PendingApprovals = () => {
               </select>
             </div>
           </div>
+
+          {stats.pending > 0 && (
+            <div className="flex justify-end mt-4">
+              <button
+                onClick={handleApproveAll}
+                disabled={processing === 'bulk-approve'}
+                className="btn-primary"
+              >
+                {processing === 'bulk-approve'
+                  ? 'Approving...'
+                  : `Approve All Pending (${stats.pending})`}
+              </button>
+            </div>
+          )}
         </div>
 
         {/* Registrations List */}
@@ -117,7 +117,7 @@ const Signatures = () => {
                   </p>
                   {signatures[role.key].signature && (
                     <img
-                      src={`http://localhost:5000/${signatures[role.key].signature}`}
+                      src={`http://localhost:5000/${signatures[role.key].signature_thumb || signatures[role.key].signature}`}
                       alt="Signature"
                       className="h-16 mb-4 border border-gray-300 rounded"
                     />
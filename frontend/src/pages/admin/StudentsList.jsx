@@ -248,7 +248,7 @@ const StudentsList = () => {
                       <div className="w-10 h-10 rounded-full overflow-hidden bg-gray-200">
                         {student.photo ? (
                           <img
-                            src={`http://localhost:5000/${student.photo}`}
+                            src={`http://localhost:5000/${student.photo_thumb || student.photo}`}
                             alt={student.full_name}
                             className="w-full h-full object-cover"
                           />
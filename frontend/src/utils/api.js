@@ -101,17 +101,44 @@ export const studentAPI = {
     return response.data;
   },
 
+  // Dry run: { semester, courses: [courseCode] } -> { valid, errors, clashes, total_units, conflicts }
+  validateRegistration: async (data) => {
+    const response = await api.post('/student/validate-registration', data);
+    return response.data;
+  },
+
   getConfig: async () => {
     const response = await api.get('/config');
     return response.data;
   },
 
+  // Waiting room for the active semester: status is 'waiting' (position, wait_seconds,
+  // poll_after), 'admitted' (expires_at), 'expired', 'not_joined', 'open', 'upcoming',
+  // 'closed' or 'registered'. Poll no more often than poll_after seconds.
+  joinWaitingRoom: async () => {
+    const response = await api.post('/student/waiting-room');
+    return response.data;
+  },
+
+  getWaitingRoom: async () => {
+    const response = await api.get('/student/waiting-room');
+    return response.data;
+  },
+
   // ============= NEW: GET REGISTERED COURSES =============
   getRegisteredCourses: async (semester) => {
     const response = await api.get(`/student/registered-courses/${semester}`);
     return response.data;
   },
 
+  // Server-rendered course form (PDF blob)
+  getCourseFormPdf: async (semester) => {
+    const response = await api.get(`/student/course-form/${semester}.pdf`, {
+      responseType: 'blob',
+    });
+    return response.data;
+  },
+
   // ============= NEW: VALIDATE TOKEN =============
   validateToken: async (token) => {
     const response = await api.post('/student/validate-token', { token });
@@ -133,6 +160,68 @@ export const adminAPI = {
     return response.data;
   },
 
+  // Registration events after `since` ({ version, events, more, reset }); without `since`
+  // only the current version, to read before loading a list and stream from afterwards
+  getChanges: async (since, limit) => {
+    const response = await api.get('/admin/changes', { params: { since, limit } });
+    return response.data;
+  },
+
+  // Short-lived token that only opens the change stream (EventSource can't send headers,
+  // and the session token must not end up in a URL)
+  getStreamToken: async () => {
+    const response = await api.post('/admin/changes/stream-token');
+    return response.data.token;
+  },
+
+  // Live change feed. Each connection gets a fresh stream token; when the server ends the
+  // stream (or it drops) it is reopened after the last event id. Call .close() when done.
+  streamChanges: (since, onEvent, onReset) => {
+    let source = null;
+    let timer = null;
+    let closed = false;
+    let lastId = since;
+
+    const open = async () => {
+      let token;
+      try {
+        token = await adminAPI.getStreamToken();
+      } catch (error) {
+        console.error('Error getting stream token:', error);
+        if (!closed) timer = setTimeout(open, 5000);
+        return;
+      }
+      if (closed) return;
+      const params = new URLSearchParams({ access_token: token });
+      if (lastId !== undefined && lastId !== null) {
+        params.set('since', lastId);
+      }
+      source = new EventSource(`${API_BASE_URL}/admin/changes/stream?${params}`, { withCredentials: true });
+      source.addEventListener('registration', (e) => {
+        lastId = e.lastEventId;
+        onEvent(JSON.parse(e.data));
+      });
+      source.addEventListener('reset', (e) => {
+        lastId = e.lastEventId;
+        if (onReset) onReset();
+      });
+      // EventSource would retry with the same, soon expired token; reconnect with a new one instead
+      source.onerror = () => {
+        source.close();
+        if (!closed) timer = setTimeout(open, 1000);
+      };
+    };
+
+    open();
+    return {
+      close: () => {
+        closed = true;
+        clearTimeout(timer);
+        if (source) source.close();
+      },
+    };
+  },
+
   // ============= FIXED: APPROVE WITH URL ENCODING =============
   approveRegistration: async (matricNumber, semester) => {
     try {
@@ -170,16 +259,107 @@ export const adminAPI = {
     }
   },
 
+  // Apply many approve/reject/reset actions in one request
+  // items: [{ matric, semester, action: 'approve' | 'reject' | 'reset' }]
+  bulkUpdateRegistrations: async (items) => {
+    const response = await api.post('/admin/registrations/bulk', { items });
+    return response.data;
+  },
+
+  // ZIP of every approved course form for a department/level/semester
+  exportCourseForms: async (department, level, semester) => {
+    const response = await api.get(`/admin/course-forms/${department}/${level}/${semester}.zip`, {
+      responseType: 'blob',
+    });
+    return response.data;
+  },
+
+  // params: { department, level, semester, status, rows: 'course' | 'student' }
+  exportRegistrations: async (format, params) => {
+    const response = await api.get(`/admin/export/registrations.${format}`, {
+      params,
+      responseType: 'blob',
+    });
+    return response.data;
+  },
+
+  getEnrolments: async (semester) => {
+    const response = await api.get(`/admin/enrolments/${semester}`);
+    return response.data;
+  },
+
+  getCourseRoster: async (semester, courseCode, params) => {
+    const response = await api.get(`/admin/enrolments/${semester}/${encodeURIComponent(courseCode)}/roster`, { params });
+    return response.data;
+  },
+
+  getWaitingRoomStats: async () => {
+    const response = await api.get('/admin/waiting-room');
+    return response.data;
+  },
+
+  // config may include registration_windows: [{ department, level, start, end, admit_per_minute }]
+  // and waiting_room: { enabled, admit_per_minute }
   updateConfig: async (config) => {
     const response = await api.put('/admin/config', config);
     return response.data;
   },
 
+  // file: CSV or NDJSON with full_name, matric_number, department, level, password[, email, phone]
+  importStudents: async (file) => {
+    const formData = new FormData();
+    formData.append('file', file);
+    const response = await api.post('/admin/students/import', formData, {
+      headers: {
+        'Content-Type': 'multipart/form-data',
+      },
+    });
+    return response.data;
+  },
+
+  getImportJob: async (jobId) => {
+    const response = await api.get(`/admin/students/import/${jobId}`);
+    return response.data;
+  },
+
+  // kind: 'export_registrations' (params: format, rows, department, level, semester, status)
+  // or 'course_forms' (params: department, level, semester)
+  enqueueJob: async (kind, params) => {
+    const response = await api.post('/admin/jobs', { kind, params });
+    return response.data;
+  },
+
+  getJobs: async (params) => {
+    const response = await api.get('/admin/jobs', { params });
+    return response.data;
+  },
+
+  getJob: async (jobId) => {
+    const response = await api.get(`/admin/jobs/${jobId}`);
+    return response.data;
+  },
+
+  cancelJob: async (jobId) => {
+    const response = await api.post(`/admin/jobs/${jobId}/cancel`);
+    return response.data;
+  },
+
+  downloadJobResult: async (jobId) => {
+    const response = await api.get(`/admin/jobs/${jobId}/result`, { responseType: 'blob' });
+    return response.data;
+  },
+
   generateToken: async (data) => {
     const response = await api.post('/admin/generate-token', data);
     return response.data;
   },
 
+  // data: { type, semester, expires_in_days, tokens: [{ matric_number, courses }] } or FormData with a CSV 'file'
+  generateTokensBulk: async (data) => {
+    const response = await api.post('/admin/generate-tokens/bulk', data);
+    return response.data;
+  },
+
   getSignatures: async () => {
     const response = await api.get('/admin/signatures');
     return response.data;